@@ -0,0 +1,115 @@
+"""Tenancy, content-keyed chunks, document versions, analytics and corpus generations.
+
+Upgrades a database created by the initial `python packages/db.py` (one row
+per document path, chunks owned by a document, nullable runs.tenant_id) to
+the schema in packages/db.py. Existing rows go to DEFAULT_TENANT.
+
+A database created by the current `python packages/db.py` already has this
+schema: `alembic stamp head` instead of upgrading.
+
+Revision ID: 0001
+Revises:
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ARRAY
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _tenant_column(table: str):
+    """Add tenant_id, backfill it with the default tenant, then make it NOT NULL."""
+    op.add_column(table, sa.Column('tenant_id', sa.String(), nullable=True))
+    op.execute(sa.text(f'UPDATE {table} SET tenant_id = :t WHERE tenant_id IS NULL')
+               .bindparams(t=os.getenv('DEFAULT_TENANT', 'default')))
+    op.alter_column(table, 'tenant_id', nullable=False)
+
+
+def upgrade():
+    tenant = os.getenv('DEFAULT_TENANT', 'default')
+
+    # documents: append-only versions per path, one active row per (tenant, path)
+    _tenant_column('documents')
+    op.drop_constraint('documents_path_key', 'documents', type_='unique')
+    op.drop_index('ix_documents_hash', table_name='documents')
+    op.create_index('uq_documents_path_version', 'documents', ['tenant_id', 'path', 'version'], unique=True)
+    op.create_index('uq_documents_active_path', 'documents', ['tenant_id', 'path'], unique=True,
+                    postgresql_where=sa.text('active'))
+    op.create_index('ix_documents_active_hash', 'documents', ['tenant_id', 'hash'],
+                    postgresql_where=sa.text('active'))
+
+    # chunks: keyed by the content hash of their document instead of its id
+    op.add_column('chunks', sa.Column('tenant_id', sa.String(), nullable=True))
+    op.add_column('chunks', sa.Column('content_hash', sa.String(), nullable=True))
+    op.execute('UPDATE chunks SET content_hash = d.hash, tenant_id = d.tenant_id '
+               'FROM documents d WHERE d.id = chunks.document_id')
+    # identical bytes under several paths now share one chunk set: keep one document's copy
+    op.execute('DELETE FROM chunks c WHERE c.document_id <> ('
+               ' SELECT min(o.document_id) FROM chunks o'
+               ' WHERE o.tenant_id = c.tenant_id AND o.content_hash = c.content_hash)')
+    op.execute(sa.text('UPDATE chunks SET tenant_id = :t WHERE tenant_id IS NULL').bindparams(t=tenant))
+    op.alter_column('chunks', 'tenant_id', nullable=False)
+    op.drop_column('chunks', 'document_id')  # drops chunks_document_id_fkey with it
+    op.create_index('ix_chunks_content_hash', 'chunks', ['content_hash'])
+    op.create_index('ix_chunks_tenant_hash', 'chunks', ['tenant_id', 'content_hash'])
+
+    _tenant_column('jobs')
+    op.create_index('ix_jobs_tenant_created', 'jobs', ['tenant_id', 'created_at'])
+
+    op.execute(sa.text('UPDATE runs SET tenant_id = :t WHERE tenant_id IS NULL').bindparams(t=tenant))
+    op.alter_column('runs', 'tenant_id', nullable=False)
+    op.add_column('runs', sa.Column('batch_id', sa.String()))
+    op.add_column('runs', sa.Column('tags', ARRAY(sa.String())))
+    op.create_index('ix_runs_tenant_created', 'runs', ['tenant_id', 'created_at'])
+    op.create_index('ix_runs_tenant_batch', 'runs', ['tenant_id', 'batch_id', 'created_at'])
+
+    # capability-gap analytics; `python -m packages.analytics rebuild` fills them from existing runs
+    op.create_table(
+        'run_command_stats',
+        sa.Column('run_id', sa.String(), primary_key=True),
+        sa.Column('kind', sa.String(), primary_key=True),
+        sa.Column('name', sa.String(), primary_key=True),
+        sa.Column('tenant_id', sa.String(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('recorded_at', sa.DateTime()),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('mapped', sa.Boolean(), nullable=False),
+    )
+    op.create_index('ix_run_command_stats_tenant_name', 'run_command_stats', ['tenant_id', 'kind', 'name'])
+    op.create_table(
+        'gap_totals',
+        sa.Column('tenant_id', sa.String(), primary_key=True),
+        sa.Column('kind', sa.String(), primary_key=True),
+        sa.Column('name', sa.String(), primary_key=True),
+        sa.Column('occurrences', sa.Integer(), nullable=False),
+        sa.Column('unmapped_occurrences', sa.Integer(), nullable=False),
+        sa.Column('runs', sa.Integer(), nullable=False),
+        sa.Column('unmapped_runs', sa.Integer(), nullable=False),
+        sa.Column('sole_gap_runs', sa.Integer(), nullable=False),
+        sa.Column('last_seen', sa.DateTime()),
+    )
+    op.create_table(
+        'coverage_daily',
+        sa.Column('tenant_id', sa.String(), primary_key=True),
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('runs', sa.Integer(), nullable=False),
+        sa.Column('full_runs', sa.Integer(), nullable=False),
+        sa.Column('nodes', sa.Integer(), nullable=False),
+        sa.Column('mapped_nodes', sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        'corpus_generations',
+        sa.Column('tenant_id', sa.String(), primary_key=True),
+        sa.Column('generation', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime()),
+    )
+
+
+def downgrade():
+    # chunks shared by identical content cannot be split back per document
+    raise NotImplementedError('0001 is one-way; restore from a backup taken before upgrading')
@@ -1,47 +1,167 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi import BackgroundTasks
-from fastapi.responses import StreamingResponse, FileResponse, JSONResponse
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-import json, time
+import json, time, hmac, re, datetime
+from collections import OrderedDict
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import uuid
 import asyncio
+import contextvars
+from starlette.concurrency import run_in_threadpool
 from pathlib import Path
-from packages.ingestion.ingest import ingest_path
+from packages.ingestion.ingest import ingest_files
 from packages.rag.retriever import retrieve
+from packages.rag.qa_cache import get_qa_cache
 from packages.agents.graph import build_graph, GraphState
 from packages.tools.irule_parser import parse_irule
 from packages.tools.appshape_generator import generate_appshape
-from packages.db import SessionLocal, create_job, update_job_status, get_job, create_run, update_run, get_run, list_runs, list_jobs
-from packages.observability.logging import configure_logging
+from packages.tools.verifier import verify_script
+from packages.tools.datagroups import DataGroupError, convert_data_groups, group_name_and_type, normalize_type
+from packages.observability.logging import configure_logging, bind_log_context
 from packages.observability.tracing import configure_tracing, get_tracer
-from packages.settings import settings
+from packages.observability.metrics import counter, gauge, histogram, render_latest, CONTENT_TYPE_LATEST
+from packages.observability.profiling import MODES as PROFILE_MODES, RequestProfile, ContinuousSampler
+from packages.storage.blobstore import get_blob_store
+from packages.storage.runs import ARTIFACTS, offload_outputs, hydrate_outputs
+from packages.storage.export import FORMATS as EXPORT_FORMATS, export_runs
+from packages.settings import get_settings
+from packages.tenancy import current_tenant, key_digest, multi_tenant, tenant_for_key, tenant_scope
 import time
 
 app = FastAPI(title="ai-irule-migrator")
-# Static UI
-app.mount("/static", StaticFiles(directory="apps/api/static"), name="static")
+# Static UI (relative to this module, so the API also runs from other working directories)
+_STATIC = Path(__file__).resolve().parent / "static"
+app.mount("/static", StaticFiles(directory=_STATIC), name="static")
 
 @app.get("/")
 async def index():
-    return FileResponse("apps/api/static/index.html")
+    return FileResponse(_STATIC / "index.html")
+
+@app.get("/metrics")
+async def metrics():
+    return Response(render_latest(), media_type=CONTENT_TYPE_LATEST)
+
+_HTTP_SECONDS = histogram('http_request_duration_seconds', 'API request latency by route', ['method', 'route', 'status'])
+_HTTP_IN_PROGRESS = gauge('http_requests_in_progress', 'API requests currently being handled')
+_INGEST_QUEUE = gauge('ingest_jobs_in_flight', 'Ingest jobs queued or processing in this worker')
+_RATE_LIMIT = counter('rate_limit_decisions_total', 'Rate limiter decisions', ['decision'])
 
 # In-memory stubs (replace with DB / queue)
 INGEST_JOBS = None  # deprecated
 MIGRATE_RUNS = None
 
 _graph = None
+_graph_built = False
+
+_continuous_profiler: Optional[ContinuousSampler] = None
 
 @app.on_event('startup')
-async def _init_graph():
-    global _graph
+async def _init_logging():
+    global _continuous_profiler
+    settings = get_settings()
+    configure_logging(level=settings.log_level, queue_size=settings.log_queue_size, debug_sample_every=settings.log_debug_sample_every)
+    if settings.profiling_continuous_hz > 0:
+        _continuous_profiler = ContinuousSampler(hz=settings.profiling_continuous_hz, max_overhead=settings.profiling_continuous_max_overhead).start()
+
+def _get_graph():
+    """Build the LangGraph app on first use rather than at import/startup."""
+    global _graph, _graph_built
+    if not _graph_built:
+        try:
+            _graph = build_graph()
+        except Exception:
+            _graph = None
+        _graph_built = True
+    return _graph
+
+def _is_admin(request: Request) -> bool:
+    token = get_settings().admin_token
+    supplied = request.headers.get('x-admin-token')
+    return bool(token and supplied and hmac.compare_digest(token, supplied))
+
+def _profile_mode(request: Request) -> Optional[str]:
+    """Requested profiler (X-Profile header or ?profile=); None when not asked for."""
+    mode = request.headers.get('x-profile') or request.query_params.get('profile')
+    if not mode:
+        return None
+    if not _is_admin(request):
+        raise HTTPException(403, 'profiling requires a valid X-Admin-Token')
+    mode = 'sample' if mode.lower() in ('1', 'true', 'yes') else mode.lower()
+    if mode not in PROFILE_MODES:
+        raise HTTPException(400, f'profile must be one of {", ".join(PROFILE_MODES)}')
+    return mode
+
+def _request_profile(request: Request) -> RequestProfile:
+    return RequestProfile(_profile_mode(request), interval=get_settings().profiling_sample_interval_ms / 1000)
+
+async def _profiled(prof: RequestProfile, fn, *args):
+    """Run the synchronous part of a request, under `prof` when profiling was asked for.
+
+    A profiled call runs on a worker thread of its own and only that thread
+    is captured; on the event-loop thread the sampler and cProfile would also
+    record other requests' coroutines. Context variables (tenant, log
+    context, trace span) are carried over. Unprofiled calls run inline as before.
+    """
+    if prof.mode is None:
+        return fn(*args)
+    ctx = contextvars.copy_context()
+    return await run_in_threadpool(ctx.run, prof.call, fn, *args)
+
+def _save_profile(prof: RequestProfile) -> dict:
+    return {**get_blob_store().put(prof.data, content_type=prof.content_type), 'format': prof.ext}
+
+_RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)$')
+
+def _parse_range(header: Optional[str], size: int):
+    """(start, end) inclusive for a single `bytes=` range; None for the whole body.
+
+    Headers we do not parse (other units, several ranges) are ignored, as RFC 9110
+    allows, so the client gets a 200 with the full body; only an unsatisfiable
+    range is a 416.
+    """
+    if not header:
+        return None
+    m = _RANGE_RE.match(header.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    if m.group(1):
+        start = int(m.group(1))
+        end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+    else:  # suffix range: last N bytes
+        start, end = max(size - int(m.group(2)), 0), size - 1
+    if start >= size or start > end:
+        raise HTTPException(416, 'range not satisfiable', headers={'Content-Range': f'bytes */{size}'})
+    return start, end
+
+def _blob_response(ref: dict, request: Request, filename: str):
+    size = ref['size']
+    rng = _parse_range(request.headers.get('range'), size)
+    headers = {'Accept-Ranges': 'bytes', 'Content-Disposition': f'attachment; filename="{filename}"', 'ETag': f'"{ref["digest"]}"'}
+    store = get_blob_store()
+    if rng is None:
+        return StreamingResponse(store.iter_bytes(ref), media_type=ref['content_type'], headers={**headers, 'Content-Length': str(size)})
+    start, end = rng
+    headers.update({'Content-Range': f'bytes {start}-{end}/{size}', 'Content-Length': str(end - start + 1)})
+    return StreamingResponse(store.iter_bytes(ref, start, end), status_code=206, media_type=ref['content_type'], headers=headers)
+
+def _run_blob(run_id: str, name: str) -> dict:
+    from packages.db import SessionLocal, get_run
+    s = SessionLocal()
     try:
-        configure_logging()
-        configure_tracing()
-        _graph = build_graph()
-    except Exception:
-        _graph = None
+        run = get_run(s, run_id)
+        ref = ((run.outputs_json or {}).get('blobs') or {}).get(name) if run else None
+    finally:
+        s.close()
+    if not ref or not get_blob_store().exists(ref):
+        raise HTTPException(404, f'no {name} for run')
+    return ref
+
+def _tracer():
+    settings = get_settings()
+    configure_tracing(exporter=settings.otel_exporter, endpoint=settings.otel_exporter_endpoint)  # no-op once configured
+    return get_tracer('api')
 
 class IngestRequest(BaseModel):
     tags: Optional[List[str]] = None
@@ -54,36 +174,46 @@ class QARequest(BaseModel):
 
 @app.post('/v1/ingest')
 async def ingest(files: List[UploadFile] = File(...), tags: Optional[str] = None, replace: bool = False, background: BackgroundTasks = BackgroundTasks()):
-    tracer = get_tracer('api')
+    # packages.db (SQLAlchemy) is imported per handler so that importing the app stays cheap
+    from packages.db import SessionLocal, create_job, update_job_status
+    tracer = _tracer()
     with tracer.start_as_current_span('ingest_request'):
         session = SessionLocal()
         job = create_job(session, kind='ingest')
         session.commit()
         job_id = job.id
+        _INGEST_QUEUE.inc()
+        tenant_id = current_tenant()
         async def process(job_id: str):
             s = SessionLocal()
-            try:
-                update_job_status(s, job_id, 'processing')
-                s.commit()
-                tmp_dir = Path('storage/tmp')
-                tmp_dir.mkdir(parents=True, exist_ok=True)
-                for f in files:
-                    dest = tmp_dir / f.filename
-                    dest.write_bytes(await f.read())
-                res = ingest_path(str(tmp_dir), tags=tags.split(',') if tags else None, replace=replace)
-                update_job_status(s, job_id, 'completed', result={"indexed": res.files_indexed, "skipped": res.skipped})
-                s.commit()
-            except Exception as e:
-                update_job_status(s, job_id, 'failed', result={"error": str(e)})
-                s.commit()
-            finally:
-                s.close()
-        background.add_task(asyncio.create_task, process(job_id))
+            with tenant_scope(tenant_id), bind_log_context(job_id=job_id):
+                try:
+                    update_job_status(s, job_id, 'processing')
+                    s.commit()
+                    # stable per-tenant path per filename, so re-uploads become new versions
+                    upload_dir = Path(get_settings().object_store_path) / 'uploads' / tenant_id
+                    upload_dir.mkdir(parents=True, exist_ok=True)
+                    written = []
+                    for f in files:
+                        dest = upload_dir / Path(f.filename).name
+                        dest.write_bytes(await f.read())
+                        written.append(dest)
+                    res = ingest_files(written, tags=tags.split(',') if tags else None, replace=replace)
+                    update_job_status(s, job_id, 'completed', result={"indexed": res.files_indexed, "skipped": res.skipped, "deduplicated": res.deduplicated})
+                    s.commit()
+                except Exception as e:
+                    update_job_status(s, job_id, 'failed', result={"error": str(e)})
+                    s.commit()
+                finally:
+                    s.close()
+                    _INGEST_QUEUE.dec()
+        background.add_task(process, job_id)
         session.close()
         return {"job_id": job_id}
 
 @app.get('/v1/ingest/{job_id}')
 async def ingest_status(job_id: str):
+    from packages.db import SessionLocal, get_job
     s = SessionLocal()
     try:
         job = get_job(s, job_id)
@@ -94,51 +224,163 @@ async def ingest_status(job_id: str):
         s.close()
 
 @app.post('/v1/migrate')
-async def migrate(file: UploadFile = File(...)):
-    if file.size and (file.size / (1024*1024)) > settings.max_file_size_mb:
-        raise HTTPException(413, 'file too large')
-    tracer = get_tracer('api')
+async def migrate(request: Request, file: UploadFile = File(...), data_groups: Optional[List[UploadFile]] = File(None),
+                  data_group_types: Optional[str] = Form(None), tags: Optional[str] = None, batch: Optional[str] = None):
+    from packages.db import SessionLocal, create_run, get_run, update_run
+    from packages.analytics import record_run as record_run_stats
+    limit_mb = get_settings().max_file_size_mb
+    for f in [file, *(data_groups or [])]:
+        if f.size and (f.size / (1024*1024)) > limit_mb:
+            raise HTTPException(413, f'{f.filename or "file"} too large')
+    prof = _request_profile(request)
+    tracer = _tracer()
     with tracer.start_as_current_span('migrate_request'):
-        session = SessionLocal()
-        run = create_run(session, type_='migrate', status='processing')
-        session.commit()
-        run_id = run.id
         code = (await file.read()).decode('utf-8', errors='ignore')
-        if _graph:
-            from packages.agents.graph import GraphState  # local import to avoid circular
-            state = GraphState(irule_code=code)
-            result = _graph.invoke(state)  # type: ignore
-            update_run(session, run_id, status='completed', outputs_json={'report': result.report, 'script': result.script})
-        else:
-            parsed = parse_irule(code)
-            gen = generate_appshape(parsed['ast'], {"status": "partial"})
-            update_run(session, run_id, status='completed', outputs_json={'report': {"diagnostics": parsed['diagnostics']}, 'script': gen['code']})
-        session.commit()
-        session.close()
-        return {"run_id": run_id}
+        # external data-group files referenced by `class` commands; the file name is the group name and
+        # may carry the type (blocked.ip.class); `data_group_types` (name=type,...) overrides it
+        sources: Dict[str, str] = {}
+        types: Dict[str, str] = {}
+        try:
+            for i, f in enumerate(data_groups or []):
+                name, type_ = group_name_and_type(f.filename or f'group{i}')
+                sources[name] = (await f.read()).decode('utf-8', errors='replace')
+                if type_:
+                    types[name] = type_
+            for pair in filter(None, (p.strip() for p in (data_group_types or '').split(','))):
+                name, sep, type_ = pair.partition('=')
+                if not sep:
+                    raise DataGroupError(f'expected name=type in data_group_types, got {pair!r}')
+                types[name.strip()] = normalize_type(type_.strip())
+            if set(types) - set(sources):
+                raise DataGroupError(f'data_group_types names unknown groups: {", ".join(sorted(set(types) - set(sources)))}')
+        except DataGroupError as e:
+            raise HTTPException(400, f'invalid data group: {e}')
+
+        def work(session) -> str:
+            run = create_run(session, type_='migrate', status='processing', inputs={'filename': file.filename},
+                             tags=tags.split(',') if tags else None, batch_id=batch)
+            session.commit()
+            run_id = run.id
+            graph = _get_graph()
+            with bind_log_context(run_id=run_id):
+                try:
+                    if graph:
+                        from packages.agents.graph import GraphState  # local import to avoid circular
+                        state = GraphState(irule_code=code, data_groups=sources, data_group_types=types)
+                        result = graph.invoke(state)  # type: ignore
+                        update_run(session, run_id, status='completed', outputs_json=offload_outputs(
+                            {'report': result.report, 'script': result.script, 'datagroups': result.datagroups_script}))
+                        record_run_stats(session, run_id, result.ast, result.mapping)
+                    else:
+                        parsed = parse_irule(code)
+                        gen = generate_appshape(parsed['ast'], {"status": "partial"})
+                        checked = verify_script(gen['code'])
+                        dg = convert_data_groups(parsed['ast'], sources, types)
+                        report = {"diagnostics": parsed['diagnostics'], "verification": checked['verification'],
+                                  "verified_lines": checked['lines'], "confidence": checked['confidence']}
+                        if dg['groups'] or dg['lookups']:
+                            report['data_groups'] = {'groups': dg['groups'], 'lookups': dg['lookups']}
+                        update_run(session, run_id, status='completed', outputs_json=offload_outputs(
+                            {'report': report, 'script': gen['code'], 'datagroups': dg['code'] or None}))
+                        record_run_stats(session, run_id, parsed['ast'], gen['mapping'])
+                except DataGroupError as e:
+                    update_run(session, run_id, status='failed', outputs_json={'error': str(e)})
+                    session.commit()
+                    raise HTTPException(400, f'invalid data group: {e}')
+            session.commit()
+            return run_id
+
+        session = SessionLocal()
+        try:
+            run_id = await _profiled(prof, work, session)
+            if prof.data is not None:
+                run = get_run(session, run_id)
+                outputs = run.outputs_json or {}
+                update_run(session, run_id, outputs_json={**outputs, 'blobs': {**outputs.get('blobs', {}), 'profile': _save_profile(prof)}})
+                session.commit()
+        finally:
+            session.close()
+    return {"run_id": run_id}
 
 @app.get('/v1/migrate/{run_id}')
 async def migrate_status(run_id: str):
+    from packages.db import SessionLocal, get_run
     s = SessionLocal()
     try:
         run = get_run(s, run_id)
         if not run:
             raise HTTPException(404, 'run not found')
-        return {"id": run.id, "status": run.status, "outputs": run.outputs_json}
+        return {"id": run.id, "status": run.status, "outputs": hydrate_outputs(run.outputs_json)}
     finally:
         s.close()
 
 @app.post('/v1/qa')
-async def qa(req: QARequest):
-    if _graph:
-        state = GraphState(question=req.question)
-        result = _graph.invoke(state)  # type: ignore
-        return {"answer": result.answer, "citations": result.citations or []}
-    rr = retrieve(req.question, tags=req.tags, top_k=req.top_k)
-    return {"answer": "Placeholder answer", "citations": rr.citations}
+async def qa(req: QARequest, request: Request):
+    prof = _request_profile(request)
+
+    def work() -> Dict[str, Any]:
+        graph = _get_graph()
+        if graph:
+            state = GraphState(question=req.question)
+            result = graph.invoke(state)  # type: ignore
+            return {"answer": result.answer, "citations": result.citations or [], "cache": result.qa_cache}
+        def compute(query_embedding):
+            rr = retrieve(req.question, tags=req.tags, top_k=req.top_k, query_embedding=query_embedding)
+            return {"answer": "Placeholder answer", "citations": rr.citations}
+        cached = get_qa_cache().answer(req.question, compute, tags=req.tags, top_k=req.top_k)
+        return {"answer": cached["answer"], "citations": cached["citations"], "cache": cached["cache"]}
+
+    out = await _profiled(prof, work)
+    if prof.data is not None:
+        # profiled QA requests get a Run so the profile has somewhere to live
+        from packages.db import SessionLocal, create_run
+        s = SessionLocal()
+        try:
+            run = create_run(s, type_='qa', status='completed', inputs={'question': req.question})
+            run.outputs_json = {'answer': out['answer'], 'blobs': {'profile': _save_profile(prof)}}
+            s.commit()
+            out['run_id'] = run.id
+        finally:
+            s.close()
+    return out
+
+@app.get('/v1/runs/{run_id}/profile')
+async def run_profile(run_id: str, request: Request):
+    if not _is_admin(request):
+        raise HTTPException(403, 'admin only')
+    ref = _run_blob(run_id, 'profile')
+    return _blob_response(ref, request, f"{run_id}.{ref['format']}")
+
+@app.get('/v1/runs/{run_id}/artifacts/{name}')
+async def run_artifact(run_id: str, name: str, request: Request):
+    """Stream a run artifact (script, report, datagroups); honours single `Range: bytes=` requests."""
+    if name not in ARTIFACTS:
+        raise HTTPException(404, 'unknown artifact')
+    ref = _run_blob(run_id, name)
+    return _blob_response(ref, request, f'{run_id}.{ARTIFACTS[name][1]}')
+
+@app.get('/v1/admin/profile/continuous')
+async def continuous_profile(request: Request, reset: bool = False):
+    if not _is_admin(request):
+        raise HTTPException(403, 'admin only')
+    if _continuous_profiler is None:
+        raise HTTPException(404, 'continuous profiling disabled (set PROFILING_CONTINUOUS_HZ)')
+    return Response(_continuous_profiler.snapshot(reset=reset), media_type='text/plain; charset=utf-8')
+
+@app.get('/v1/admin/qa-cache')
+async def qa_cache_stats(request: Request, reset: bool = False, audits: int = 50):
+    """Semantic QA cache hit rates, saved compute time and false-hit audits per tenant."""
+    if not _is_admin(request):
+        raise HTTPException(403, 'admin only')
+    cache = get_qa_cache()
+    stats = cache.stats(recent_audits=audits)
+    if reset:
+        cache.reset()
+    return stats
 
 @app.get('/v1/runs')
 async def runs():
+    from packages.db import SessionLocal, list_runs, list_jobs
     s = SessionLocal()
     try:
         runs_ = list_runs(s, limit=100)
@@ -149,47 +391,155 @@ async def runs():
     finally:
         s.close()
 
+@app.get('/v1/export')
+async def export(format: str = 'zip', since: Optional[str] = None, until: Optional[str] = None,
+                 tag: Optional[str] = None, batch: Optional[str] = None):
+    """Stream scripts, reports and a coverage summary of completed migrations as zip or tar.gz."""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(400, f'format must be one of {", ".join(EXPORT_FORMATS)}')
+    try:
+        since_dt = datetime.datetime.fromisoformat(since) if since else None
+        until_dt = datetime.datetime.fromisoformat(until) if until else None
+    except ValueError:
+        raise HTTPException(400, 'since/until must be ISO 8601 date or date-time')
+    chunks = export_runs(format, since=since_dt, until=until_dt, tags=tag.split(',') if tag else None, batch_id=batch)
+    media_type, ext = EXPORT_FORMATS[format]
+    label = re.sub(r'[^\w.-]', '_', batch) if batch else datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+    name = f'runs-{label}.{ext}'
+    return StreamingResponse(chunks, media_type=media_type, headers={'Content-Disposition': f'attachment; filename="{name}"'})
+
+@app.get('/v1/analytics/gaps')
+async def analytics_gaps(kind: Optional[str] = None, limit: int = 20):
+    """Most frequent unmapped commands / unsupported events across all runs."""
+    from packages.db import SessionLocal
+    from packages.analytics import KINDS as GAP_KINDS, top_gaps
+    if kind and kind not in GAP_KINDS:
+        raise HTTPException(400, f'kind must be one of {", ".join(GAP_KINDS)}')
+    s = SessionLocal()
+    try:
+        return {"items": top_gaps(s, kind=kind, limit=max(1, min(limit, 500)))}
+    finally:
+        s.close()
+
+@app.get('/v1/analytics/coverage')
+async def analytics_coverage(days: int = 30):
+    from packages.db import SessionLocal
+    from packages.analytics import coverage_trend
+    s = SessionLocal()
+    try:
+        return {"items": coverage_trend(s, days=max(1, min(days, 3660)))}
+    finally:
+        s.close()
+
+@app.get('/v1/analytics/what-if')
+async def analytics_what_if(commands: str):
+    """Coverage gain if the comma-separated `commands` were added to capability_map.json."""
+    names = [c.strip() for c in commands.split(',') if c.strip()]
+    if not names:
+        raise HTTPException(400, 'commands is required')
+    from packages.db import SessionLocal
+    from packages.analytics import what_if
+    s = SessionLocal()
+    try:
+        return what_if(s, names)
+    finally:
+        s.close()
+
 @app.get('/v1/migrate/{run_id}/stream')
 async def migrate_stream(run_id: str):
+    from packages.db import SessionLocal, get_run_status
     async def event_stream():
         while True:
             s = SessionLocal()
             try:
-                run = get_run(s, run_id)
-                if not run:
+                status = get_run_status(s, run_id)
+                if status is None:
                     yield f"event: error\ndata: {json.dumps({'error':'not found'})}\n\n"
                     return
-                payload = {"id": run.id, "status": run.status}
+                payload = {"id": run_id, "status": status}
                 yield f"data: {json.dumps(payload)}\n\n"
-                if run.status in ('completed','failed'):
+                if status in ('completed','failed'):
                     return
             finally:
                 s.close()
             await asyncio.sleep(1)
     return StreamingResponse(event_stream(), media_type='text/event-stream')
 
-# Rate limiter store (simple in-memory token bucket per IP)
-_rate_state = {}
+# Rate limiter store (simple in-memory token bucket per client IP, per API key in multi-tenant mode).
+# Ordered by last use: buckets idle for a full window have refilled and are dropped
+# (a fresh bucket is identical), and the store never exceeds rate_limit_max_buckets.
+_rate_state: "OrderedDict[str, dict]" = OrderedDict()
 
 def rate_limiter(ip: str):
+    settings = get_settings()
     now = time.time()
     conf_window = 60
     refill_rate = settings.rate_limit_per_min / conf_window
-    bucket = _rate_state.get(ip, {"tokens": settings.rate_limit_per_min, "ts": now})
+    bucket = _rate_state.pop(ip, None) or {"tokens": settings.rate_limit_per_min, "ts": now}
+    while _rate_state:
+        oldest = next(iter(_rate_state.values()))
+        if oldest['ts'] > now - conf_window and len(_rate_state) < settings.rate_limit_max_buckets:
+            break
+        _rate_state.popitem(last=False)
     elapsed = now - bucket['ts']
     bucket['tokens'] = min(settings.rate_limit_per_min, bucket['tokens'] + elapsed * refill_rate)
     bucket['ts'] = now
+    _rate_state[ip] = bucket
     if bucket['tokens'] < 1:
-        _rate_state[ip] = bucket
+        _RATE_LIMIT.labels('rejected').inc()
         raise HTTPException(429, 'rate limit exceeded')
     bucket['tokens'] -= 1
-    _rate_state[ip] = bucket
+    _RATE_LIMIT.labels('allowed').inc()
 
 @app.middleware('http')
 async def _rl_mw(request, call_next):
-    client_ip = request.client.host if request.client else 'unknown'
+    key = getattr(request.state, 'rate_key', None) or (request.client.host if request.client else 'unknown')
     try:
-        rate_limiter(client_ip)
+        rate_limiter(key)
     except HTTPException as e:
         return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
     return await call_next(request)
+
+def _api_key(request: Request) -> Optional[str]:
+    supplied = request.headers.get(get_settings().api_key_header)
+    if supplied:
+        return supplied
+    scheme, _, token = request.headers.get('authorization', '').partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' else None
+
+# Outside the rate limiter: the caller's key must be known before its bucket is charged
+@app.middleware('http')
+async def _tenant_mw(request, call_next):
+    tenant = None
+    if multi_tenant() and request.url.path.startswith('/v1/'):
+        settings = get_settings()
+        key = _api_key(request)
+        tenant = tenant_for_key(key)
+        if tenant is None:
+            return JSONResponse(status_code=401, content={"detail": f'missing or invalid {settings.api_key_header}'},
+                                headers={'WWW-Authenticate': 'Bearer'})
+        claimed = request.headers.get(settings.tenant_header)
+        if claimed and claimed != tenant:
+            return JSONResponse(status_code=403, content={"detail": f'{settings.tenant_header} does not match the API key'})
+        request.state.rate_key = 'key:' + key_digest(key)[:16]
+    with tenant_scope(tenant), bind_log_context(tenant_id=tenant):
+        return await call_next(request)
+
+_rate_buckets = gauge('rate_limit_buckets', 'Client buckets tracked by the rate limiter')
+_rate_buckets.set_function(lambda: len(_rate_state))
+
+# Registered last so it wraps the rate limiter and sees 429s too
+@app.middleware('http')
+async def _metrics_mw(request, call_next):
+    start = time.perf_counter()
+    status = 500
+    _HTTP_IN_PROGRESS.inc()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        _HTTP_IN_PROGRESS.dec()
+        route = request.scope.get('route')
+        path = getattr(route, 'path', None) or 'unmatched'
+        _HTTP_SECONDS.labels(request.method, path, status).observe(time.perf_counter() - start)
@@ -0,0 +1,195 @@
+"""Offline stand-ins for network-backed components."""
+from __future__ import annotations
+import base64, hashlib, json, random, re, struct, threading, time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Sequence
+
+_TOKEN = re.compile(r'[A-Za-z0-9_]+')
+
+
+class FakeEmbedder:
+    """Deterministic hashed bag-of-words vectors (float32 bytes, L2-normalised).
+
+    Similar texts get similar vectors, so retrieval behaves plausibly without
+    calling a real embedding model.
+    """
+
+    def __init__(self, dim: int = 256, latency: Optional['Latency'] = None):
+        self.dim = dim
+        self.latency = latency  # per-call delay, standing in for the embedding API round trip
+
+    def vector(self, text: str) -> List[float]:
+        vec = [0.0] * self.dim
+        for tok in _TOKEN.findall(text.lower()):
+            h = int.from_bytes(hashlib.blake2b(tok.encode(), digest_size=8).digest(), 'little')
+            vec[h % self.dim] += 1.0 if (h >> 63) else -1.0
+        norm = sum(v * v for v in vec) ** 0.5 or 1.0
+        return [v / norm for v in vec]
+
+    def __call__(self, texts: Sequence[str]) -> List[bytes]:
+        if self.latency is not None and texts:
+            time.sleep(self.latency.sample())
+        return [struct.pack(f'<{self.dim}f', *self.vector(t)) for t in texts]
+
+
+class Latency:
+    """Latency distribution parsed from a spec, in milliseconds.
+
+    `fixed:20`, `uniform:10,50`, `normal:40,10` (mean, stddev),
+    `lognormal:30,0.6` (median, sigma; long tail like real LLM APIs),
+    `exp:25` (mean). `0` or an empty spec means no delay.
+    """
+
+    KINDS = ('fixed', 'uniform', 'normal', 'lognormal', 'exp')
+
+    def __init__(self, spec: str = '0', seed: Optional[int] = None):
+        kind, _, params = (spec or '0').partition(':')
+        if not params:
+            kind, params = 'fixed', kind
+        if kind not in self.KINDS:
+            raise ValueError(f'unknown latency distribution {kind!r} (one of {", ".join(self.KINDS)})')
+        try:
+            self.params = [float(p) for p in params.split(',')]
+        except ValueError:
+            raise ValueError(f'bad latency spec {spec!r}') from None
+        if len(self.params) != (2 if kind in ('uniform', 'normal', 'lognormal') else 1):
+            raise ValueError(f'bad latency spec {spec!r}')
+        self.kind, self.spec = kind, spec
+        self._rnd = random.Random(seed)
+
+    def sample(self) -> float:
+        """One delay in seconds (never negative)."""
+        p, r = self.params, self._rnd
+        if self.kind == 'fixed':
+            ms = p[0]
+        elif self.kind == 'uniform':
+            ms = r.uniform(p[0], p[1])
+        elif self.kind == 'normal':
+            ms = r.gauss(p[0], p[1])
+        elif self.kind == 'lognormal':
+            ms = p[0] * r.lognormvariate(0.0, p[1]) if p[0] > 0 else 0.0
+        else:
+            ms = r.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0
+        return max(0.0, ms) / 1000
+
+
+class FakeLLMServer:
+    """OpenAI-compatible HTTP stand-in (`/v1/embeddings`, `/v1/chat/completions`, `/v1/models`).
+
+    Embeddings come from `FakeEmbedder`; chat completions return a short
+    deterministic answer (streamed as SSE chunks when `stream` is set). Every
+    request first sleeps for a sample of its latency distribution. Point the
+    real client at it with `OPENAI_BASE_URL=<server.url>` and any API key.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, embed_latency: str = '0', chat_latency: str = '0',
+                 dim: int = 256, seed: Optional[int] = None):
+        self.embedder = FakeEmbedder(dim)
+        self.embed_latency = Latency(embed_latency, seed)
+        self.chat_latency = Latency(chat_latency, None if seed is None else seed + 1)
+        self.requests: Counter = Counter()
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self) -> 'FakeLLMServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fake-llm', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _count(self, path: str):
+        with self._lock:
+            self.requests[path] += 1
+
+    def embeddings(self, body: dict) -> dict:
+        time.sleep(self.embed_latency.sample())
+        inputs = body.get('input') or []
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        data = []
+        for i, text in enumerate(inputs):
+            vec = self.embedder.vector(text if isinstance(text, str) else ' '.join(map(str, text)))
+            emb = base64.b64encode(struct.pack(f'<{len(vec)}f', *vec)).decode() if body.get('encoding_format') == 'base64' else vec
+            data.append({'object': 'embedding', 'index': i, 'embedding': emb})
+        tokens = sum(len(_TOKEN.findall(t)) for t in inputs if isinstance(t, str))
+        return {'object': 'list', 'data': data, 'model': body.get('model', 'fake-embed'),
+                'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}}
+
+    def chat(self, body: dict) -> dict:
+        time.sleep(self.chat_latency.sample())
+        messages = body.get('messages') or [{}]
+        prompt = str(messages[-1].get('content') or '')
+        text = 'Stand-in answer: ' + ' '.join(prompt.split()[:24])
+        tokens = len(_TOKEN.findall(prompt))
+        return {'id': 'chatcmpl-fake-' + hashlib.blake2b(prompt.encode(), digest_size=6).hexdigest(),
+                'object': 'chat.completion', 'created': int(time.time()), 'model': body.get('model', 'fake-chat'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': tokens, 'completion_tokens': len(text.split()),
+                          'total_tokens': tokens + len(text.split())}}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload: dict):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, completion: dict):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                base = {k: completion[k] for k in ('id', 'created', 'model')}
+                for word in completion['choices'][0]['message']['content'].split(' '):
+                    chunk = {**base, 'object': 'chat.completion.chunk',
+                             'choices': [{'index': 0, 'delta': {'content': word + ' '}, 'finish_reason': None}]}
+                    self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+                done = {**base, 'object': 'chat.completion.chunk', 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}
+                self.wfile.write(f'data: {json.dumps(done)}\n\ndata: [DONE]\n\n'.encode())
+                self.close_connection = True
+
+            def do_GET(self):
+                if self.path.rstrip('/').endswith('/models'):
+                    server._count('models')
+                    return self._send(200, {'object': 'list', 'data': [{'id': m, 'object': 'model', 'owned_by': 'fake'}
+                                                                      for m in ('fake-chat', 'fake-embed')]})
+                self._send(404, {'error': {'message': f'unknown path {self.path}', 'type': 'invalid_request_error'}})
+
+            def do_POST(self):
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+                except ValueError:
+                    return self._send(400, {'error': {'message': 'invalid JSON body', 'type': 'invalid_request_error'}})
+                if self.path.endswith('/embeddings'):
+                    server._count('embeddings')
+                    return self._send(200, server.embeddings(body))
+                if self.path.endswith('/chat/completions'):
+                    server._count('chat')
+                    completion = server.chat(body)
+                    return self._stream(completion) if body.get('stream') else self._send(200, completion)
+                self._send(404, {'error': {'message': f'unknown path {self.path}', 'type': 'invalid_request_error'}})
+
+        return Handler
@@ -0,0 +1,83 @@
+"""Startup cost guard based on `python -X importtime`.
+
+Each target is imported in a fresh interpreter. The run fails if a target
+pulls in a module it must not (e.g. the parser loading SQLAlchemy) or if its
+cumulative import time exceeds its budget. Budgets are generous absolute
+numbers for CI boxes; pass --baseline with a previous --out file to fail on
+relative regressions instead.
+Run: python -m benchmarks.import_time [--out result.json] [--baseline prev.json]
+"""
+import argparse, json, os, re, subprocess, sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# module -> (budget ms, modules that must stay unloaded)
+TARGETS = {
+    'packages.tools.irule_parser': (150, ['sqlalchemy', 'pydantic', 'fastapi', 'langgraph', 'opentelemetry.sdk']),
+    'packages.tools.appshape_generator': (150, ['sqlalchemy', 'pydantic', 'fastapi', 'langgraph', 'opentelemetry.sdk']),
+    'packages.ingestion.ingest': (200, ['sqlalchemy', 'pydantic', 'langgraph', 'opentelemetry.sdk']),
+    'packages.db': (1500, ['psycopg', 'pydantic', 'langgraph', 'opentelemetry.sdk']),
+    'apps.api.main': (3000, ['sqlalchemy', 'langgraph', 'opentelemetry.sdk', 'psycopg']),
+}
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure(module: str) -> dict:
+    probe = f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe], cwd=ROOT,
+                          capture_output=True, text=True, env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'})
+    if proc.returncode != 0:
+        raise RuntimeError(f'import of {module} failed:\n{proc.stderr[-2000:]}')
+    cumulative_us = 0
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m and m.group(4) == module:
+            cumulative_us = int(m.group(2))
+    loaded = set(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return {'ms': cumulative_us / 1000, 'loaded': loaded}
+
+
+def run(repeat: int = 3) -> dict:
+    results = {}
+    for module, (budget, forbidden) in TARGETS.items():
+        samples = [measure(module) for _ in range(repeat)]
+        results[module] = {
+            'ms': min(s['ms'] for s in samples),
+            'budget_ms': budget,
+            'unexpected_modules': sorted(f for f in forbidden if f in samples[0]['loaded']),
+        }
+    return results
+
+
+def check(results: dict, baseline: dict | None, tolerance: float) -> list:
+    failures = []
+    for module, r in results.items():
+        if r['unexpected_modules']:
+            failures.append(f"{module} imports {', '.join(r['unexpected_modules'])}")
+        if baseline and module in baseline:
+            limit = baseline[module]['ms'] * (1 + tolerance)
+            if r['ms'] > limit:
+                failures.append(f"{module}: {r['ms']:.1f} ms > baseline {baseline[module]['ms']:.1f} ms +{tolerance:.0%}")
+        elif r['ms'] > r['budget_ms']:
+            failures.append(f"{module}: {r['ms']:.1f} ms > budget {r['budget_ms']} ms")
+    return failures
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--out')
+    ap.add_argument('--baseline')
+    ap.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown vs --baseline')
+    args = ap.parse_args()
+    results = run(args.repeat)
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2))
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    failures = check(results, baseline, args.tolerance)
+    print(json.dumps(results, indent=2))
+    for f in failures:
+        print(f'FAIL {f}', file=sys.stderr)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,520 @@
+"""Open-loop load test of the API against local stand-ins.
+
+Boots `apps.api.main:app` under uvicorn in a child process on SQLite
+(`--db sqlite`, or `--db memory` for a database file on a RAM disk), the
+embedded vector store and a fake LLM: either the in-process fake embedder
+(`--llm inproc`) or the real OpenAI client talking to `FakeLLMServer`
+(`--llm http`), with configurable latency distributions. No Postgres or
+OpenAI access is needed.
+
+A weighted mix of migrate, qa, ingest, runs listing and SSE status streams is
+fired at Poisson arrival times for each RPS step, whether or not earlier
+requests have finished (open loop), so saturation shows up as latency and
+errors instead of a quietly lower request rate. Each step reports per-endpoint
+throughput, p50/p90/p99, error rate and the server's CPU, RSS, threads and
+open fds. The knee of an endpoint is the last step where it still kept up:
+errors within `--max-error-rate`, throughput within 10% of the offered rate
+and p99 within `--knee-factor` times its p99 at the first step.
+
+Run: python -m benchmarks.loadtest --rps 5,10,20,40 --duration 20 --out load.json
+     python -m benchmarks.loadtest --mix qa=1 --llm http --embed-latency lognormal:40,0.6 --rps 10,50,100
+     python -m benchmarks.loadtest --target http://staging:8080 --rps 20   # existing deployment, no stand-ins
+     python -m benchmarks.loadtest serve --port 8080 --llm http            # only boot the API on stand-ins
+     python -m benchmarks.loadtest fake-llm --port 8099 --chat-latency lognormal:800,0.5
+"""
+from __future__ import annotations
+import argparse, asyncio, json, os, random, socket, subprocess, sys, tempfile, threading, time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks.fakes import FakeEmbedder, FakeLLMServer, Latency
+from benchmarks.suite import metric, percentile, use_offline_stack
+from benchmarks.synth import IRuleSpec, synth_irule, synth_paragraph, synth_questions
+
+ENDPOINTS = ('migrate', 'qa', 'ingest', 'runs', 'sse')
+DEFAULT_MIX = 'migrate=3,qa=4,ingest=1,runs=1,sse=1'
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        name, _, weight = part.partition('=')
+        if name not in ENDPOINTS:
+            raise ValueError(f'unknown endpoint {name!r} in --mix (one of {", ".join(ENDPOINTS)})')
+        mix[name] = float(weight or 1)
+    if not any(w > 0 for w in mix.values()):
+        raise ValueError('--mix needs at least one positive weight')
+    return {n: w for n, w in mix.items() if w > 0}
+
+
+# --- stand-in server -----------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _database_url(db: str, workdir: Path) -> str:
+    if db == 'memory':
+        # a RAM-disk file keeps real SQL semantics across connections, unlike sqlite:// (one DB per connection)
+        shm = Path('/dev/shm')
+        if shm.is_dir():
+            return f"sqlite:///{shm / f'irule-load-{os.getpid()}.db'}"
+        print('no /dev/shm here; --db memory falls back to a file in the work dir', file=sys.stderr)
+    return f"sqlite:///{workdir / 'load.db'}"
+
+
+def serve(args) -> int:
+    """Run the API on stand-ins in this process (the child side of a load run)."""
+    import uvicorn
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix='irule-load-')).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+    llm_url = args.llm_url
+    if args.llm == 'http':
+        import importlib.util
+        if importlib.util.find_spec('openai') is None:
+            print('--llm http drives the real OpenAI client; pip install openai (or use --llm inproc)', file=sys.stderr)
+            return 2
+        if not llm_url:
+            llm_url = FakeLLMServer(embed_latency=args.embed_latency, chat_latency=args.chat_latency, seed=args.seed).start().url
+    db_url = args.database_url or _database_url(args.db, workdir)
+    use_offline_stack(workdir, db_url, embedder=FakeEmbedder(latency=Latency(args.embed_latency, args.seed)),
+                      llm_base_url=llm_url if args.llm == 'http' else None)
+    from apps.api.main import app
+    print(f'serving on http://{args.host}:{args.port} (db {db_url}, llm {llm_url or "inproc"}, workdir {workdir})', file=sys.stderr)
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning', access_log=False)
+    return 0
+
+
+def fake_llm(args) -> int:
+    server = FakeLLMServer(args.host, args.port, embed_latency=args.embed_latency, chat_latency=args.chat_latency, seed=args.seed)
+    print(f'fake OpenAI-compatible API on {server.url}', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+class _Child:
+    """A `python -m benchmarks.loadtest <command>` subprocess, logging to a file in the work dir."""
+
+    def __init__(self, name: str, argv: List[str], workdir: Path):
+        self.log_path = workdir / f'{name}.log'
+        env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get('PYTHONPATH')]))}
+        with open(self.log_path, 'wb') as log:
+            self.proc = subprocess.Popen([sys.executable, '-m', 'benchmarks.loadtest', *argv], cwd=workdir, env=env,
+                                         stdout=log, stderr=subprocess.STDOUT)
+
+    def wait_http(self, url: str, timeout: float = 60.0):
+        import httpx
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                break
+            try:
+                httpx.get(url, timeout=1.0)
+                return
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        self.stop()
+        tail = self.log_path.read_text(errors='replace')[-2000:]
+        raise RuntimeError(f'{url} did not come up:\n{tail}')
+
+    def stop(self):
+        if self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+# --- resource sampling ---------------------------------------------------------
+
+def _proc_snapshot(pid: int) -> Optional[dict]:
+    """CPU seconds, RSS bytes, threads and open fds of `pid` (psutil if installed, else /proc; None elsewhere)."""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    try:
+        if psutil is not None:
+            p = psutil.Process(pid)
+            t = p.cpu_times()
+            return {'cpu': t.user + t.system, 'rss': p.memory_info().rss, 'threads': p.num_threads(),
+                    'fds': p.num_fds() if hasattr(p, 'num_fds') else None}
+        fields = Path(f'/proc/{pid}/stat').read_text().rpartition(')')[2].split()
+        ticks = os.sysconf('SC_CLK_TCK')
+        return {'cpu': (int(fields[11]) + int(fields[12])) / ticks, 'rss': int(fields[21]) * os.sysconf('SC_PAGE_SIZE'),
+                'threads': int(fields[17]), 'fds': len(os.listdir(f'/proc/{pid}/fd'))}
+    except Exception:
+        return None
+
+
+class ResourceSampler:
+    """Samples a process in a background thread; `window(start, end)` summarises a time range."""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.5):
+        self.pid, self.interval = pid, interval
+        self.samples: deque = deque()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='load-sampler', daemon=True)
+
+    def start(self) -> 'ResourceSampler':
+        if self.pid is not None:
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            snap = _proc_snapshot(self.pid)
+            if snap is not None:
+                self.samples.append((time.monotonic(), snap))
+            self._stop.wait(self.interval)
+
+    def window(self, start: float, end: float) -> Optional[dict]:
+        rows = [(t, s) for t, s in list(self.samples) if start <= t <= end]
+        if len(rows) < 2:
+            return None
+        cpu = [(b[1]['cpu'] - a[1]['cpu']) / (b[0] - a[0]) * 100 for a, b in zip(rows, rows[1:]) if b[0] > a[0]]
+        fds = [s['fds'] for _, s in rows if s['fds'] is not None]
+        return {'cpu_pct': round((rows[-1][1]['cpu'] - rows[0][1]['cpu']) / (rows[-1][0] - rows[0][0]) * 100, 1),
+                'cpu_pct_max': round(max(cpu), 1) if cpu else None,
+                'rss_mb_max': round(max(s['rss'] for _, s in rows) / 2**20, 1),
+                'threads_max': max(s['threads'] for _, s in rows),
+                'fds_max': max(fds) if fds else None}
+
+
+# --- workload ------------------------------------------------------------------
+
+class Workload:
+    """Request builders for each endpoint, plus the run ids SSE streams follow."""
+
+    def __init__(self, seed: int, questions: int, ingest_paragraphs: int):
+        self.rules = [synth_irule(IRuleSpec(seed=seed + i)) for i in range(32)]
+        self.questions = synth_questions(questions, seed)
+        self.ingest_paragraphs = ingest_paragraphs
+        self.seed = seed
+        self.run_ids: deque = deque(maxlen=256)
+        self.job_ids: List[str] = []
+        self.qa_cache: Counter = Counter()
+
+    async def migrate(self, client, i: int):
+        resp = await client.post('/v1/migrate', files={'file': (f'load{i}.tcl', self.rules[i % len(self.rules)].encode(), 'text/plain')})
+        if resp.status_code == 200:
+            self.run_ids.append(resp.json()['run_id'])
+        return resp.status_code
+
+    async def qa(self, client, i: int):
+        resp = await client.post('/v1/qa', json={'question': self.questions[i % len(self.questions)]})
+        if resp.status_code == 200:
+            self.qa_cache[resp.json().get('cache') or 'none'] += 1
+        return resp.status_code
+
+    async def ingest(self, client, i: int):
+        rnd = random.Random(self.seed * 1_000_003 + i)  # distinct bytes per request, so nothing is deduplicated
+        body = '\n\n'.join(synth_paragraph(rnd, 60) for _ in range(self.ingest_paragraphs))
+        resp = await client.post('/v1/ingest', files=[('files', (f'load-{self.seed}-{i}.md', f'# Load doc {i}\n\n{body}\n'.encode(), 'text/markdown'))])
+        if resp.status_code == 200:
+            self.job_ids.append(resp.json()['job_id'])
+        return resp.status_code
+
+    async def runs(self, client, i: int):
+        return (await client.get('/v1/runs')).status_code
+
+    async def sse(self, client, i: int):
+        """Follow a recent run's status stream until the server closes it."""
+        if not self.run_ids:
+            return 'no_run'
+        run_id = self.run_ids[i % len(self.run_ids)]
+        async with client.stream('GET', f'/v1/migrate/{run_id}/stream') as resp:
+            events = 0
+            async for line in resp.aiter_lines():
+                events += line.startswith('data:')
+            return resp.status_code if events or resp.status_code >= 400 else 'no_events'
+
+
+class _Stats:
+    def __init__(self):
+        self.sent = 0
+        self.latencies: List[float] = []
+        self.errors: Counter = Counter()
+
+    def row(self, target_rps: float, duration: float, elapsed: float) -> dict:
+        """`offered_rps` is what actually arrived (Poisson noise included); stragglers past `duration` lower throughput."""
+        ok = len(self.latencies)
+        ms = [s * 1000 for s in self.latencies]
+        return {'sent': self.sent, 'ok': ok, 'errors': dict(self.errors),
+                'error_rate': round(sum(self.errors.values()) / self.sent, 4) if self.sent else 0.0,
+                'target_rps': round(target_rps, 2), 'offered_rps': round(self.sent / duration, 2),
+                'throughput_rps': round(ok / elapsed, 2) if elapsed else 0.0,
+                'p50_ms': round(percentile(ms, 50), 2), 'p90_ms': round(percentile(ms, 90), 2),
+                'p99_ms': round(percentile(ms, 99), 2), 'max_ms': round(max(ms), 2) if ms else 0.0}
+
+
+async def _one(fn, client, i: int, st: _Stats, total: _Stats):
+    import httpx
+    start = time.perf_counter()
+    try:
+        status = await fn(client, i)
+    except httpx.TimeoutException:
+        status = 'timeout'
+    except Exception as e:  # transport errors, but also bad responses (e.g. a non-JSON body) in the workload itself
+        status = type(e).__name__
+    elapsed = time.perf_counter() - start
+    for s in (st, total):
+        if isinstance(status, int) and status < 400:
+            s.latencies.append(elapsed)
+        else:
+            s.errors[status if isinstance(status, str) else f'http_{status}'] += 1
+
+
+async def run_step(client, wl: Workload, mix: Dict[str, float], rps: float, duration: float, max_inflight: int,
+                   rnd: random.Random, constant: bool = False, counter: Optional[List[int]] = None) -> dict:
+    """Offer `rps` for `duration` seconds, then wait for stragglers; per-endpoint and total rows."""
+    names, weights = list(mix), list(mix.values())
+    stats = {n: _Stats() for n in names}
+    total = _Stats()
+    fns = {n: getattr(wl, n) for n in names}
+    inflight: set = set()
+    lag: List[float] = []
+    counter = counter if counter is not None else [0]
+    loop = asyncio.get_running_loop()
+    start = at = loop.time()
+    while True:
+        at += 1.0 / rps if constant else rnd.expovariate(rps)
+        if at - start >= duration:
+            break
+        delay = at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        lag.append(max(0.0, loop.time() - at))
+        name = rnd.choices(names, weights)[0]
+        stats[name].sent += 1
+        total.sent += 1
+        if len(inflight) >= max_inflight:  # client-side cap; counted against the endpoint like a refused request
+            stats[name].errors['dropped'] += 1
+            total.errors['dropped'] += 1
+            continue
+        counter[0] += 1
+        task = asyncio.create_task(_one(fns[name], client, counter[0], stats[name], total))
+        inflight.add(task)
+        task.add_done_callback(inflight.discard)
+    if inflight:
+        await asyncio.wait(set(inflight))
+    elapsed = max(loop.time() - start, duration)
+    share = sum(weights)
+    rows = {n: stats[n].row(rps * mix[n] / share, duration, elapsed) for n in names}
+    rows['all'] = total.row(rps, duration, elapsed)
+    lag_ms = [x * 1000 for x in lag]
+    return {'endpoints': rows, 'elapsed_s': round(elapsed, 3), 'driver_lag_p99_ms': round(percentile(lag_ms, 99), 2)}
+
+
+async def _ingest_completion(client, job_ids: List[str]) -> dict:
+    done = Counter()
+    for job_id in job_ids:
+        try:
+            resp = await client.get(f'/v1/ingest/{job_id}')
+            done[resp.json().get('status', 'unknown') if resp.status_code == 200 else f'http_{resp.status_code}'] += 1
+        except Exception as e:
+            done[type(e).__name__] += 1
+    return dict(done)
+
+
+def find_knees(steps: List[dict], max_error_rate: float, knee_factor: float, slo_p99_ms: Optional[float]) -> Dict[str, dict]:
+    """Per endpoint: the last RPS step it kept up with and why the next one failed."""
+    knees: Dict[str, dict] = {}
+    for name in steps[0]['endpoints']:
+        base_p99 = max(steps[0]['endpoints'][name]['p99_ms'], 1.0)
+        knee = {'knee_rps': None, 'saturated_at': None, 'reason': None}
+        for step in steps:
+            row = step['endpoints'][name]
+            if not row['sent']:
+                continue
+            reason = None
+            if row['error_rate'] > max_error_rate:
+                reason = 'errors'
+            elif row['throughput_rps'] < 0.9 * row['offered_rps']:
+                reason = 'throughput'
+            elif row['p99_ms'] > knee_factor * base_p99 or (slo_p99_ms is not None and row['p99_ms'] > slo_p99_ms):
+                reason = 'latency'
+            if reason:
+                knee.update(saturated_at=step['rps'], reason=reason)
+                break
+            knee['knee_rps'] = step['rps']
+        knees[name] = knee
+    return knees
+
+
+def _print_step(step: dict):
+    res = step.get('resources') or {}
+    print(f"-- {step['rps']:g} rps: driver lag p99 {step['driver_lag_p99_ms']}ms, server cpu {res.get('cpu_pct', '?')}% "
+          f"rss {res.get('rss_mb_max', '?')}MB threads {res.get('threads_max', '?')} fds {res.get('fds_max', '?')}", file=sys.stderr)
+    for name, row in step['endpoints'].items():
+        print(f"   {name:8} {row['throughput_rps']:8.2f}/s of {row['offered_rps']:<8g} p50 {row['p50_ms']:9.1f}ms "
+              f"p90 {row['p90_ms']:9.1f}ms p99 {row['p99_ms']:9.1f}ms err {row['error_rate']:.1%}", file=sys.stderr)
+
+
+async def _drive(args, base_url: str, sampler: ResourceSampler) -> List[dict]:
+    import httpx
+    mix = parse_mix(args.mix)
+    wl = Workload(args.seed, args.qa_questions, args.ingest_paragraphs)
+    rnd = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.max_inflight, max_keepalive_connections=args.max_inflight)
+    headers = {'X-Api-Key': args.api_key} if args.api_key else {}
+    counter = [0]
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits, headers=headers) as client:
+        for i in range(3):  # SSE streams need runs to follow
+            await wl.migrate(client, -1 - i)
+        levels = [float(r) for r in args.rps.split(',') if r]
+        if args.warmup > 0:
+            await run_step(client, wl, mix, levels[0], args.warmup, args.max_inflight, rnd, args.constant, counter)
+        steps = []
+        for rps in levels:
+            wl.qa_cache.clear()
+            jobs_before = len(wl.job_ids)
+            t0 = time.monotonic()
+            step = await run_step(client, wl, mix, rps, args.duration, args.max_inflight, rnd, args.constant, counter)
+            step = {'rps': rps, **step, 'resources': sampler.window(t0, time.monotonic())}
+            if wl.qa_cache:
+                step['qa_cache'] = dict(wl.qa_cache)
+            if len(wl.job_ids) > jobs_before:
+                step['ingest_jobs'] = await _ingest_completion(client, wl.job_ids[jobs_before:])
+            _print_step(step)
+            steps.append(step)
+            if args.cooldown:
+                await asyncio.sleep(args.cooldown)
+    return steps
+
+
+def run(args) -> dict:
+    parse_mix(args.mix)  # fail fast on bad specs, before anything boots
+    for spec in (args.embed_latency, args.chat_latency):
+        Latency(spec)
+    with tempfile.TemporaryDirectory(prefix='irule-load-') as tmp:
+        workdir = Path(tmp)
+        children: List[_Child] = []
+        cleanup: List[Path] = []
+        try:
+            if args.target:
+                base_url, pid = args.target.rstrip('/'), args.server_pid
+            else:
+                # chosen here so the RAM-disk file is removed even though uvicorn exits via SIGTERM
+                database_url = args.database_url or _database_url(args.db, workdir)
+                if database_url.startswith('sqlite:////dev/shm/'):
+                    cleanup.append(Path(database_url[len('sqlite:///'):]))
+                llm_url = None
+                if args.llm == 'http':  # own process, so its sleeps and JSON work stay off the driver's GIL
+                    port = _free_port()
+                    llm = _Child('fake-llm', ['fake-llm', '--port', str(port), '--seed', str(args.seed),
+                                              '--embed-latency', args.embed_latency, '--chat-latency', args.chat_latency], workdir)
+                    children.append(llm)
+                    llm_url = f'http://127.0.0.1:{port}/v1'
+                    llm.wait_http(f'{llm_url}/models')
+                port = _free_port()
+                argv = ['serve', '--port', str(port), '--workdir', str(workdir / 'server'), '--database-url', database_url,
+                        '--llm', args.llm, '--embed-latency', args.embed_latency, '--chat-latency', args.chat_latency,
+                        '--seed', str(args.seed)]
+                if llm_url:
+                    argv += ['--llm-url', llm_url]
+                api = _Child('api', argv, workdir)
+                children.append(api)
+                base_url, pid = f'http://127.0.0.1:{port}', api.proc.pid
+                api.wait_http(base_url + '/')
+            sampler = ResourceSampler(pid).start()
+            try:
+                steps = asyncio.run(_drive(args, base_url, sampler))
+            finally:
+                sampler.stop()
+        finally:
+            for child in reversed(children):
+                child.stop()
+            for path in cleanup:
+                path.unlink(missing_ok=True)
+    knees = find_knees(steps, args.max_error_rate, args.knee_factor, args.slo_p99_ms)
+    results: Dict[str, dict] = {}
+    for step in steps:
+        for name, row in step['endpoints'].items():
+            prefix = f"load.{step['rps']:g}rps.{name}"
+            for pct in ('p50', 'p90', 'p99'):
+                results[f'{prefix}.{pct}_ms'] = metric(row[f'{pct}_ms'], 'ms', 'lower')
+            results[f'{prefix}.throughput'] = metric(row['throughput_rps'], 'req/s', 'higher')
+            results[f'{prefix}.error_rate'] = metric(row['error_rate'], 'ratio', 'lower')
+    for name, knee in knees.items():
+        if knee['knee_rps'] is not None:
+            results[f'load.{name}.knee_rps'] = metric(knee['knee_rps'], 'req/s', 'higher')
+    meta = {'target': args.target or 'stand-ins', 'mix': parse_mix(args.mix), 'duration_s': args.duration,
+            'arrivals': 'constant' if args.constant else 'poisson', 'time': int(time.time())}
+    if not args.target:
+        meta.update(db=args.database_url or args.db, llm=args.llm, embed_latency=args.embed_latency, chat_latency=args.chat_latency)
+    return {'meta': meta, 'steps': steps, 'knees': knees, 'results': results}
+
+
+def _stand_in_args(ap: argparse.ArgumentParser):
+    ap.add_argument('--db', choices=('sqlite', 'memory'), default='sqlite', help='SQLite file in the work dir, or on a RAM disk')
+    ap.add_argument('--database-url', help='use this DB instead (e.g. a scratch Postgres)')
+    ap.add_argument('--llm', choices=('inproc', 'http'), default='inproc',
+                    help='inproc: fake embedder patched in; http: real OpenAI client against the fake OpenAI-compatible server')
+    ap.add_argument('--embed-latency', default='0', help='per embeddings call, ms: fixed:20 | uniform:a,b | normal:mean,sd | lognormal:median,sigma | exp:mean')
+    ap.add_argument('--chat-latency', default='0', help='per chat completion (fake server only), same syntax')
+    ap.add_argument('--seed', type=int, default=0)
+
+
+def main(argv=None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv and argv[0] in ('serve', 'fake-llm'):
+        cmd = argv.pop(0)
+        ap = argparse.ArgumentParser(prog=f'python -m benchmarks.loadtest {cmd}')
+        ap.add_argument('--host', default='127.0.0.1')
+        ap.add_argument('--port', type=int, default=8080 if cmd == 'serve' else 8099)
+        _stand_in_args(ap)
+        if cmd == 'serve':
+            ap.add_argument('--workdir', help='DB, uploads and blobs go here (default: a new temp dir)')
+            ap.add_argument('--llm-url', help='with --llm http: an already running OpenAI-compatible stand-in')
+        args = ap.parse_args(argv)
+        return serve(args) if cmd == 'serve' else fake_llm(args)
+
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--rps', default='5,10,20', help='comma list of target request rates, one step each')
+    ap.add_argument('--duration', type=float, default=20.0, help='seconds per step')
+    ap.add_argument('--warmup', type=float, default=5.0, help='unrecorded seconds at the first rate')
+    ap.add_argument('--cooldown', type=float, default=2.0, help='pause between steps')
+    ap.add_argument('--mix', default=DEFAULT_MIX, help='endpoint weights, e.g. qa=4,migrate=1 (' + ','.join(ENDPOINTS) + ')')
+    ap.add_argument('--constant', action='store_true', help='evenly spaced arrivals instead of Poisson')
+    ap.add_argument('--max-inflight', type=int, default=512, help='client-side cap; arrivals beyond it count as dropped')
+    ap.add_argument('--timeout', type=float, default=30.0, help='per-request timeout, seconds')
+    ap.add_argument('--qa-questions', type=int, default=200, help='distinct QA questions (fewer means more QA cache hits)')
+    ap.add_argument('--ingest-paragraphs', type=int, default=8, help='paragraphs per ingested document')
+    ap.add_argument('--target', help='drive this base URL instead of booting the API on stand-ins')
+    ap.add_argument('--server-pid', type=int, help='with --target: sample this local process for resource usage')
+    ap.add_argument('--api-key', help='tenant API key to send (servers in TENANCY_MODE=multi)')
+    _stand_in_args(ap)
+    ap.add_argument('--max-error-rate', type=float, default=0.01, help='knee: max error share per step')
+    ap.add_argument('--knee-factor', type=float, default=4.0, help='knee: max p99 growth over the first step')
+    ap.add_argument('--slo-p99-ms', type=float, help='knee: absolute p99 limit')
+    ap.add_argument('--min-knee-rps', type=float, help='exit non-zero if any endpoint saturates below this rate')
+    ap.add_argument('--out', help='write results JSON here')
+    args = ap.parse_args(argv)
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text)
+    print(text)
+    if args.min_knee_rps is not None:
+        low = {n: k for n, k in report['knees'].items()
+               if k['saturated_at'] is not None and (k['knee_rps'] or 0) < args.min_knee_rps}
+        for name, k in low.items():
+            print(f"KNEE {name} saturated at {k['saturated_at']:g} rps ({k['reason']}), below {args.min_knee_rps:g}", file=sys.stderr)
+        return 1 if low else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
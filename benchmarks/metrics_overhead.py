@@ -0,0 +1,84 @@
+"""Instrumentation overhead on the migrate path (parse -> generate).
+
+End-to-end A/B timings of the instrumented `parse_irule`/`generate_appshape`
+against their unwrapped originals (`__wrapped__`) are reported, but on a
+shared box they jitter by more than the effect being measured. The gate
+therefore uses the isolated cost of one timed call (wrapped no-op minus bare
+no-op) times the number of timed calls per migration, relative to the bare
+migrate time, and fails above `--max-overhead` (default 1%).
+Run: python -m benchmarks.metrics_overhead
+"""
+import argparse, json, sys, time
+from packages.observability.metrics import histogram
+from packages.tools.irule_parser import parse_irule
+from packages.tools.appshape_generator import generate_appshape
+
+TIMED_CALLS_PER_MIGRATION = 2  # parse_irule + generate_appshape
+
+_BLOCK = """    if {[HTTP::uri] starts_with "/api"} {
+        HTTP::header replace X-Forwarded-Proto https
+        HTTP::uri [string map {"/api" "/v2"} [HTTP::uri]]
+    } elseif {[HTTP::method] eq "POST"} {
+        set len [HTTP::header Content-Length]
+        table set -subtable limits [IP::client_addr] 1 60
+    }
+    if {[class match [IP::client_addr] equals blocked_ips]} {
+        return
+    }
+"""
+
+SAMPLE = "when CLIENT_ACCEPTED {\n    set start [clock clicks]\n}\n" + \
+    "when HTTP_REQUEST {\n" + _BLOCK * 20 + "}\n" + \
+    "when HTTP_RESPONSE {\n    HTTP::header insert X-Served-By appshape\n}\n"
+
+
+def _migrate(parse, generate, code):
+    parsed = parse(code)
+    return generate(parsed['ast'], {"status": "partial"})
+
+
+def _best_of(fn, rounds: int, iterations: int) -> float:
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        best = min(best, (time.perf_counter() - start) / iterations)
+    return best
+
+
+def run(rounds: int = 7, iterations: int = 200) -> dict:
+    raw_parse = parse_irule.__wrapped__
+    raw_generate = generate_appshape.__wrapped__
+    bare = lambda: _migrate(raw_parse, raw_generate, SAMPLE)
+    instrumented = lambda: _migrate(parse_irule, generate_appshape, SAMPLE)
+    _best_of(bare, 1, iterations); _best_of(instrumented, 1, iterations)  # warm up
+    # interleave so drift (thermal, other tenants) hits both sides equally
+    bare_s = inst_s = float('inf')
+    for _ in range(rounds):
+        bare_s = min(bare_s, _best_of(bare, 1, iterations))
+        inst_s = min(inst_s, _best_of(instrumented, 1, iterations))
+    noop = lambda: None
+    timed_noop = histogram('bench_noop_seconds', 'Benchmark-only timer').time()(noop)
+    noop_s = _best_of(noop, rounds, iterations * 100)
+    timed_s = _best_of(timed_noop, rounds, iterations * 100)
+    per_call = max(timed_s - noop_s, 0.0)
+    return {
+        'lines': SAMPLE.count('\n'),
+        'bare_us': bare_s * 1e6,
+        'instrumented_us': inst_s * 1e6,
+        'ab_delta_pct': (inst_s - bare_s) / bare_s * 100,
+        'timer_cost_us': per_call * 1e6,
+        'overhead_pct': per_call * TIMED_CALLS_PER_MIGRATION / bare_s * 100,
+    }
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--rounds', type=int, default=7)
+    ap.add_argument('--iterations', type=int, default=200)
+    ap.add_argument('--max-overhead', type=float, default=1.0, help='fail above this percentage')
+    args = ap.parse_args()
+    res = run(args.rounds, args.iterations)
+    print(json.dumps(res, indent=2))
+    sys.exit(1 if res['overhead_pct'] > args.max_overhead else 0)
@@ -0,0 +1,324 @@
+"""End-to-end offline benchmark suite.
+
+Measures parser, generator and verifier throughput, data-group load time and
+lookup rate, ingestion docs/sec, retrieval
+latency, gap-analytics write cost and read latency, and API p50/p99 under
+concurrency (httpx against the ASGI app) on
+synthetic inputs. Runs against a throwaway SQLite database with a fake
+embedder, so no Postgres or OpenAI access is needed.
+
+Run: python -m benchmarks.suite --out bench.json
+     python -m benchmarks.suite --baseline bench.json --threshold 15   # regression mode
+"""
+from __future__ import annotations
+import argparse, asyncio, json, os, platform, statistics, sys, tempfile, time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from benchmarks.synth import IRuleSpec, synth_irule, synth_corpus, synth_datagroup, synth_questions
+from benchmarks.fakes import FakeEmbedder
+
+SUITES = ('parser', 'generator', 'verifier', 'datagroups', 'ingestion', 'retrieval', 'analytics', 'api')
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def metric(value: float, unit: str, better: str) -> dict:
+    return {'value': round(value, 6), 'unit': unit, 'better': better}
+
+
+def latency_metrics(prefix: str, samples_s: List[float]) -> Dict[str, dict]:
+    ms = [s * 1000 for s in samples_s]
+    return {
+        f'{prefix}.p50_ms': metric(percentile(ms, 50), 'ms', 'lower'),
+        f'{prefix}.p99_ms': metric(percentile(ms, 99), 'ms', 'lower'),
+        f'{prefix}.mean_ms': metric(statistics.fmean(ms) if ms else 0.0, 'ms', 'lower'),
+    }
+
+
+def use_offline_stack(workdir: Path, database_url: str | None = None, embedder: Callable | None = None,
+                      llm_base_url: str | None = None):
+    """Point settings/DB at local stand-ins. Must run before first DB/settings use.
+
+    `embedder` replaces `embed_texts` (default: `FakeEmbedder()`). With
+    `llm_base_url` nothing is patched: the real OpenAI client talks to that
+    OpenAI-compatible stand-in instead (see `benchmarks.fakes.FakeLLMServer`).
+    """
+    os.environ['DATABASE_URL'] = database_url or f"sqlite:///{workdir / 'bench.db'}"
+    os.environ.setdefault('RATE_LIMIT_PER_MIN', '100000000')
+    os.environ.setdefault('OTEL_EXPORTER', 'none')
+    os.environ['OPENAI_API_KEY'] = 'offline' if llm_base_url else ''
+    if llm_base_url:
+        os.environ['OPENAI_BASE_URL'] = llm_base_url
+    os.environ.setdefault('VECTOR_DB', 'embedded')
+    os.environ['VECTOR_INDEX_PATH'] = str(workdir / 'vector_index')
+    os.environ['OBJECT_STORE_PATH'] = str(workdir / 'storage')  # blobs and API uploads
+    from packages.db import make_all
+    from packages.rag import embeddings
+    if not llm_base_url:
+        embeddings.embed_texts = embedder or FakeEmbedder()
+    make_all()
+
+
+def bench_parser(spec: IRuleSpec, rules: int) -> Dict[str, dict]:
+    from packages.tools.irule_parser import parse_irule
+    corpus = [synth_irule(IRuleSpec(**{**spec.__dict__, 'seed': spec.seed + i})) for i in range(rules)]
+    lines = sum(c.count('\n') for c in corpus)
+    start = time.perf_counter()
+    for code in corpus:
+        parse_irule(code)
+    elapsed = time.perf_counter() - start
+    return {
+        'parser.rules_per_sec': metric(rules / elapsed, 'rules/s', 'higher'),
+        'parser.lines_per_sec': metric(lines / elapsed, 'lines/s', 'higher'),
+    }
+
+
+def bench_generator(spec: IRuleSpec, rules: int) -> Dict[str, dict]:
+    from packages.tools.irule_parser import parse_irule
+    from packages.tools.appshape_generator import generate_appshape
+    asts = [parse_irule(synth_irule(IRuleSpec(**{**spec.__dict__, 'seed': spec.seed + i})))['ast'] for i in range(rules)]
+    nodes = sum(len(ev['body']) for ast in asts for ev in ast['events'])
+    start = time.perf_counter()
+    for ast in asts:
+        generate_appshape(ast, {'status': 'partial'})
+    elapsed = time.perf_counter() - start
+    return {
+        'generator.rules_per_sec': metric(rules / elapsed, 'rules/s', 'higher'),
+        'generator.nodes_per_sec': metric(nodes / elapsed, 'nodes/s', 'higher'),
+    }
+
+
+def bench_verifier(spec: IRuleSpec, rules: int) -> Dict[str, dict]:
+    from packages.tools.irule_parser import parse_irule
+    from packages.tools.appshape_generator import generate_appshape
+    from packages.tools.verifier import verify_script
+    scripts = [generate_appshape(parse_irule(synth_irule(IRuleSpec(**{**spec.__dict__, 'seed': spec.seed + i})))['ast'],
+                                 {'status': 'partial'})['code'] for i in range(rules)]
+    lines = sum(s.count('\n') for s in scripts)
+    start = time.perf_counter()
+    for script in scripts:
+        verify_script(script)
+    elapsed = time.perf_counter() - start
+    return {
+        'verifier.scripts_per_sec': metric(rules / elapsed, 'scripts/s', 'higher'),
+        'verifier.lines_per_sec': metric(lines / elapsed, 'lines/s', 'higher'),
+    }
+
+
+def bench_datagroups(records: int, lookups: int, seed: int) -> Dict[str, dict]:
+    import random
+    from packages.tools.datagroups import load_datagroup
+    rnd = random.Random(seed)
+    results: Dict[str, dict] = {}
+    for kind, operator in (('ip', 'equals'), ('string', 'starts_with')):
+        text = synth_datagroup(kind, records, seed=seed)
+        start = time.perf_counter()
+        group = load_datagroup(text, f'bench_{kind}')
+        if operator == 'starts_with':
+            group.prefix_trie
+        load = time.perf_counter() - start
+        if kind == 'ip':
+            items = [f'{rnd.randrange(1, 224)}.{rnd.randrange(256)}.{rnd.randrange(256)}.{rnd.randrange(256)}' for _ in range(lookups)]
+        else:
+            items = [f'/{rnd.choice(("header", "uri", "cache", "pool"))}/{rnd.choice(("ssl", "event", "x"))}/{i}' for i in range(lookups)]
+        start = time.perf_counter()
+        for item in items:
+            group.match(item, operator)
+        elapsed = time.perf_counter() - start
+        results.update({
+            f'datagroups.{kind}.load_records_per_sec': metric(records / load, 'records/s', 'higher'),
+            f'datagroups.{kind}.lookups_per_sec': metric(lookups / elapsed, 'lookups/s', 'higher'),
+        })
+    return results
+
+
+def bench_ingestion(workdir: Path, docs: int, paragraphs: int) -> Dict[str, dict]:
+    from packages.ingestion.ingest import ingest_path
+    corpus_dir = workdir / 'corpus'
+    paths = synth_corpus(corpus_dir, docs=docs, paragraphs=paragraphs)
+    size = sum(p.stat().st_size for p in paths)
+    start = time.perf_counter()
+    res = ingest_path(str(corpus_dir), tags=['bench'])
+    elapsed = time.perf_counter() - start
+    return {
+        'ingestion.docs_per_sec': metric(res.files_indexed / elapsed, 'docs/s', 'higher'),
+        'ingestion.mb_per_sec': metric(size / 1e6 / elapsed, 'MB/s', 'higher'),
+    }
+
+
+def bench_retrieval(queries: int) -> Dict[str, dict]:
+    from packages.rag.retriever import retrieve
+    samples = []
+    for q in synth_questions(queries):
+        start = time.perf_counter()
+        retrieve(q, top_k=6)
+        samples.append(time.perf_counter() - start)
+    return latency_metrics('retrieval', samples)
+
+
+def bench_analytics(spec: IRuleSpec, runs: int, queries: int) -> Dict[str, dict]:
+    from packages.db import SessionLocal
+    from packages.analytics import record_run, top_gaps, coverage_trend, what_if
+    from packages.tools.irule_parser import parse_irule
+    from packages.tools.appshape_generator import generate_appshape
+    inputs = []
+    for i in range(min(runs, 64)):
+        parsed = parse_irule(synth_irule(IRuleSpec(**{**spec.__dict__, 'seed': spec.seed + i})))
+        inputs.append((parsed['ast'], generate_appshape(parsed['ast'], {'status': 'partial'})['mapping']))
+    s = SessionLocal()
+    try:
+        start = time.perf_counter()
+        for i in range(runs):
+            ast, mapping = inputs[i % len(inputs)]
+            record_run(s, f'bench-{i}', ast, mapping)
+        s.commit()
+        write = time.perf_counter() - start
+        top = [g['name'] for g in top_gaps(s, limit=3)]
+        samples = []
+        for i in range(queries):
+            start = time.perf_counter()
+            (top_gaps, lambda s: coverage_trend(s, 30), lambda s: what_if(s, top))[i % 3](s)
+            samples.append(time.perf_counter() - start)
+    finally:
+        s.close()
+    return {'analytics.record_runs_per_sec': metric(runs / write, 'runs/s', 'higher'),
+            **latency_metrics('analytics.query', samples)}
+
+
+async def _drive(client, requests: int, concurrency: int, make_request: Callable) -> tuple[List[float], int, float]:
+    sem = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with sem:
+            start = time.perf_counter()
+            resp = await make_request(client, i)
+            samples.append(time.perf_counter() - start)
+            if resp.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return samples, errors, time.perf_counter() - start
+
+
+async def _bench_api(spec: IRuleSpec, requests: int, concurrency: int) -> Dict[str, dict]:
+    import httpx
+    from apps.api.main import app
+    rules = [synth_irule(IRuleSpec(**{**spec.__dict__, 'seed': spec.seed + i})) for i in range(16)]
+    questions = synth_questions(16)
+
+    async def migrate(client, i):
+        return await client.post('/v1/migrate', files={'file': (f'r{i}.tcl', rules[i % len(rules)].encode(), 'text/plain')})
+
+    async def qa(client, i):
+        return await client.post('/v1/qa', json={'question': questions[i % len(questions)]})
+
+    out: Dict[str, dict] = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        for name, fn in (('migrate', migrate), ('qa', qa)):
+            samples, errors, wall = await _drive(client, requests, concurrency, fn)
+            out.update(latency_metrics(f'api.{name}', samples))
+            out[f'api.{name}.rps'] = metric(requests / wall, 'req/s', 'higher')
+            out[f'api.{name}.errors'] = metric(errors, 'count', 'lower')
+    return out
+
+
+def bench_api(spec: IRuleSpec, requests: int, concurrency: int) -> Dict[str, dict]:
+    return asyncio.run(_bench_api(spec, requests, concurrency))
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold_pct: float) -> List[str]:
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base or not base.get('value'):
+            continue
+        change = (cur['value'] - base['value']) / base['value'] * 100
+        worse = -change if cur['better'] == 'higher' else change
+        if worse > threshold_pct:
+            regressions.append(f"{name}: {base['value']} -> {cur['value']} {cur['unit']} ({worse:.1f}% worse)")
+    return regressions
+
+
+def run(args) -> dict:
+    spec = IRuleSpec(events=args.events, statements_per_event=args.statements, max_depth=args.depth,
+                     unsupported_share=args.unsupported_share, seed=args.seed)
+    selected = [s for s in args.suites.split(',') if s] or list(SUITES)
+    results: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory(prefix='irule-bench-') as tmp:
+        workdir = Path(tmp)
+        if {'ingestion', 'retrieval', 'analytics', 'api'} & set(selected):
+            use_offline_stack(workdir, args.database_url)
+        if 'parser' in selected:
+            results.update(bench_parser(spec, args.rules))
+        if 'generator' in selected:
+            results.update(bench_generator(spec, args.rules))
+        if 'verifier' in selected:
+            results.update(bench_verifier(spec, args.rules))
+        if 'datagroups' in selected:
+            results.update(bench_datagroups(args.datagroup_records, args.queries * 500, args.seed))
+        if 'ingestion' in selected or 'retrieval' in selected:
+            ingested = bench_ingestion(workdir, args.docs, args.paragraphs)
+            if 'ingestion' in selected:
+                results.update(ingested)
+        if 'retrieval' in selected:
+            results.update(bench_retrieval(args.queries))
+        if 'analytics' in selected:
+            results.update(bench_analytics(spec, args.runs, args.queries))
+        if 'api' in selected:
+            results.update(bench_api(spec, args.requests, args.concurrency))
+    return {
+        'meta': {'python': platform.python_version(), 'machine': platform.machine(), 'time': int(time.time()),
+                 'suites': selected, 'spec': spec.__dict__},
+        'results': results,
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--suites', default=','.join(SUITES), help='comma list of ' + ','.join(SUITES))
+    ap.add_argument('--rules', type=int, default=200)
+    ap.add_argument('--events', type=int, default=3)
+    ap.add_argument('--statements', type=int, default=40, help='statements per event')
+    ap.add_argument('--depth', type=int, default=3, help='max if-nesting depth')
+    ap.add_argument('--unsupported-share', type=float, default=0.1)
+    ap.add_argument('--datagroup-records', type=int, default=100000, help='records per synthetic data group')
+    ap.add_argument('--docs', type=int, default=100)
+    ap.add_argument('--paragraphs', type=int, default=40)
+    ap.add_argument('--queries', type=int, default=200)
+    ap.add_argument('--runs', type=int, default=1000, help='runs recorded by the analytics suite')
+    ap.add_argument('--requests', type=int, default=200)
+    ap.add_argument('--concurrency', type=int, default=16)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--database-url', help='use this DB instead of a throwaway SQLite file')
+    ap.add_argument('--out', help='write results JSON here')
+    ap.add_argument('--baseline', help='results JSON to compare against')
+    ap.add_argument('--threshold', type=float, default=10.0, help='max %% regression vs --baseline')
+    args = ap.parse_args(argv)
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text)
+    print(text)
+    if args.baseline:
+        regressions = compare(report['results'], json.loads(Path(args.baseline).read_text())['results'], args.threshold)
+        for r in regressions:
+            print(f'REGRESSION {r}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
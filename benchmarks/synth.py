@@ -0,0 +1,122 @@
+"""Synthetic iRule, data-group and documentation corpus generators (deterministic per seed)."""
+from __future__ import annotations
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+
+DEFAULT_EVENT_MIX = {'HTTP_REQUEST': 0.6, 'HTTP_RESPONSE': 0.2, 'CLIENT_ACCEPTED': 0.1, 'LB_SELECTED': 0.05, 'SERVER_CONNECTED': 0.05}
+
+_SUPPORTED_LINES = [
+    'HTTP::header replace X-Forwarded-Proto https',
+    'HTTP::header insert X-Request-Id [string range [AES::key 128] 0 15]',
+    'HTTP::header remove Server',
+    'HTTP::uri [string map {"/old" "/new"} [HTTP::uri]]',
+    'set host [string tolower [HTTP::host]]',
+    'set path [HTTP::path]',
+    'HTTP::method',
+    'regexp {^/api/v([0-9]+)/} [HTTP::uri] -> version',
+    'return',
+]
+_UNSUPPORTED_LINES = [
+    'table set -subtable rate [IP::client_addr] 1 60',
+    'table incr -subtable hits [HTTP::uri]',
+    'after 100',
+    'sideband send $conn $payload',
+    'HSL::send $hsl "[IP::client_addr] [HTTP::uri]"',
+    'binary scan [TCP::payload] H* hex',
+]
+_CONDITIONS = [
+    '[HTTP::uri] starts_with "/api"',
+    '[HTTP::method] eq "POST"',
+    '[class match [IP::client_addr] equals blocked_ips]',
+    '[HTTP::header exists Authorization]',
+    '[string tolower [HTTP::host]] ends_with ".example.com"',
+]
+
+_WORDS = ('appshape header uri rewrite virtual service pool health monitor persistence cookie redirect '
+          'certificate ssl offload compression cache policy filter class match lookup script event request '
+          'response client server alteon configuration command reference example parameter value').split()
+
+
+@dataclass
+class IRuleSpec:
+    events: int = 3
+    statements_per_event: int = 40
+    max_depth: int = 3
+    unsupported_share: float = 0.1
+    event_mix: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_EVENT_MIX))
+    seed: int = 0
+
+
+def synth_irule(spec: IRuleSpec) -> str:
+    rnd = random.Random(spec.seed)
+    names = list(spec.event_mix)
+    weights = [spec.event_mix[n] for n in names]
+    out: List[str] = []
+
+    def stmt() -> str:
+        pool = _UNSUPPORTED_LINES if rnd.random() < spec.unsupported_share else _SUPPORTED_LINES
+        return rnd.choice(pool)
+
+    def block(budget: int, depth: int):
+        indent = '    ' * (depth + 1)
+        while budget > 0:
+            if depth < spec.max_depth and budget > 3 and rnd.random() < 0.25:
+                inner = rnd.randint(1, min(budget - 1, 6))
+                out.append(f'{indent}if {{{rnd.choice(_CONDITIONS)}}} {{')
+                block(inner, depth + 1)
+                if rnd.random() < 0.3:
+                    out.append(f'{indent}}} else {{')
+                    block(1, depth + 1)
+                    budget -= 1
+                out.append(f'{indent}}}')
+                budget -= inner + 1
+            else:
+                out.append(indent + stmt())
+                budget -= 1
+
+    for _ in range(spec.events):
+        out.append(f'when {rnd.choices(names, weights)[0]} {{')
+        block(spec.statements_per_event, 0)
+        out.append('}')
+    return '\n'.join(out) + '\n'
+
+
+def synth_datagroup(kind: str, records: int, seed: int = 0) -> str:
+    """External data-group file text: `ip` (hosts and nested networks) or `string` (URI prefixes)."""
+    rnd = random.Random(seed)
+    values = ('deny', 'allow', 'internal', 'partner')
+    out = []
+    for i in range(records):
+        if kind == 'ip':
+            a, b, c = rnd.randrange(1, 224), rnd.randrange(256), rnd.randrange(256)
+            key = (f'network {a}.{b}.{c}.0/{rnd.choice((16, 20, 24))}' if rnd.random() < 0.2
+                   else f'host {a}.{b}.{c}.{rnd.randrange(256)}')
+        else:
+            key = '"/' + '/'.join(rnd.choice(_WORDS) for _ in range(rnd.randint(1, 4))) + f'/{i % 97}"'
+        out.append(f'{key} := "{rnd.choice(values)}",')
+    return '\n'.join(out) + '\n'
+
+
+def synth_paragraph(rnd: random.Random, words: int) -> str:
+    return ' '.join(rnd.choice(_WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def synth_corpus(dest: Path, docs: int = 50, paragraphs: int = 40, words_per_paragraph: int = 60, seed: int = 0) -> List[Path]:
+    """Write `docs` .md/.txt files under `dest` and return their paths."""
+    rnd = random.Random(seed)
+    dest.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(docs):
+        ext = '.md' if i % 2 == 0 else '.txt'
+        p = dest / f'doc_{seed}_{i:05d}{ext}'
+        body = '\n\n'.join(synth_paragraph(rnd, words_per_paragraph) for _ in range(paragraphs))
+        p.write_text(f'# Synthetic manual {i}\n\n{body}\n', encoding='utf-8')
+        paths.append(p)
+    return paths
+
+
+def synth_questions(n: int, seed: int = 0) -> List[str]:
+    rnd = random.Random(seed)
+    return [f'How do I configure {rnd.choice(_WORDS)} {rnd.choice(_WORDS)} in AppShape?' for _ in range(n)]
@@ -0,0 +1,86 @@
+"""Per-tenant retrieval latency as the number of tenants grows.
+
+Every tenant gets the same synthetic corpus size; a fixed sample of tenants
+is then queried. With tenant-leading indexes and per-tenant vector indexes
+the p50/p99 should stay flat from 1 to N tenants. Runs offline (SQLite,
+embedded vector store, fake embedder) like `benchmarks.suite`.
+
+Run: python -m benchmarks.tenancy --tenants 1,10,100 --out tenancy.json
+     python -m benchmarks.tenancy --max-growth 50   # fail if p50 at max tenants is >50% above p50 at 1 tenant
+"""
+from __future__ import annotations
+import argparse, json, os, sys, tempfile, time
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.suite import latency_metrics, use_offline_stack
+from benchmarks.synth import synth_corpus, synth_questions
+
+
+def _ingest_tenants(workdir: Path, start: int, stop: int, docs: int, paragraphs: int):
+    from packages.ingestion.ingest import ingest_path
+    for t in range(start, stop):
+        # distinct seed per tenant: shared bytes would be deduplicated and skew the comparison
+        corpus = synth_corpus(workdir / 'corpora' / f't{t}', docs=docs, paragraphs=paragraphs, seed=t)
+        ingest_path(str(corpus[0].parent), tenant_id=f't{t}')
+
+
+def _query(tenants: List[str], queries: int) -> List[float]:
+    from packages.rag.retriever import retrieve
+    from packages.tenancy import tenant_scope
+    samples = []
+    questions = synth_questions(queries)
+    for i, q in enumerate(questions):
+        with tenant_scope(tenants[i % len(tenants)]):
+            start = time.perf_counter()
+            retrieve(q, top_k=6)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run(args) -> dict:
+    counts = sorted({int(c) for c in args.tenants.split(',') if c})
+    results: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory(prefix='irule-tenancy-') as tmp:
+        workdir = Path(tmp)
+        os.environ['TENANCY_MODE'] = 'multi'
+        use_offline_stack(workdir, args.database_url)
+        loaded = 0
+        for n in counts:
+            _ingest_tenants(workdir, loaded, n, args.docs, args.paragraphs)
+            loaded = n
+            sample = [f't{i}' for i in range(0, n, max(1, n // args.sample_tenants))][:args.sample_tenants]
+            _query(sample, min(20, args.queries))  # warm up caches/index mappings
+            results.update(latency_metrics(f'tenancy.{n}_tenants.retrieval', _query(sample, args.queries)))
+    return {'meta': {'tenants': counts, 'docs_per_tenant': args.docs, 'time': int(time.time())}, 'results': results}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--tenants', default='1,10,50', help='comma list of tenant counts')
+    ap.add_argument('--docs', type=int, default=5, help='documents per tenant')
+    ap.add_argument('--paragraphs', type=int, default=20)
+    ap.add_argument('--queries', type=int, default=200)
+    ap.add_argument('--sample-tenants', type=int, default=5, help='tenants queried at each step')
+    ap.add_argument('--database-url', help='use this DB instead of a throwaway SQLite file')
+    ap.add_argument('--max-growth', type=float, default=None, help='max %% p50 growth from fewest to most tenants')
+    ap.add_argument('--out', help='write results JSON here')
+    args = ap.parse_args(argv)
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text)
+    print(text)
+    if args.max_growth is not None:
+        counts = report['meta']['tenants']
+        first = report['results'][f'tenancy.{counts[0]}_tenants.retrieval.p50_ms']['value']
+        last = report['results'][f'tenancy.{counts[-1]}_tenants.retrieval.p50_ms']['value']
+        growth = (last - first) / first * 100 if first else 0.0
+        if growth > args.max_growth:
+            print(f'REGRESSION p50 grew {growth:.1f}% from {counts[0]} to {counts[-1]} tenants', file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,21 +3,20 @@ Builds MainGraph with Router -> (qa | migrate | status) branches (stubs).
 """
 
 from typing import Literal, Dict, Any
-try:
-    from langgraph.graph import StateGraph, END
-except ImportError:  # allow import before dependency installed
-    StateGraph = object  # type: ignore
-    END = None  # type: ignore
 from pydantic import BaseModel
 from packages.rag.retriever import retrieve
+from packages.rag.qa_cache import get_qa_cache
 from packages.tools.irule_parser import parse_irule
 from packages.tools.appshape_generator import generate_appshape
+from packages.tools.verifier import verify_script
+from packages.tools.datagroups import convert_data_groups
 
 class GraphState(BaseModel):
     intent: Literal['qa','migrate','status','unknown'] = 'unknown'
     question: str | None = None
     answer: str | None = None
     citations: list | None = None
+    qa_cache: str | None = None  # hit | miss | stale | false_hit | bypass
     irule_code: str | None = None
     report: Dict[str, Any] | None = None
     ast: Dict[str, Any] | None = None
@@ -25,6 +24,9 @@ class GraphState(BaseModel):
     plan: Dict[str, Any] | None = None
     script: str | None = None
     mapping: list | None = None
+    data_groups: Dict[str, str] | None = None  # data group name -> external file text
+    data_group_types: Dict[str, str] | None = None  # data group name -> ip|string|integer (else detected)
+    datagroups_script: str | None = None
 
 # Router node
 
@@ -40,9 +42,13 @@ def router_node(state: GraphState) -> GraphState:
 # RAG_QA node
 
 def rag_qa_node(state: GraphState) -> GraphState:
-    rr = retrieve(state.question, top_k=6)
-    state.answer = 'Placeholder answer'  # TODO: synthesis with LLM
-    state.citations = rr.citations
+    def compute(query_embedding):
+        rr = retrieve(state.question, top_k=6, query_embedding=query_embedding)
+        return {'answer': 'Placeholder answer', 'citations': rr.citations}  # TODO: synthesis with LLM
+    out = get_qa_cache().answer(state.question, compute, top_k=6)
+    state.answer = out['answer']
+    state.citations = out['citations']
+    state.qa_cache = out['cache']
     return state
 
 # Migration pipeline stubs
@@ -78,14 +84,22 @@ def translate_node(state: GraphState) -> GraphState:
     gen = generate_appshape(state.ast, state.plan)
     state.script = gen['code']
     state.mapping = gen['mapping']
+    dg = convert_data_groups(state.ast, state.data_groups or {}, state.data_group_types)
+    if dg['groups'] or dg['lookups']:
+        state.report = state.report or {}
+        state.report['data_groups'] = {'groups': dg['groups'], 'lookups': dg['lookups']}
+        state.datagroups_script = dg['code'] or None
     return state
 
 
 def verify_node(state: GraphState) -> GraphState:
-    # Simple linter: check unmapped occurrences
     unmapped = [m for m in (state.mapping or []) if m.get('target') is None]
     state.report = state.report or {}
     state.report['unmapped'] = unmapped
+    if state.script:
+        checked = verify_script(state.script)
+        state.report.update({'verification': checked['verification'], 'verified_lines': checked['lines'],
+                             'confidence': checked['confidence']})
     return state
 
 
@@ -107,9 +121,10 @@ def report_builder_node(state: GraphState) -> GraphState:
 
 def build_graph():
     try:
-        sg = StateGraph(GraphState)
-    except TypeError:
+        from langgraph.graph import StateGraph, END  # heavy; only needed once the graph is built
+    except ImportError:  # allow running before dependency installed
         return None
+    sg = StateGraph(GraphState)
     sg.add_node('Router', router_node)
     sg.add_node('RAG_QA', rag_qa_node)
     sg.add_node('IRule_Parse', parse_node)
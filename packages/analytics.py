@@ -0,0 +1,195 @@
+"""Capability-gap analytics.
+
+At report time `record_run` writes the run's command/event histogram to
+`run_command_stats` and folds it into two aggregates with upserts:
+`gap_totals` (per command/event, all time) and `coverage_daily`. The read
+paths (`top_gaps`, `coverage_trend`, `what_if`) only touch the aggregates,
+whose size grows with distinct command names and days, not with runs.
+
+`rebuild` recomputes both aggregates from the per-run rows, re-evaluating
+mapped/unmapped against the current capability_map.json:
+python -m packages.analytics rebuild [--tenant acme]
+"""
+from __future__ import annotations
+import argparse, datetime, json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import case, delete, func, insert as sa_insert, select, update
+
+from packages.db import RunCommandStat, GapTotal, CoverageDaily, dialect_insert
+from packages.tenancy import current_tenant
+
+KINDS = ('command', 'event')
+
+
+def _upsert_add(session, model, rows: List[dict], keys: Sequence[str], add: Sequence[str], latest: Sequence[str] = ()):
+    """Insert `rows`; on a key conflict add the `add` columns onto the stored row and keep the larger `latest` values."""
+    if not rows:
+        return
+    stmt = dialect_insert(session, model).values(rows)
+    cols = model.__table__.c
+    updates = {c: cols[c] + stmt.excluded[c] for c in add}
+    updates.update({c: case((stmt.excluded[c] > cols[c], stmt.excluded[c]), else_=cols[c]) for c in latest})
+    session.execute(stmt.on_conflict_do_update(index_elements=list(keys), set_=updates))
+
+
+def run_histogram(ast: Optional[Dict[str, Any]], mapping: Optional[List[Dict[str, Any]]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """{(kind, name): {'count', 'mapped'}} for one migration."""
+    from packages.tools.irule_parser import SUPPORTED_EVENTS
+    hist: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for m in mapping or []:
+        h = hist.setdefault(('command', m['source_cmd']), {'count': 0, 'mapped': m.get('target') is not None})
+        h['count'] += 1
+    for ev in (ast or {}).get('events', []):
+        h = hist.setdefault(('event', ev['name']), {'count': 0, 'mapped': ev['name'] in SUPPORTED_EVENTS})
+        h['count'] += 1
+    return hist
+
+
+def record_run(session, run_id: str, ast: Optional[Dict[str, Any]], mapping: Optional[List[Dict[str, Any]]],
+               when: Optional[datetime.datetime] = None) -> bool:
+    """Store the run's histogram and fold it into the aggregates; False if the run was already recorded."""
+    if session.query(RunCommandStat.run_id).filter(RunCommandStat.run_id == run_id).first() is not None:
+        return False
+    tenant_id = current_tenant()
+    when = when or datetime.datetime.utcnow()
+    day = when.date()
+    hist = run_histogram(ast, mapping)
+    gaps = [key for key, h in hist.items() if not h['mapped']]
+    if hist:
+        session.execute(sa_insert(RunCommandStat), [
+            {'run_id': run_id, 'kind': kind, 'name': name, 'tenant_id': tenant_id, 'day': day, 'recorded_at': when,
+             'count': h['count'], 'mapped': h['mapped']}
+            for (kind, name), h in hist.items()])
+    _upsert_add(session, GapTotal, [
+        {'tenant_id': tenant_id, 'kind': kind, 'name': name,
+         'occurrences': h['count'], 'unmapped_occurrences': 0 if h['mapped'] else h['count'],
+         'runs': 1, 'unmapped_runs': 0 if h['mapped'] else 1, 'sole_gap_runs': int(gaps == [(kind, name)]),
+         'last_seen': when}
+        for (kind, name), h in hist.items()],
+        keys=('tenant_id', 'kind', 'name'),
+        add=('occurrences', 'unmapped_occurrences', 'runs', 'unmapped_runs', 'sole_gap_runs'), latest=('last_seen',))
+    commands = [h for (kind, _), h in hist.items() if kind == 'command']
+    _upsert_add(session, CoverageDaily, [{
+        'tenant_id': tenant_id, 'day': day, 'runs': 1, 'full_runs': int(not gaps),
+        'nodes': sum(h['count'] for h in commands), 'mapped_nodes': sum(h['count'] for h in commands if h['mapped'])}],
+        keys=('tenant_id', 'day'), add=('runs', 'full_runs', 'nodes', 'mapped_nodes'))
+    return True
+
+
+def top_gaps(session, kind: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    q = (select(GapTotal).where(GapTotal.tenant_id == current_tenant(), GapTotal.unmapped_occurrences > 0)
+         .order_by(GapTotal.unmapped_occurrences.desc(), GapTotal.name).limit(limit))
+    if kind:
+        q = q.where(GapTotal.kind == kind)
+    return [{'kind': g.kind, 'name': g.name, 'occurrences': g.unmapped_occurrences, 'runs': g.unmapped_runs,
+             'sole_gap_runs': g.sole_gap_runs, 'last_seen': g.last_seen.isoformat() if g.last_seen else None}
+            for g in session.execute(q).scalars()]
+
+
+def _ratio(num: int, den: int) -> float:
+    return round(num / den, 6) if den else 0.0
+
+
+def coverage_trend(session, days: int = 30) -> List[Dict[str, Any]]:
+    since = datetime.date.today() - datetime.timedelta(days=days)
+    q = (select(CoverageDaily).where(CoverageDaily.tenant_id == current_tenant(), CoverageDaily.day >= since)
+         .order_by(CoverageDaily.day))
+    return [{'day': c.day.isoformat(), 'runs': c.runs, 'full_runs': c.full_runs, 'nodes': c.nodes,
+             'mapped_nodes': c.mapped_nodes, 'coverage': _ratio(c.mapped_nodes, c.nodes)}
+            for c in session.execute(q).scalars()]
+
+
+def what_if(session, commands: Sequence[str]) -> Dict[str, Any]:
+    """Coverage if `commands` were mapped, over all recorded runs.
+
+    The node-coverage gain is exact. `min_runs_fully_mapped` counts runs whose
+    only gap is one of `commands`; runs missing several of them are not
+    counted, so it is a lower bound.
+    """
+    tenant_id = current_tenant()
+    runs, full_runs, nodes, mapped = session.execute(
+        select(func.coalesce(func.sum(CoverageDaily.runs), 0), func.coalesce(func.sum(CoverageDaily.full_runs), 0),
+               func.coalesce(func.sum(CoverageDaily.nodes), 0), func.coalesce(func.sum(CoverageDaily.mapped_nodes), 0))
+        .where(CoverageDaily.tenant_id == tenant_id)).one()
+    rows = session.execute(select(GapTotal).where(GapTotal.tenant_id == tenant_id, GapTotal.kind == 'command',
+                                                  GapTotal.name.in_(list(commands)))).scalars().all()
+    per_command = [{'name': g.name, 'coverage_gain': _ratio(g.unmapped_occurrences, nodes),
+                    'occurrences': g.unmapped_occurrences, 'runs': g.unmapped_runs, 'sole_gap_runs': g.sole_gap_runs}
+                   for g in sorted(rows, key=lambda g: -g.unmapped_occurrences)]
+    gained = sum(g.unmapped_occurrences for g in rows)
+    return {
+        'runs': runs, 'nodes': nodes,
+        'coverage': _ratio(mapped, nodes), 'projected_coverage': _ratio(mapped + gained, nodes),
+        'coverage_gain': _ratio(gained, nodes),
+        'full_runs': full_runs, 'min_runs_fully_mapped': full_runs + sum(g.sole_gap_runs for g in rows),
+        'per_command': per_command,
+        'unknown': sorted(set(commands) - {g.name for g in rows}),
+    }
+
+
+def _remap(session, tenant_filter) -> int:
+    """Re-evaluate mapped flags against the current capability map; returns rows changed."""
+    from packages.tools.appshape_generator import map_command
+    from packages.tools.irule_parser import SUPPORTED_EVENTS
+    changed = 0
+    names = session.execute(select(RunCommandStat.kind, RunCommandStat.name).where(*tenant_filter).distinct()).all()
+    for kind, name in names:
+        mapped = (map_command(name)[0] is not None) if kind == 'command' else name in SUPPORTED_EVENTS
+        res = session.execute(update(RunCommandStat).where(*tenant_filter, RunCommandStat.kind == kind, RunCommandStat.name == name,
+                                                           RunCommandStat.mapped != mapped).values(mapped=mapped))
+        changed += res.rowcount or 0
+    return changed
+
+
+def rebuild(session, tenant_id: Optional[str] = None) -> Dict[str, int]:
+    """Recompute gap_totals and coverage_daily from run_command_stats (one tenant, or all when None)."""
+    s = RunCommandStat
+    tenant_filter = [s.tenant_id == tenant_id] if tenant_id else []
+    remapped = _remap(session, tenant_filter)
+    session.execute(delete(GapTotal).where(*([GapTotal.tenant_id == tenant_id] if tenant_id else [])))
+    session.execute(delete(CoverageDaily).where(*([CoverageDaily.tenant_id == tenant_id] if tenant_id else [])))
+
+    unmapped = case((s.mapped.is_(False), 1), else_=0)
+    per_run = (select(s.run_id, s.tenant_id, s.day,
+                      func.sum(case((s.kind == 'command', s.count), else_=0)).label('nodes'),
+                      func.sum(case(((s.kind == 'command') & s.mapped.is_(True), s.count), else_=0)).label('mapped_nodes'),
+                      func.sum(unmapped).label('gaps'))
+               .where(*tenant_filter).group_by(s.run_id, s.tenant_id, s.day).subquery())
+    session.execute(sa_insert(CoverageDaily).from_select(
+        ['tenant_id', 'day', 'runs', 'full_runs', 'nodes', 'mapped_nodes'],
+        select(per_run.c.tenant_id, per_run.c.day, func.count(),
+               func.sum(case((per_run.c.gaps == 0, 1), else_=0)), func.sum(per_run.c.nodes), func.sum(per_run.c.mapped_nodes))
+        .group_by(per_run.c.tenant_id, per_run.c.day)))
+    session.execute(sa_insert(GapTotal).from_select(
+        ['tenant_id', 'kind', 'name', 'occurrences', 'unmapped_occurrences', 'runs', 'unmapped_runs', 'sole_gap_runs', 'last_seen'],
+        select(s.tenant_id, s.kind, s.name, func.sum(s.count), func.sum(case((s.mapped.is_(False), s.count), else_=0)),
+               func.count(), func.sum(unmapped), func.sum(case((s.mapped.is_(False) & (per_run.c.gaps == 1), 1), else_=0)),
+               func.max(s.recorded_at))
+        .join(per_run, per_run.c.run_id == s.run_id).where(*tenant_filter)
+        .group_by(s.tenant_id, s.kind, s.name)))
+    return {'remapped_rows': remapped,
+            'gap_rows': session.query(GapTotal).filter(*([GapTotal.tenant_id == tenant_id] if tenant_id else [])).count()}
+
+
+if __name__ == '__main__':
+    from packages.db import SessionLocal
+    from packages.tenancy import tenant_scope
+    ap = argparse.ArgumentParser(description='Capability-gap analytics')
+    ap.add_argument('--tenant', default=None, help='tenant id (default: DEFAULT_TENANT; rebuild: all tenants)')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('rebuild', help='recompute aggregates from per-run stats against the current capability map')
+    top = sub.add_parser('top', help='print the top unmapped commands/events')
+    top.add_argument('--kind', choices=KINDS, default=None)
+    top.add_argument('--limit', type=int, default=20)
+    args = ap.parse_args()
+    session = SessionLocal()
+    try:
+        if args.cmd == 'rebuild':
+            out: Any = rebuild(session, args.tenant)
+            session.commit()
+        else:
+            with tenant_scope(args.tenant):
+                out = top_gaps(session, kind=args.kind, limit=args.limit)
+        print(json.dumps(out, indent=2))
+    finally:
+        session.close()
@@ -2,24 +2,30 @@
 
 Responsibilities:
 - Walk path & collect files by allowed extensions
-- Hash (SHA256) & dedupe vs DB
+- Hash (SHA256) & dedupe vs DB: chunks/embeddings are keyed by content hash,
+  so bytes already indexed under any path are not chunked or embedded again
 - Load -> chunk -> embed -> upsert (documents, chunks tables)
-- Handle versioning & replace flag
+- Handle versioning (append-only, latest active) & replace flag (re-chunk,
+  then prune chunks of content no active document still has)
 """
 
 from pathlib import Path
 import hashlib
 from typing import List, Optional
-from packages.db import SessionLocal, upsert_document, insert_chunks
-from packages.settings import settings
+from packages.observability.metrics import counter, histogram
+from packages.rag import embeddings
 import mimetypes, uuid, time
 
 ALLOWED_EXT = {'.pdf', '.pptx', '.docx', '.txt', '.md'}
 
+_INGEST_SECONDS = histogram('ingest_path_seconds', 'Time spent ingesting one path', buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300))
+_INGEST_FILES = counter('ingest_files_total', 'Files seen by ingestion', ['result'])
+
 class IngestResult:
-    def __init__(self, files_indexed: int, skipped: int):
+    def __init__(self, files_indexed: int, skipped: int, deduplicated: int = 0):
         self.files_indexed = files_indexed
         self.skipped = skipped
+        self.deduplicated = deduplicated  # indexed files whose content was already chunked
 
 
 def sha256_bytes(data: bytes) -> str:
@@ -59,50 +65,88 @@ def load_file(path: Path) -> str:
 
 
 def embed_texts(texts):
-    # TODO: call OpenAI embedding model; return list[bytes] or list[floats]
-    return [b'' for _ in texts]
+    # float32 bytes per text; empty bytes while embeddings are disabled (no OpenAI key)
+    return embeddings.embed_texts(texts)
 
 
 def next_version(session, path: Path):
-    # TODO: query existing versions
-    return 1
+    from packages.db import next_document_version
+    return next_document_version(session, str(path))
 
 
 class IngestStats(IngestResult):
     duration_sec: float | None = None
 
 
-def ingest_path(path: str, tags: Optional[List[str]] = None, replace: bool = False) -> IngestResult:
-    start = time.time()
-    base = Path(path)
-    files = collect_files(base)
+@_INGEST_SECONDS.time()
+def ingest_files(files: List[Path], tags: Optional[List[str]] = None, replace: bool = False,
+                 tenant_id: Optional[str] = None) -> IngestResult:
+    from packages.db import (  # deferred: CLI --help needs no DB stack
+        SessionLocal, upsert_document, insert_chunks, index_chunk_vectors, content_indexed, delete_content_chunks,
+        copy_content_chunks, bump_corpus_generation, prune_orphan_chunks)
+    from packages.rag.qa_cache import invalidate_generation
+    from packages.tenancy import tenant_scope
     session = SessionLocal()
     indexed = 0
     skipped = 0
+    deduplicated = 0
+    rebuilt = set()  # content re-chunked by this call (replace=True)
+    pending = []  # chunks to index, written to the vector store once per call rather than once per file
+    bumped = None
     try:
-        for fp in files:
-            raw = fp.read_bytes()
-            h = sha256_bytes(raw)
-            text = load_file(fp)
-            version = next_version(session, fp)
-            doc, created = upsert_document(session,
-                                           title=fp.name,
-                                           path=str(fp),
-                                           mime=mimetypes.guess_type(fp.name)[0] or 'text/plain',
-                                           hash_=h,
-                                           tags=tags or [],
-                                           version=version,
-                                           active=True)
-            if not created and not replace:
-                skipped += 1
-                continue
-            chunks = chunk_text(text)
-            insert_chunks(session, doc.id, chunks)
-            indexed += 1
+        with tenant_scope(tenant_id) as tenant:
+            for fp in files:
+                raw = fp.read_bytes()
+                h = sha256_bytes(raw)
+                version = next_version(session, fp)
+                doc, created = upsert_document(session,
+                                               title=fp.name,
+                                               path=str(fp),
+                                               mime=mimetypes.guess_type(fp.name)[0] or 'text/plain',
+                                               hash_=h,
+                                               tags=tags or [],
+                                               version=version,
+                                               active=True)
+                if not created and not replace:
+                    skipped += 1
+                    _INGEST_FILES.labels('skipped').inc()
+                    continue
+                indexed += 1
+                if replace and h not in rebuilt:
+                    delete_content_chunks(session, h)
+                    rebuilt.add(h)
+                elif content_indexed(session, h):
+                    deduplicated += 1
+                    _INGEST_FILES.labels('deduplicated').inc()
+                    continue
+                # identical bytes another tenant already embedded: copy rows, skip the embedding call
+                rows = [] if replace else copy_content_chunks(session, h)
+                if rows:
+                    deduplicated += 1
+                    _INGEST_FILES.labels('deduplicated').inc()
+                else:
+                    chunks = chunk_text(load_file(fp))
+                    rows = insert_chunks(session, h, chunks, embeddings=embed_texts([c['text'] for c in chunks]))
+                    _INGEST_FILES.labels('indexed').inc()
+                session.flush()
+                pending.extend(rows)
+            index_chunk_vectors(session, pending)
+            # a replace pass also drops content no active document carries any more
+            pruned = prune_orphan_chunks(session) if replace else 0
+            if indexed or pruned:
+                bump_corpus_generation(session)  # invalidates cached QA answers for this tenant
+                bumped = tenant
         session.commit()
+        if bumped:
+            invalidate_generation(bumped)  # this process's QA cache sees the bump now, not after its TTL
     finally:
         session.close()
-    return IngestResult(files_indexed=indexed, skipped=skipped)
+    return IngestResult(files_indexed=indexed, skipped=skipped, deduplicated=deduplicated)
+
+
+def ingest_path(path: str, tags: Optional[List[str]] = None, replace: bool = False,
+                tenant_id: Optional[str] = None) -> IngestResult:
+    return ingest_files(collect_files(Path(path)), tags=tags, replace=replace, tenant_id=tenant_id)
 
 if __name__ == "__main__":
     import argparse, json
@@ -110,7 +154,8 @@ if __name__ == "__main__":
     ap.add_argument('--path', required=True)
     ap.add_argument('--tags', default='')
     ap.add_argument('--replace', action='store_true')
+    ap.add_argument('--tenant', default=None, help='tenant id (default: DEFAULT_TENANT)')
     args = ap.parse_args()
     tags = [t for t in args.tags.split(',') if t]
-    res = ingest_path(args.path, tags=tags, replace=args.replace)
-    print(json.dumps({"files_indexed": res.files_indexed, "skipped": res.skipped}))
+    res = ingest_path(args.path, tags=tags, replace=args.replace, tenant_id=args.tenant)
+    print(json.dumps({"files_indexed": res.files_indexed, "skipped": res.skipped, "deduplicated": res.deduplicated}))
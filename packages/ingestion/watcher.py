@@ -1,12 +1,12 @@
 """Folder watch ingestion using watchfiles.
 Run: python -m packages.ingestion.watcher --path ./docs --interval 2
 """
-from watchfiles import awatch
 from pathlib import Path
 import asyncio, argparse, time
 from packages.ingestion.ingest import ingest_path, ALLOWED_EXT
 
 async def watch(path: Path, interval: float, tags):
+    from watchfiles import awatch
     print(f"[watcher] watching {path} interval={interval}s")
     seen = {}
     while True:
@@ -1,6 +1,45 @@
-"""Structured logging setup."""
-import logging, sys, json, time
-from typing import Any, Mapping
+"""Structured logging setup.
+
+Records are rendered to JSON on a background thread: the calling thread only
+snapshots the record (plus trace/run/job ids) into a bounded queue. When the
+queue is full the record is dropped and counted, so logging never blocks
+request handling.
+"""
+import logging, sys, json, atexit, contextlib, queue, itertools
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Mapping, Optional
+from packages.observability.metrics import counter
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback
+    orjson = None  # type: ignore
+
+_log_context: ContextVar[Mapping[str, Any]] = ContextVar('log_context', default={})
+_DROPPED = counter('log_records_dropped_total', 'Log records dropped because the log queue was full')
+
+def _dumps(obj: Mapping[str, Any]) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, default=str).decode('utf-8')
+    return json.dumps(obj, default=str)
+
+@contextlib.contextmanager
+def bind_log_context(**fields):
+    """Attach fields (e.g. run_id, job_id) to every record logged inside the block."""
+    token = _log_context.set({**_log_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+def _current_trace_id() -> Optional[str]:
+    # never import OpenTelemetry just to log; no tracing module loaded means no span
+    trace = sys.modules.get('opentelemetry.trace')
+    if trace is None:
+        return None
+    ctx = trace.get_current_span().get_span_context()
+    return format(ctx.trace_id, '032x') if ctx.is_valid else None
 
 class JsonFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
@@ -8,18 +47,87 @@ class JsonFormatter(logging.Formatter):
             'level': record.levelname,
             'logger': record.name,
             'message': record.getMessage(),
-            'time': int(time.time()*1000)
+            'time': int(record.created*1000)
         }
         if record.exc_info:
             base['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            base['exc_info'] = record.exc_text
+        context = getattr(record, 'context', None)
+        if context:
+            base.update(context)
         if hasattr(record, 'extra_data') and isinstance(record.extra_data, Mapping):
             base.update(record.extra_data)  # type: ignore
-        return json.dumps(base)
+        return _dumps(base)
+
+class ContextFilter(logging.Filter):
+    """Copies trace id and bound context onto the record in the calling thread."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = dict(_log_context.get())
+        trace_id = _current_trace_id()
+        if trace_id:
+            context['trace_id'] = trace_id
+        record.context = context
+        return True
+
+class DebugSamplingFilter(logging.Filter):
+    """Keeps one in `every` DEBUG-or-lower records per logger; higher levels always pass."""
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(1, every)
+        self._counters: dict = {}
 
-def configure_logging():
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        seq = self._counters.get(record.name)
+        if seq is None:
+            seq = self._counters.setdefault(record.name, itertools.count())
+        return next(seq) % self.every == 0
+
+class BoundedQueueHandler(QueueHandler):
+    """Non-blocking enqueue; counts records that do not fit instead of waiting."""
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render args/exceptions now: the objects may change before the writer runs
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            _DROPPED.inc()
+
+_listener: Optional[QueueListener] = None
+
+def configure_logging(level: str = 'INFO', queue_size: int = 10000, debug_sample_every: int = 1):
+    global _listener
     root = logging.getLogger()
-    if not root.handlers:
-        h = logging.StreamHandler(sys.stdout)
-        h.setFormatter(JsonFormatter())
-        root.addHandler(h)
-    root.setLevel(logging.INFO)
+    if _listener is None and not root.handlers:
+        writer = logging.StreamHandler(sys.stdout)
+        writer.setFormatter(JsonFormatter())
+        handler = BoundedQueueHandler(queue.Queue(maxsize=queue_size))
+        handler.addFilter(DebugSamplingFilter(debug_sample_every))
+        handler.addFilter(ContextFilter())
+        root.addHandler(handler)
+        _listener = QueueListener(handler.queue, writer, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
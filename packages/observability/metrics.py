@@ -0,0 +1,339 @@
+"""Prometheus-style metrics (counters, gauges, histograms).
+
+Hot-path writes never take a lock: every counter/histogram keeps one value
+array per thread (per label set) and only the scrape walks and sums them.
+Exposed in Prometheus text format by `render_latest()`.
+"""
+from __future__ import annotations
+import abc, threading, time, functools, bisect, weakref
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Owner:
+    """Lives only in a thread's thread-local; collected when that thread exits."""
+    __slots__ = ('__weakref__',)
+
+
+class _Shards:
+    """Per-thread value arrays; each thread only ever writes its own.
+
+    When a thread exits its shard is folded into `_base` and released, so
+    thread churn (pools, ingest workers) does not grow memory.
+    """
+
+    def __init__(self, width: int):
+        self._width = width
+        self._local = threading.local()
+        self._all: Dict[int, List[float]] = {}
+        self._base = [0.0] * width
+        self._lock = threading.RLock()  # a finalizer may run on a thread that holds it
+
+    def cells(self) -> List[float]:
+        try:
+            return self._local.cells
+        except AttributeError:
+            cells = [0.0] * self._width
+            owner = _Owner()
+            with self._lock:
+                self._all[id(cells)] = cells
+            weakref.finalize(owner, self._retire, cells)
+            self._local.cells, self._local.owner = cells, owner
+            return cells
+
+    def _retire(self, cells: List[float]):
+        with self._lock:
+            if self._all.pop(id(cells), None) is not None:
+                for i, v in enumerate(cells):
+                    self._base[i] += v
+
+    def collect(self) -> List[float]:
+        with self._lock:
+            shards = list(self._all.values())
+            total = list(self._base)
+        for cells in shards:
+            for i, v in enumerate(cells):
+                total[i] += v
+        return total
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _fmt_value(v: float) -> str:
+    if v != v:
+        return 'NaN'
+    if v == float('inf'):
+        return '+Inf'
+    if v == int(v):
+        return str(int(v))
+    return repr(v)
+
+
+class _Metric(abc.ABC):
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """A fresh child holding one label set's values."""
+
+    def labels(self, *values, **kw):
+        if kw:
+            values = tuple(str(kw[n]) for n in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f'{self.name}: expected labels {self.labelnames}, got {values}')
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self) -> List[Tuple[Tuple[str, ...], object]]:
+        if not self.labelnames:
+            return [((), self._default)]
+        with self._lock:
+            return list(self._children.items())
+
+    def render(self) -> List[str]:
+        out = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for values, child in self._samples():
+            out.extend(self._render_child(values, child))
+        return out
+
+    @abc.abstractmethod
+    def _render_child(self, values, child) -> List[str]:
+        """Exposition lines for one child."""
+
+
+class _CounterChild:
+    __slots__ = ('_shards',)
+
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1.0):
+        self._shards.cells()[0] += amount
+
+    def get(self) -> float:
+        return self._shards.collect()[0]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def get(self) -> float:
+        return self._default.get()
+
+    def _render_child(self, values, child):
+        return [f'{self.name}{_fmt_labels(self.labelnames, values)} {_fmt_value(child.get())}']
+
+
+class _GaugeChild:
+    __slots__ = ('_value', '_fn', '_lock')
+
+    def __init__(self):
+        self._value = 0.0
+        self._fn: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self._value = float(value)
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self._value -= amount
+
+    def set_function(self, fn: Callable[[], float]):
+        self._fn = fn
+
+    def get(self) -> float:
+        if self._fn is not None:
+            try:
+                return float(self._fn())
+            except Exception:
+                return float('nan')
+        return self._value
+
+
+class Gauge(_Metric):
+    """Point-in-time value; writes are rare so a lock is fine here."""
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default.dec(amount)
+
+    def set_function(self, fn: Callable[[], float]):
+        self._default.set_function(fn)
+
+    def get(self) -> float:
+        return self._default.get()
+
+    def _render_child(self, values, child):
+        return [f'{self.name}{_fmt_labels(self.labelnames, values)} {_fmt_value(child.get())}']
+
+
+class _HistogramChild:
+    __slots__ = ('_bounds', '_shards')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        # one slot per bucket, one for +Inf, one for the running sum
+        self._shards = _Shards(len(bounds) + 2)
+
+    def observe(self, value: float):
+        cells = self._shards.cells()
+        cells[bisect.bisect_left(self._bounds, value)] += 1
+        cells[-1] += value
+
+    def time(self):
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[float], float]:
+        cells = self._shards.collect()
+        return cells[:-1], cells[-1]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != float('inf')))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self):
+        return _Timer(self._default)
+
+    def snapshot(self):
+        return self._default.snapshot()
+
+    def _render_child(self, values, child):
+        counts, total = child.snapshot()
+        out = []
+        cumulative = 0.0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = _fmt_value(bound)
+            out.append(f'{self.name}_bucket{_fmt_labels(self.labelnames, values, ("le", le))} {_fmt_value(cumulative)}')
+        labels = _fmt_labels(self.labelnames, values)
+        out.append(f'{self.name}_sum{labels} {_fmt_value(total)}')
+        out.append(f'{self.name}_count{labels} {_fmt_value(cumulative)}')
+        return out
+
+
+class _Timer:
+    """Context manager / decorator observing elapsed seconds into a histogram child."""
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child):
+        self._child = child
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+    def __call__(self, fn):
+        child = self._child
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            existing = self._metrics.get(name)
+            if existing is not None:
+                if not isinstance(existing, cls):
+                    raise ValueError(f'metric {name} already registered as {existing.kind}')
+                return existing
+            metric = cls(name, *args, **kwargs)
+            self._metrics[name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY._get_or_create(Counter, name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY._get_or_create(Gauge, name, documentation, labelnames)
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+def render_latest() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,193 @@
+"""On-demand request profiling and low-rate continuous sampling.
+
+Two capture modes for a single request:
+- `sample`: a helper thread samples the profiled thread's stack every
+  `interval` seconds and emits collapsed stacks (`a;b;c 12` per line), the
+  input format of flamegraph.pl, speedscope and inferno.
+- `cprofile`: deterministic cProfile of the profiled thread, saved as a
+  pstats file (snakeviz, flameprof, gprof2dot).
+
+Nothing here runs unless a capture is started, so disabled profiling costs
+only the header check in the API.
+"""
+from __future__ import annotations
+import cProfile, marshal, os, sys, threading, time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+MODES = ('sample', 'cprofile')
+FORMATS = {
+    'sample': ('collapsed', 'text/plain; charset=utf-8'),
+    'cprofile': ('pstats', 'application/octet-stream'),
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f'{module}:{name}'.replace(';', ':')
+
+
+def _collapse(frame, max_depth: int = 128) -> str:
+    parts = []
+    while frame is not None and len(parts) < max_depth:
+        parts.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(parts))
+
+
+def render_collapsed(stacks: Dict[str, int]) -> bytes:
+    return ''.join(f'{stack} {count}\n' for stack, count in sorted(stacks.items())).encode('utf-8')
+
+
+class SamplingProfiler:
+    """Samples one thread's stack on a helper thread until stopped."""
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.001):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None and self.thread_id != me:
+                self.stacks[_collapse(frame)] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Tuple[bytes, str, str]:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        ext, ctype = FORMATS['sample']
+        return render_collapsed(self.stacks), ext, ctype
+
+
+class CProfileCapture:
+    def __init__(self):
+        self._prof = cProfile.Profile()
+
+    def start(self):
+        self._prof.enable()
+        return self
+
+    def stop(self) -> Tuple[bytes, str, str]:
+        self._prof.disable()
+        self._prof.create_stats()
+        ext, ctype = FORMATS['cprofile']
+        return marshal.dumps(self._prof.stats), ext, ctype
+
+
+def start_profile(mode: str, interval: float = 0.001):
+    """Start a capture on the current thread; call `.stop()` for (data, ext, content_type)."""
+    if mode == 'cprofile':
+        return CProfileCapture().start()
+    return SamplingProfiler(interval=interval).start()
+
+
+class RequestProfile:
+    """Context manager around one request; a no-op when `mode` is None.
+
+    On exit (including on error) the capture is stopped and `data`, `ext`
+    and `content_type` are set.
+    """
+
+    def __init__(self, mode: Optional[str], interval: float = 0.001):
+        self.mode = mode
+        self.interval = interval
+        self.data: Optional[bytes] = None
+        self.ext = ''
+        self.content_type = ''
+        self._capture = None
+
+    def __enter__(self):
+        if self.mode:
+            self._capture = start_profile(self.mode, self.interval)
+        return self
+
+    def __exit__(self, *exc):
+        if self._capture is not None:
+            self.data, self.ext, self.content_type = self._capture.stop()
+            self._capture = None
+        return False
+
+    def call(self, fn, *args, **kwargs):
+        """Run `fn` with the capture active on the calling thread only.
+
+        Use this from a dedicated worker thread for async handlers: on the
+        event-loop thread a capture would also record other requests.
+        """
+        with self:
+            return fn(*args, **kwargs)
+
+
+class ContinuousSampler:
+    """Samples every thread at a low rate and aggregates collapsed stacks.
+
+    The sampler caps its own duty cycle at `max_overhead` (fraction of one
+    core): when a pass is slow it sleeps proportionally longer. Distinct
+    stacks are capped at `max_stacks`; further new stacks are counted under
+    `[other]`.
+    """
+
+    def __init__(self, hz: float = 10.0, max_overhead: float = 0.01, max_stacks: int = 5000):
+        self.interval = 1.0 / max(min(hz, 100.0), 0.1)
+        self.max_overhead = max_overhead
+        self.max_stacks = max_stacks
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample_once(self):
+        me = threading.get_ident()
+        frames = sys._current_frames()
+        with self._lock:
+            for tid, frame in frames.items():
+                if tid == me:
+                    continue
+                stack = _collapse(frame)
+                if stack not in self.stacks and len(self.stacks) >= self.max_stacks:
+                    stack = '[other]'
+                self.stacks[stack] += 1
+            self.samples += 1
+
+    def _run(self):
+        delay = self.interval
+        while not self._stop.wait(delay):
+            t0 = time.perf_counter()
+            self._sample_once()
+            cost = time.perf_counter() - t0
+            delay = max(self.interval, cost / self.max_overhead - cost)
+
+    def start(self):
+        if self._thread is None:
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name='continuous-profiler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def snapshot(self, reset: bool = False) -> bytes:
+        with self._lock:
+            data = render_collapsed(self.stacks)
+            if reset:
+                self.stacks.clear()
+                self.samples = 0
+                self.started_at = time.time()
+        return data
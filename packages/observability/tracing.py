@@ -1,20 +1,42 @@
-"""OpenTelemetry tracing setup (optional)."""
-from opentelemetry import trace
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+"""OpenTelemetry tracing setup (optional).
 
+The SDK and exporters are imported only when tracing is configured; until
+then `get_tracer()` hands out no-op tracers from the lightweight API package.
+"""
 _tracer_initialized = False
 
-def configure_tracing(service_name: str = 'ai-irule-migrator'):
+def _make_exporter(exporter: str, endpoint: str | None):
+    if exporter == 'otlp':
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=endpoint) if endpoint else OTLPSpanExporter()
+    if exporter == 'otlp_http':
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=endpoint) if endpoint else OTLPSpanExporter()
+    if exporter == 'none':
+        return None
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+    return ConsoleSpanExporter()
+
+def configure_tracing(service_name: str = 'ai-irule-migrator', exporter: str = 'console', endpoint: str | None = None):
+    """Install the global tracer provider.
+
+    `exporter` is one of console | otlp (gRPC) | otlp_http | none; `endpoint`
+    overrides the OTLP default (otherwise OTEL_EXPORTER_OTLP_* env vars apply).
+    """
     global _tracer_initialized
     if _tracer_initialized:
         return
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
     provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
-    processor = BatchSpanProcessor(ConsoleSpanExporter())
-    provider.add_span_processor(processor)
+    span_exporter = _make_exporter(exporter, endpoint)
+    if span_exporter is not None:
+        provider.add_span_processor(BatchSpanProcessor(span_exporter))
     trace.set_tracer_provider(provider)
     _tracer_initialized = True
 
 def get_tracer(name: str = 'default'):
+    from opentelemetry import trace
     return trace.get_tracer(name)
@@ -0,0 +1,33 @@
+"""Text embeddings.
+
+Vectors travel as float32 bytes (the format stored in `Chunk.embedding`).
+Without an OpenAI key embeddings are disabled: empty bytes are returned and
+retrieval stays keyword-only.
+"""
+from __future__ import annotations
+from array import array
+from typing import List, Sequence
+
+
+def to_bytes(vec: Sequence[float]) -> bytes:
+    return array('f', vec).tobytes()
+
+
+def from_bytes(data: bytes) -> List[float]:
+    out = array('f')
+    out.frombytes(data)
+    return out.tolist()
+
+
+def embed_texts(texts: Sequence[str]) -> List[bytes]:
+    from packages.settings import get_settings
+    settings = get_settings()
+    if not texts or not settings.openai_api_key:
+        return [b'' for _ in texts]
+    from openai import OpenAI  # heavy; only needed when embeddings are enabled
+    client = OpenAI(api_key=settings.openai_api_key, base_url=settings.openai_base_url)
+    out: List[bytes] = []
+    for i in range(0, len(texts), settings.embed_batch_size):
+        resp = client.embeddings.create(model=settings.openai_embed_model, input=list(texts[i:i + settings.embed_batch_size]))
+        out.extend(to_bytes(d.embedding) for d in resp.data)
+    return out
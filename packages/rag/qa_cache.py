@@ -0,0 +1,310 @@
+"""Semantic answer cache in front of QA.
+
+Paraphrases ("how do I set a header in AppShape", "set HTTP header
+appshape++") retrieve the same chunks and get the same answer. The cache
+embeds the question and returns the answer and citations of the most similar
+recently answered question of the same tenant when
+
+- cosine similarity is at least `qa_cache_threshold`,
+- it was asked with the same tags and top_k, and
+- the tenant's corpus generation (bumped by ingestion) has not changed.
+
+The generation is read from the DB at most once per
+`qa_cache_generation_ttl_seconds` per tenant, not on every lookup. Ingestion
+in this process calls `invalidate_generation` after it commits, so only
+ingests run by other processes can go unseen, and only for up to the TTL.
+
+Each tenant has its own matrix of unit vectors, at most `qa_cache_size` rows
+(size x embed dim x 4 bytes), searched exactly with one matrix-vector
+product; at this size that is faster than maintaining an ANN structure.
+Entries are evicted least recently used, and so are whole tenants beyond
+`qa_cache_max_tenants`.
+
+A share of hits (`qa_cache_audit_rate`) is recomputed anyway. When the
+fresh citations overlap the cached ones by less than `AUDIT_MIN_OVERLAP`,
+the hit counts as false: the fresh answer is returned and the entry dropped.
+`stats()` (GET /v1/admin/qa-cache) reports hit rate, saved compute seconds
+and audit results per tenant.
+"""
+from __future__ import annotations
+import random, threading, time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from packages.observability.metrics import counter, gauge
+from packages.rag import embeddings
+from packages.tenancy import current_tenant
+
+AUDIT_MIN_OVERLAP = 0.5
+AUDIT_LOG_SIZE = 200
+_CANDIDATES = 8  # above-threshold rows checked for a matching tags/top_k context
+
+_LOOKUPS = counter('qa_cache_lookups_total', 'Semantic QA cache lookups', ['result'])  # hit|miss|stale|bypass|false_hit
+_SAVED_SECONDS = counter('qa_cache_saved_seconds_total', 'Answer computation time skipped by cache hits')
+_ENTRIES = gauge('qa_cache_entries', 'Cached QA answers across tenants')
+
+
+def _np():
+    import numpy as np  # deferred like the embedded vector store
+    return np
+
+
+def _citation_key(c: Any) -> Any:
+    if isinstance(c, dict):
+        return (c.get('doc_id'), c.get('page_or_slide')) if c.get('doc_id') else c.get('title')
+    return c
+
+
+def citation_overlap(a: Sequence[Any], b: Sequence[Any]) -> float:
+    """Jaccard overlap of two citation lists (1.0 when both are empty)."""
+    ka, kb = {_citation_key(c) for c in a}, {_citation_key(c) for c in b}
+    return len(ka & kb) / len(ka | kb) if ka or kb else 1.0
+
+
+class _Entry:
+    __slots__ = ('question', 'context', 'answer', 'citations', 'seconds', 'created', 'hits')
+
+    def __init__(self, question: str, context: Tuple, answer: Any, citations: List[Any], seconds: float):
+        self.question, self.context, self.answer, self.citations, self.seconds = question, context, answer, citations, seconds
+        self.created = time.time()
+        self.hits = 0
+
+
+class _TenantCache:
+    def __init__(self, capacity: int, generation: int):
+        self.capacity = capacity
+        self.generation = generation
+        self.vecs = None  # (rows, dim) float32, grown by doubling up to capacity
+        self.entries: List[_Entry] = []
+        self.lru: 'OrderedDict[int, None]' = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'bypass': 0, 'false_hits': 0, 'audits': 0, 'saved_seconds': 0.0}
+
+    def clear(self):
+        self.vecs, self.entries, self.lru = None, [], OrderedDict()
+
+    def search(self, q, context: Tuple, threshold: float) -> Optional[Tuple[int, float]]:
+        n = len(self.entries)
+        if not n or self.vecs is None or self.vecs.shape[1] != q.shape[0]:
+            return None
+        np = _np()
+        sims = self.vecs[:n] @ q
+        above = np.flatnonzero(sims >= threshold)
+        for i in above[np.argsort(-sims[above])][:_CANDIDATES]:
+            if self.entries[i].context == context:
+                return int(i), float(sims[i])
+        return None
+
+    def touch(self, slot: int):
+        self.lru.move_to_end(slot)
+
+    def add(self, q, entry: _Entry) -> bool:
+        """Store `entry`; True when it displaced the least recently used one."""
+        np = _np()
+        if self.vecs is not None and self.vecs.shape[1] != q.shape[0]:
+            self.clear()  # embedding model changed
+        n = len(self.entries)
+        if n < self.capacity:
+            if self.vecs is None or n == self.vecs.shape[0]:
+                rows = min(self.capacity, max(16, 2 * n))
+                grown = np.zeros((rows, q.shape[0]), dtype=np.float32)
+                if self.vecs is not None:
+                    grown[:n] = self.vecs[:n]
+                self.vecs = grown
+            slot, evicted = n, False
+            self.entries.append(entry)
+        else:
+            slot, _ = self.lru.popitem(last=False)
+            self.entries[slot] = entry
+            evicted = True
+        self.vecs[slot] = q
+        self.lru[slot] = None
+        return evicted
+
+    def drop(self, slot: int):
+        """Remove one entry by moving the last row into its slot (rows stay contiguous)."""
+        last = len(self.entries) - 1
+        del self.lru[slot]
+        if slot != last:
+            self.entries[slot] = self.entries[last]
+            self.vecs[slot] = self.vecs[last]
+            del self.lru[last]
+            self.lru[slot] = None  # recency of the moved entry is approximated as fresh
+        self.entries.pop()
+
+
+def _db_generation(tenant_id: str) -> int:
+    from packages.db import SessionLocal, corpus_generation
+    s = SessionLocal()
+    try:
+        return corpus_generation(s, tenant_id)
+    finally:
+        s.close()
+
+
+class SemanticQACache:
+    def __init__(self, size: int = 512, threshold: float = 0.92, max_tenants: int = 32, audit_rate: float = 0.02,
+                 generation: Callable[[str], int] = _db_generation, generation_ttl: float = 2.0, seed: Optional[int] = None):
+        self.size = size
+        self.threshold = threshold
+        self.max_tenants = max_tenants
+        self.audit_rate = audit_rate
+        self._generation = generation
+        self.generation_ttl = generation_ttl
+        self._generations: 'OrderedDict[str, Tuple[int, float]]' = OrderedDict()  # tenant -> (generation, read at)
+        self._tenants: 'OrderedDict[str, _TenantCache]' = OrderedDict()
+        self._audits: deque = deque(maxlen=AUDIT_LOG_SIZE)
+        self._lock = threading.Lock()
+        self._rnd = random.Random(seed)
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def _tenant(self, tenant_id: str, generation: int) -> Tuple[_TenantCache, bool]:
+        """The tenant's cache (created or reset as needed) and whether it was stale. Caller holds the lock."""
+        tc = self._tenants.get(tenant_id)
+        stale = False
+        if tc is None:
+            tc = self._tenants[tenant_id] = _TenantCache(self.size, generation)
+            while len(self._tenants) > self.max_tenants:
+                self._tenants.popitem(last=False)
+        else:
+            self._tenants.move_to_end(tenant_id)
+            if tc.generation != generation:
+                stale = bool(tc.entries)
+                tc.clear()
+                tc.generation = generation
+        return tc, stale
+
+    def _current_generation(self, tenant_id: str) -> int:
+        now = time.monotonic()
+        with self._lock:
+            known = self._generations.get(tenant_id)
+            if known is not None and now - known[1] < self.generation_ttl:
+                return known[0]
+        generation = self._generation(tenant_id)
+        with self._lock:
+            self._generations[tenant_id] = (generation, now)
+            self._generations.move_to_end(tenant_id)
+            while len(self._generations) > self.max_tenants:
+                self._generations.popitem(last=False)
+        return generation
+
+    def invalidate_generation(self, tenant_id: str):
+        """Forget the tenant's cached generation; the next lookup reads it again."""
+        with self._lock:
+            self._generations.pop(tenant_id, None)
+
+    def _count(self, tc: Optional[_TenantCache], result: str, saved: float = 0.0):
+        _LOOKUPS.labels(result).inc()
+        if tc is not None:
+            key = {'hit': 'hits', 'miss': 'misses', 'false_hit': 'false_hits'}.get(result, result)
+            tc.stats[key] += 1
+            tc.stats['saved_seconds'] += saved
+        if saved:
+            _SAVED_SECONDS.inc(saved)
+
+    def answer(self, question: str, compute: Callable[[Optional[bytes]], Dict[str, Any]], *, tags: Optional[Sequence[str]] = None,
+               top_k: int = 6, tenant_id: Optional[str] = None) -> Dict[str, Any]:
+        """Cached or freshly computed answer.
+
+        `compute(query_embedding)` returns {'answer', 'citations', ...}; it gets
+        the question's embedding (None when embeddings are disabled) so
+        retrieval does not embed it again. The result carries `cache`: hit,
+        miss, stale (corpus changed since caching), false_hit (audited hit that
+        disagreed) or bypass (cache disabled or no embedding).
+        """
+        raw = embeddings.embed_texts([question])[0]
+        if not self.enabled or not raw:
+            out = compute(raw or None)
+            self._count(None, 'bypass')
+            return {**out, 'cache': 'bypass'}
+        np = _np()
+        q = np.frombuffer(raw, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        tenant_id = tenant_id or current_tenant()
+        context = (tuple(sorted(tags or ())), top_k)
+        generation = self._current_generation(tenant_id)
+        with self._lock:
+            tc, stale = self._tenant(tenant_id, generation)
+            found = tc.search(q, context, self.threshold)
+            audit = False
+            if found is not None:
+                slot, similarity = found
+                entry = tc.entries[slot]
+                entry.hits += 1
+                tc.touch(slot)
+                audit = self._rnd.random() < self.audit_rate
+                if not audit:
+                    self._count(tc, 'hit', entry.seconds)
+                    return {'answer': entry.answer, 'citations': entry.citations, 'cache': 'hit',
+                            'similarity': round(similarity, 4), 'cached_question': entry.question}
+        start = time.perf_counter()
+        out = compute(raw)
+        seconds = time.perf_counter() - start
+        citations = out.get('citations') or []
+        with self._lock:
+            tc, _ = self._tenant(tenant_id, generation)
+            if found is not None:
+                overlap = citation_overlap(entry.citations, citations)
+                false_hit = overlap < AUDIT_MIN_OVERLAP
+                tc.stats['audits'] += 1
+                self._audits.append({'tenant_id': tenant_id, 'question': question, 'cached_question': entry.question,
+                                     'similarity': round(similarity, 4), 'citation_overlap': round(overlap, 4),
+                                     'same_answer': entry.answer == out.get('answer'), 'false_hit': false_hit,
+                                     'time': time.time()})
+                if not false_hit:
+                    self._count(tc, 'hit')
+                    return {**out, 'cache': 'hit', 'similarity': round(similarity, 4), 'cached_question': entry.question}
+                if slot < len(tc.entries) and tc.entries[slot] is entry:
+                    tc.drop(slot)
+                self._count(tc, 'false_hit')
+                status = 'false_hit'
+            else:
+                status = 'stale' if stale else 'miss'
+                self._count(tc, status)
+            tc.add(q, _Entry(question, context, out.get('answer'), citations, seconds))
+            _ENTRIES.set(sum(len(t.entries) for t in self._tenants.values()))
+        return {**out, 'cache': status}
+
+    def stats(self, recent_audits: int = 50) -> Dict[str, Any]:
+        with self._lock:
+            tenants = {}
+            for tenant_id, tc in self._tenants.items():
+                st = dict(tc.stats)
+                answered = st['hits'] + st['misses'] + st['stale'] + st['false_hits']
+                tenants[tenant_id] = {**st, 'entries': len(tc.entries), 'generation': tc.generation,
+                                      'hit_rate': round(st['hits'] / answered, 4) if answered else 0.0,
+                                      'false_hit_rate': round(st['false_hits'] / st['audits'], 4) if st['audits'] else None}
+            audits = list(self._audits)[-recent_audits:] if recent_audits else []
+        return {'enabled': self.enabled, 'threshold': self.threshold, 'size': self.size, 'max_tenants': self.max_tenants,
+                'audit_rate': self.audit_rate, 'tenants': tenants, 'recent_audits': audits}
+
+    def reset(self):
+        with self._lock:
+            self._tenants.clear()
+            self._generations.clear()
+            self._audits.clear()
+            _ENTRIES.set(0)
+
+
+_cache: Optional[SemanticQACache] = None
+_cache_lock = threading.Lock()
+
+
+def get_qa_cache() -> SemanticQACache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from packages.settings import get_settings
+                s = get_settings()
+                _cache = SemanticQACache(size=s.qa_cache_size, threshold=s.qa_cache_threshold,
+                                         max_tenants=s.qa_cache_max_tenants, audit_rate=s.qa_cache_audit_rate,
+                                         generation_ttl=s.qa_cache_generation_ttl_seconds)
+    return _cache
+
+
+def invalidate_generation(tenant_id: str):
+    """Called after ingestion commits; a no-op when no cache has been created in this process."""
+    if _cache is not None:
+        _cache.invalidate_generation(tenant_id)
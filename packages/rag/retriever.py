@@ -3,11 +3,17 @@ Implements simple hybrid: keyword scan + vector (stub) then blend.
 """
 
 from __future__ import annotations
-from typing import List, Dict, Any, Tuple
-from packages.db import SessionLocal, vector_search, Chunk, Document
-from sqlalchemy import select
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
+from packages.observability.metrics import histogram
+from packages.tenancy import current_tenant
+from packages.rag import embeddings
 import re, math
 
+if TYPE_CHECKING:
+    from packages.db import Chunk, Document  # the DB stack loads on first retrieval, not on import
+
+_RETRIEVE_SECONDS = histogram('retrieval_seconds', 'End-to-end hybrid retrieval latency')
+
 class RetrievalResult:
     def __init__(self, chunks: List[Dict[str, Any]]):
         self.chunks = chunks
@@ -25,9 +31,19 @@ def keyword_candidates(session, query: str, tags) -> List[Tuple[Chunk, float]]:
     words = [w for w in re.findall(r"[A-Za-z0-9_]+", query.lower()) if len(w) > 2]
     if not words:
         return []
-    stmt = select(Chunk).join(Document, Chunk.document_id == Document.id)
+    from sqlalchemy import select
+    from packages.db import Chunk, Document, live_chunks
+    tenant_id = current_tenant()
+    stmt = live_chunks(select(Chunk), tenant_id)
     if tags:
-        stmt = stmt.filter(Document.tags.op("&&")(tags))
+        live = (Document.tenant_id == tenant_id, Document.active.is_(True))
+        if session.get_bind().dialect.name == 'postgresql':
+            hashes = select(Document.hash).where(*live, Document.tags.op("&&")(tags))
+        else:
+            wanted = set(tags)
+            hashes = [h for h, t in session.execute(select(Document.hash, Document.tags).where(*live))
+                      if wanted.intersection(t or [])]
+        stmt = stmt.filter(Chunk.content_hash.in_(hashes))
     rows = session.execute(stmt.limit(500)).scalars().all()
     scored = []
     for ch in rows:
@@ -61,32 +77,52 @@ def blend(vector_hits: List[Dict[str, Any]], keyword_hits: List[Tuple[Chunk, flo
     return out[:top_k]
 
 
+def source_documents(session, hashes) -> Dict[str, Document]:
+    """One active document per content hash (the earliest path wins when content is shared)."""
+    docs: Dict[str, Document] = {}
+    if hashes:
+        from packages.db import Document
+        q = (session.query(Document).filter(Document.tenant_id == current_tenant(), Document.hash.in_(set(hashes)),
+                                            Document.active.is_(True)).order_by(Document.created_at))
+        for doc in q:
+            docs.setdefault(doc.hash, doc)
+    return docs
+
+
 def build_citations(chunks):
     cites = []
     for ch in chunks:
         meta = ch.get('meta_json') or {}
         cites.append({
-            'doc_id': meta.get('document_id'),
-            'title': meta.get('title'),
+            'doc_id': ch.get('document_id') or meta.get('document_id'),
+            'title': ch.get('title') or meta.get('title'),
             'page_or_slide': meta.get('page')
         })
     return cites
 
 
-def retrieve(query: str, tags=None, top_k: int = 6) -> RetrievalResult:
+@_RETRIEVE_SECONDS.time()
+def retrieve(query: str, tags=None, top_k: int = 6, query_embedding: Optional[bytes] = None) -> RetrievalResult:
+    """Hybrid retrieval; pass `query_embedding` when the caller already embedded `query`."""
+    from packages.db import SessionLocal, vector_search
     session = SessionLocal()
     try:
-        # vector search placeholder
-        vector_hits = []  # TODO integrate real embeddings & distance
+        if query_embedding is None:
+            query_embedding = embeddings.embed_texts([query])[0]
+        vector_hits = vector_search(session, query_embedding, top_k=top_k)
         kw_hits = keyword_candidates(session, query, tags)
         blended = blend(vector_hits, kw_hits, top_k)
+        docs = source_documents(session, [item['chunk'].content_hash for item in blended])
         results = []
         for item in blended:
             ch = item['chunk']
+            doc = docs.get(ch.content_hash)
             results.append({
                 'id': ch.id,
                 'text': ch.text,
                 'meta_json': ch.meta_json,
+                'document_id': doc.id if doc else None,
+                'title': doc.title if doc else None,
                 'score': item['score']
             })
     finally:
@@ -0,0 +1,616 @@
+"""Vector store backends behind `db.vector_search`.
+
+- `pgvector`: vectors in Postgres (`chunk_vectors`, HNSW cosine index, or
+  ivfflat trained once a partition holds `vector_ivf_min_rows` rows).
+- `embedded`: a float32/float16 NumPy matrix memory-mapped from a snapshot
+  directory, searched with blocked brute-force dot products; above
+  `vector_ivf_min_rows` an IVF layer (k-means lists) limits the scan to the
+  `nprobe` closest lists. Ingestion appends small delta segments that searches
+  merge; they are compacted into a new snapshot in the background. Every
+  uvicorn worker maps the same files, so the OS page cache holds a single copy.
+
+Both are partitioned by tenant: pgvector lists-partitions `chunk_vectors` on
+`tenant_id` (one partition and ivfflat index per tenant), and the embedded
+store keeps one snapshot directory per tenant. A tenant's query therefore
+only touches its own index, so recall does not suffer from filtering other
+tenants' neighbours out after the ANN step.
+
+Vectors are L2-normalised on write, so scores are cosine similarities.
+`Chunk.embedding` stays the source of truth; snapshots can be exported from
+it and imported into pgvector (`python -m packages.rag.vectorstore --help`).
+"""
+from __future__ import annotations
+import hashlib, json, logging, os, shutil, threading, contextlib
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer assumption
+    fcntl = None  # type: ignore
+
+Hit = Tuple[str, float]
+
+
+def _np():
+    import numpy as np  # deferred: keeps API/CLI import cheap when the embedded store is unused
+    return np
+
+
+def _as_matrix(vectors, dim: Optional[int] = None):
+    np = _np()
+    if isinstance(vectors, (bytes, bytearray)):
+        mat = np.frombuffer(vectors, dtype=np.float32)[None, :]
+    elif isinstance(vectors, (list, tuple)) and vectors and isinstance(vectors[0], (bytes, bytearray)):
+        mat = np.stack([np.frombuffer(v, dtype=np.float32) for v in vectors])
+    else:
+        mat = np.asarray(vectors, dtype=np.float32)
+        if mat.ndim == 1:
+            mat = mat[None, :]
+    if dim is not None and mat.shape[1] != dim:
+        raise ValueError(f'expected {dim}-d vectors, got {mat.shape[1]}')
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (mat / norms).astype(np.float32)
+
+
+def _topk(scores, k: int):
+    np = _np()
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, part, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(part, order, axis=1)
+
+
+class _Segment:
+    """One immutable run of vectors: a generation's base or one of its delta segments."""
+
+    def __init__(self, d: Path):
+        np = _np()
+        meta = json.loads((d / 'meta.json').read_text())
+        self.path = d
+        self.dim = meta['dim']
+        self.count = meta['count']
+        self.dtype = np.dtype(meta['dtype'])
+        self.ids: List[str] = json.loads((d / 'ids.json').read_text())
+        self.matrix = (np.memmap(d / 'vectors.bin', dtype=self.dtype, mode='r', shape=(self.count, self.dim))
+                       if self.count else np.empty((0, self.dim), dtype=self.dtype))
+        self.centroids = np.load(d / 'centroids.npy') if (d / 'centroids.npy').exists() else None
+        self.offsets = np.load(d / 'offsets.npy') if (d / 'offsets.npy').exists() else None
+
+
+class _Snapshot:
+    """A generation's base segment plus its first `deltas` delta segments.
+
+    A row whose id reappears in a later segment is shadowed (`dead`), so
+    re-adding an id replaces its vector without rewriting earlier segments.
+    """
+
+    def __init__(self, root: Path, name: str, deltas: int = 0, previous: Optional['_Snapshot'] = None):
+        np = _np()
+        d = root / name
+        reuse = {seg.path: seg for seg in previous.segments} if previous is not None and previous.name == name else {}
+        paths = [d] + [d / f'delta-{i:05d}' for i in range(1, deltas + 1)]
+        self.name, self.deltas = name, deltas
+        self.segments: List[_Segment] = [reuse.get(p) or _Segment(p) for p in paths]
+        self.dead: List[Optional[object]] = [None] * len(self.segments)
+        seen: set = set()
+        for i in range(len(self.segments) - 1, -1, -1):
+            seg = self.segments[i]
+            if seen:
+                mask = np.fromiter((cid in seen for cid in seg.ids), dtype=bool, count=seg.count)
+                if mask.any():
+                    self.dead[i] = mask
+            seen.update(seg.ids)
+        self.dim = next((seg.dim for seg in self.segments if seg.count), self.segments[0].dim)
+        self.count = sum(seg.count - (int(m.sum()) if m is not None else 0) for seg, m in zip(self.segments, self.dead))
+
+    @property
+    def base(self) -> _Segment:
+        return self.segments[0]
+
+    @property
+    def centroids(self):
+        return self.base.centroids
+
+    @property
+    def delta_rows(self) -> int:
+        return sum(seg.count for seg in self.segments[1:])
+
+
+def _kmeans(sample, nlist: int, iters: int = 10, seed: int = 0):
+    np = _np()
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = (sample @ centroids.T).argmax(axis=1)
+        for c in range(nlist):
+            members = sample[assign == c]
+            if len(members):
+                v = members.mean(axis=0)
+                centroids[c] = v / (np.linalg.norm(v) or 1.0)
+    return centroids
+
+
+class EmbeddedVectorStore:
+    """Memory-mapped snapshot store.
+
+    Writers publish whole generations atomically (`write_snapshot`, `compact`)
+    and append small delta segments to the current one (`add`); searches merge
+    the base with its deltas. Once there are `max_deltas` segments or they hold
+    more than `delta_ratio` of the base rows, a compaction folds them into a new
+    generation, retraining the IVF lists, on a background thread.
+    """
+
+    def __init__(self, path: str, dtype: str = 'float32', ivf_min_rows: int = 200000, nprobe: int = 8,
+                 block_rows: int = 65536, max_deltas: int = 16, delta_ratio: float = 0.25,
+                 background_compaction: bool = True):
+        self.root = Path(path)
+        self.dtype = dtype
+        self.ivf_min_rows = ivf_min_rows
+        self.nprobe = nprobe
+        self.block_rows = block_rows
+        self.max_deltas = max_deltas
+        self.delta_ratio = delta_ratio
+        self.background_compaction = background_compaction
+        self._snap: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+
+    # -- reading -------------------------------------------------------
+    def _current(self) -> Optional[Tuple[str, int]]:
+        """(generation name, published delta segments) from CURRENT."""
+        try:
+            parts = (self.root / 'CURRENT').read_text().split()
+        except FileNotFoundError:
+            return None
+        if not parts:
+            return None
+        return parts[0], int(parts[1]) if len(parts) > 1 else 0
+
+    def _current_name(self) -> Optional[str]:
+        cur = self._current()
+        return cur[0] if cur else None
+
+    def snapshot(self) -> Optional[_Snapshot]:
+        cur = self._current()
+        if cur is None:
+            return None
+        snap = self._snap
+        if snap is None or (snap.name, snap.deltas) != cur:
+            with self._lock:
+                if self._snap is None or (self._snap.name, self._snap.deltas) != cur:
+                    self._snap = _Snapshot(self.root, cur[0], cur[1], previous=self._snap)
+                snap = self._snap
+        return snap
+
+    def _scan(self, seg: _Segment, dead, q, start: int, stop: int, top_k: int, best):
+        np = _np()
+        for lo in range(start, stop, self.block_rows):
+            hi = min(lo + self.block_rows, stop)
+            scores = q @ np.asarray(seg.matrix[lo:hi], dtype=np.float32).T
+            if dead is not None:
+                scores[:, dead[lo:hi]] = -np.inf
+            idx = _topk(scores, top_k)
+            cand_s = np.take_along_axis(scores, idx, axis=1)
+            best_s, best_i = best
+            merged_s = np.concatenate([best_s, cand_s], axis=1)
+            merged_i = np.concatenate([best_i, idx + lo], axis=1)
+            keep = _topk(merged_s, top_k)
+            best = (np.take_along_axis(merged_s, keep, axis=1), np.take_along_axis(merged_i, keep, axis=1))
+        return best
+
+    def _search_segment(self, seg: _Segment, dead, q, top_k: int) -> List[List[Hit]]:
+        np = _np()
+        if seg.count == 0:
+            return [[] for _ in range(len(q))]
+        if seg.centroids is None:
+            best = (np.empty((len(q), 0), np.float32), np.empty((len(q), 0), np.int64))
+            best_s, best_i = self._scan(seg, dead, q, 0, seg.count, top_k, best)
+            return [[(seg.ids[i], float(s)) for s, i in zip(rs, ri) if s > -np.inf] for rs, ri in zip(best_s, best_i)]
+        out = []
+        probes = _topk(q @ seg.centroids.T, self.nprobe)
+        for row, lists in zip(q, probes):
+            best = (np.empty((1, 0), np.float32), np.empty((1, 0), np.int64))
+            for c in lists:
+                best = self._scan(seg, dead, row[None, :], int(seg.offsets[c]), int(seg.offsets[c + 1]), top_k, best)
+            out.append([(seg.ids[i], float(s)) for s, i in zip(best[0][0], best[1][0]) if s > -np.inf])
+        return out
+
+    def search_many(self, queries, top_k: int = 6) -> List[List[Hit]]:
+        snap = self.snapshot()
+        q = _as_matrix(queries)
+        if snap is None or snap.count == 0:
+            return [[] for _ in range(len(q))]
+        if q.shape[1] != snap.dim:
+            raise ValueError(f'query has {q.shape[1]} dims, index has {snap.dim}')
+        per_segment = [self._search_segment(seg, dead, q, top_k) for seg, dead in zip(snap.segments, snap.dead)]
+        if len(per_segment) == 1:
+            return per_segment[0]
+        return [sorted((h for hits in rows for h in hits), key=lambda h: -h[1])[:top_k] for rows in zip(*per_segment)]
+
+    def search(self, query, top_k: int = 6) -> List[Hit]:
+        return self.search_many(query, top_k)[0]
+
+    def iter_items(self) -> Iterator[Tuple[str, bytes]]:
+        np = _np()
+        snap = self.snapshot()
+        if snap is None:
+            return
+        for seg, dead in zip(snap.segments, snap.dead):
+            for lo in range(0, seg.count, self.block_rows):
+                block = np.asarray(seg.matrix[lo:lo + self.block_rows], dtype=np.float32)
+                for j, vec in enumerate(block):
+                    if dead is None or not dead[lo + j]:
+                        yield seg.ids[lo + j], vec.tobytes()
+
+    # -- writing -------------------------------------------------------
+    @contextlib.contextmanager
+    def _writer_lock(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / '.lock', 'a') as fh:
+            if fcntl:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _set_current(self, name: str, deltas: int = 0):
+        tmp = self.root / 'CURRENT.tmp'
+        tmp.write_text(f'{name} {deltas}' if deltas else name)
+        os.replace(tmp, self.root / 'CURRENT')
+
+    def _write_segment(self, d: Path, ids: List[str], mat, meta: dict):
+        mat.astype(self.dtype).tofile(d / 'vectors.bin')
+        (d / 'ids.json').write_text(json.dumps(ids))
+        (d / 'meta.json').write_text(json.dumps(meta))
+
+    def _publish(self, ids: List[str], mat) -> str:
+        np = _np()
+        prev = self._current_name()
+        gen = int(prev.split('-')[1]) + 1 if prev else 1
+        name = f'gen-{gen:08d}'
+        d = self.root / name
+        if d.exists():
+            shutil.rmtree(d)
+        d.mkdir(parents=True)
+        meta = {'dim': int(mat.shape[1]) if mat.size else 0, 'count': len(ids), 'dtype': self.dtype, 'ivf': None}
+        if len(ids) >= self.ivf_min_rows:
+            nlist = max(1, int(len(ids) ** 0.5))
+            rng = np.random.default_rng(0)
+            sample = mat[rng.choice(len(ids), min(len(ids), nlist * 64), replace=False)]
+            centroids = _kmeans(sample, nlist)
+            assign = np.concatenate([(mat[lo:lo + self.block_rows] @ centroids.T).argmax(axis=1)
+                                     for lo in range(0, len(ids), self.block_rows)])
+            order = np.argsort(assign, kind='stable')
+            mat = mat[order]
+            ids = [ids[i] for i in order]
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+            np.save(d / 'centroids.npy', centroids)
+            np.save(d / 'offsets.npy', offsets)
+            meta['ivf'] = {'nlist': nlist}
+        self._write_segment(d, ids, mat, meta)
+        self._set_current(name)
+        for old in sorted(p.name for p in self.root.glob('gen-*')):
+            if old not in (name, prev):  # keep the previous generation for readers still mapping it
+                shutil.rmtree(self.root / old, ignore_errors=True)
+        return name
+
+    def write_snapshot(self, ids: Sequence[str], vectors) -> str:
+        mat = _as_matrix(vectors) if len(ids) else _np().empty((0, 0), _np().float32)
+        with self._writer_lock():
+            return self._publish(list(ids), mat)
+
+    def add(self, ids: Sequence[str], vectors):
+        """Append (or replace) vectors as a delta segment of the current generation.
+
+        Costs O(len(ids)) regardless of index size; the existing segments are
+        not read or rewritten.
+        """
+        if not ids:
+            return
+        new = _as_matrix(vectors)
+        with self._writer_lock():
+            snap = self.snapshot()
+            if snap is None or snap.count == 0:
+                return self._publish(list(ids), new)
+            if new.shape[1] != snap.dim:
+                raise ValueError(f'expected {snap.dim}-d vectors, got {new.shape[1]}')
+            n = snap.deltas + 1
+            d = self.root / snap.name / f'delta-{n:05d}'
+            if d.exists():  # written by a writer that died before publishing it
+                shutil.rmtree(d)
+            d.mkdir()
+            self._write_segment(d, list(ids), new, {'dim': int(new.shape[1]), 'count': len(ids), 'dtype': self.dtype})
+            self._set_current(snap.name, n)
+            due = n >= self.max_deltas or snap.delta_rows + len(ids) > self.delta_ratio * max(snap.base.count, 1)
+        if due:
+            self._schedule_compaction()
+
+    def compact(self) -> Optional[str]:
+        """Fold the delta segments into a new generation (shadowed rows dropped, IVF lists retrained)."""
+        np = _np()
+        with self._writer_lock():
+            snap = self.snapshot()
+            if snap is None or snap.deltas == 0:
+                return None
+            ids: List[str] = []
+            blocks = []
+            for seg, dead in zip(snap.segments, snap.dead):
+                live = np.flatnonzero(~dead) if dead is not None else None
+                ids.extend(seg.ids if live is None else [seg.ids[i] for i in live])
+                mat = np.asarray(seg.matrix, dtype=np.float32)
+                blocks.append(mat if live is None else mat[live])
+            return self._publish(ids, np.concatenate(blocks))
+
+    def _schedule_compaction(self):
+        if not self.background_compaction:
+            self.compact()
+            return
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            # not a daemon: a CLI ingest waits for the compaction instead of abandoning it half-written
+            self._compactor = threading.Thread(target=self._compact_logged, name='vector-compaction')
+            self._compactor.start()
+
+    def _compact_logged(self):
+        try:
+            self.compact()
+        except Exception:
+            logging.getLogger(__name__).exception('vector index compaction failed for %s', self.root)
+
+
+class PgVectorStore:
+    """pgvector-backed store for one tenant; works through the caller's session.
+
+    `index='hnsw'` builds the partition's graph index up front; it needs no
+    training, so recall holds as rows arrive. ivfflat derives its list
+    centroids from the rows present at build time, so `ensure_index` only
+    builds it once the partition has `ivf_min_rows` rows (lists = rows/1000,
+    i.e. far more than the ~40 rows per list pgvector needs) and rebuilds it
+    after the partition has grown 4x; below that the partition is scanned exactly.
+    """
+
+    _partitions: set = set()  # tenants whose partition exists (per process)
+    ROWS_PER_LIST = 1000  # pgvector's suggested lists = rows / 1000
+    REBUILD_GROWTH = 4
+    # hnsw/ivfflat index at most 2000 dims of `vector` and 4000 of `halfvec` (pgvector >= 0.7)
+    MAX_VECTOR_DIM = 2000
+    MAX_HALFVEC_DIM = 4000
+
+    def __init__(self, session, dim: int, tenant_id: str, index: str = 'hnsw', ivf_min_rows: int = 200000):
+        from packages.tenancy import validate_tenant
+        if index not in ('hnsw', 'ivfflat'):
+            raise ValueError(f'pgvector index must be hnsw or ivfflat, not {index!r}')
+        if not 0 < dim <= self.MAX_HALFVEC_DIM:
+            raise ValueError(f'pgvector cannot index {dim}-dim embeddings (max {self.MAX_HALFVEC_DIM}); '
+                             f'lower EMBED_DIM or use VECTOR_DB=embedded')
+        self.session = session
+        self.dim = dim
+        # half precision above the `vector` limit: the index stays usable, cosine ranking barely moves
+        self.column_type = 'vector' if dim <= self.MAX_VECTOR_DIM else 'halfvec'
+        self.tenant_id = validate_tenant(tenant_id)  # inlined into DDL below
+        self.index = index
+        self.ivf_min_rows = ivf_min_rows
+
+    @staticmethod
+    def _literal(vec) -> str:
+        return '[' + ','.join(f'{x:.7g}' for x in vec) + ']'
+
+    def ensure(self):
+        from sqlalchemy import text
+        self.session.execute(text('CREATE EXTENSION IF NOT EXISTS vector'))
+        self.session.execute(text(
+            f'CREATE TABLE IF NOT EXISTS chunk_vectors ('
+            f' tenant_id VARCHAR NOT NULL,'
+            f' chunk_id VARCHAR NOT NULL REFERENCES chunks(id) ON DELETE CASCADE,'
+            f' embedding {self.column_type}({self.dim}),'
+            f' PRIMARY KEY (tenant_id, chunk_id)) PARTITION BY LIST (tenant_id)'))
+
+    @property
+    def partition(self) -> str:
+        return 'chunk_vectors_' + hashlib.sha1(self.tenant_id.encode()).hexdigest()[:16]
+
+    @property
+    def index_name(self) -> str:
+        return f'ix_{self.partition}_embedding'
+
+    def ensure_partition(self):
+        from sqlalchemy import text
+        if self.tenant_id in self._partitions:
+            return
+        self.ensure()
+        self.session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {self.partition} PARTITION OF chunk_vectors FOR VALUES IN ('{self.tenant_id}')"))
+        if self.index == 'hnsw':
+            self.session.execute(text(
+                f'CREATE INDEX IF NOT EXISTS {self.index_name} ON {self.partition} USING hnsw (embedding {self.column_type}_cosine_ops)'))
+        self._partitions.add(self.tenant_id)
+
+    def _ivf_lists(self) -> Optional[int]:
+        """`lists` of the partition's current ivfflat index; None when there is none."""
+        from sqlalchemy import text
+        opts = self.session.execute(text('SELECT reloptions FROM pg_class WHERE relname = :ix'),
+                                    {'ix': self.index_name}).scalar()
+        if opts is None:
+            exists = self.session.execute(text('SELECT 1 FROM pg_class WHERE relname = :ix'), {'ix': self.index_name}).scalar()
+            return 0 if exists else None
+        return next((int(o.split('=', 1)[1]) for o in opts if o.startswith('lists=')), 0)
+
+    def ensure_index(self, force: bool = False) -> Optional[int]:
+        """ivfflat: (re)train the partition's index when there is enough data; returns the new `lists`, else None."""
+        from sqlalchemy import text
+        if self.index != 'ivfflat':
+            return None
+        self.ensure_partition()
+        rows = self.session.execute(text(f'SELECT count(*) FROM {self.partition}')).scalar() or 0
+        if rows < self.ivf_min_rows and not force:
+            return None
+        lists = max(1, rows // self.ROWS_PER_LIST)
+        current = self._ivf_lists()
+        if current is not None and not force and rows < self.REBUILD_GROWTH * max(current, 1) * self.ROWS_PER_LIST:
+            return None
+        self.session.execute(text(f'DROP INDEX IF EXISTS {self.index_name}'))
+        self.session.execute(text(f'CREATE INDEX {self.index_name} ON {self.partition} '
+                                  f'USING ivfflat (embedding {self.column_type}_cosine_ops) WITH (lists = {lists})'))
+        return lists
+
+    def add(self, ids: Sequence[str], vectors):
+        from sqlalchemy import text
+        if not ids:
+            return
+        self.ensure_partition()
+        mat = _as_matrix(vectors, self.dim)
+        try:
+            self.session.execute(
+                text(f'INSERT INTO chunk_vectors (tenant_id, chunk_id, embedding) VALUES (:t, :id, CAST(:v AS {self.column_type})) '
+                     'ON CONFLICT (tenant_id, chunk_id) DO UPDATE SET embedding = EXCLUDED.embedding'),
+                [{'t': self.tenant_id, 'id': cid, 'v': self._literal(vec)} for cid, vec in zip(ids, mat)])
+        except Exception:
+            self._partitions.discard(self.tenant_id)  # the DDL may have been rolled back with an earlier transaction
+            raise
+
+    def search(self, query, top_k: int = 6) -> List[Hit]:
+        from sqlalchemy import text
+        q = self._literal(_as_matrix(query, self.dim)[0])
+        # the tenant_id predicate prunes to this tenant's partition and its own index
+        rows = self.session.execute(
+            text(f'SELECT chunk_id, 1 - (embedding <=> CAST(:q AS {self.column_type})) AS score FROM chunk_vectors '
+                 f'WHERE tenant_id = :t ORDER BY embedding <=> CAST(:q AS {self.column_type}) LIMIT :k'),
+            {'q': q, 't': self.tenant_id, 'k': top_k})
+        return [(r[0], float(r[1])) for r in rows]
+
+    def iter_items(self, batch: int = 5000) -> Iterator[Tuple[str, bytes]]:
+        from sqlalchemy import text
+        from packages.rag.embeddings import to_bytes
+        result = self.session.execute(text('SELECT chunk_id, embedding::text FROM chunk_vectors WHERE tenant_id = :t '
+                                           'ORDER BY chunk_id').bindparams(t=self.tenant_id)
+                                      .execution_options(yield_per=batch))
+        for cid, literal in result:
+            yield cid, to_bytes(float(x) for x in literal.strip('[]').split(','))
+
+
+_embedded: dict = {}
+_embedded_lock = threading.Lock()
+
+
+def tenant_index_path(root: str, tenant_id: str) -> str:
+    """The default tenant keeps the top-level snapshot (single-tenant layout); others get a subdirectory."""
+    from packages.tenancy import default_tenant, validate_tenant
+    if tenant_id == default_tenant():
+        return root
+    return str(Path(root) / 'tenants' / validate_tenant(tenant_id))
+
+
+def get_embedded_store(tenant_id: Optional[str] = None) -> EmbeddedVectorStore:
+    from packages.tenancy import current_tenant
+    tenant_id = tenant_id or current_tenant()
+    store = _embedded.get(tenant_id)
+    if store is None:
+        from packages.settings import get_settings
+        s = get_settings()
+        with _embedded_lock:
+            store = _embedded.get(tenant_id)
+            if store is None:
+                store = _embedded[tenant_id] = EmbeddedVectorStore(
+                    tenant_index_path(s.vector_index_path, tenant_id), dtype=s.vector_index_dtype,
+                    ivf_min_rows=s.vector_ivf_min_rows, nprobe=s.vector_ivf_nprobe)
+    return store
+
+
+def get_vector_store(session, tenant_id: Optional[str] = None):
+    """Tenant's backend for settings.vector_db; None when pgvector is selected but the DB is not Postgres."""
+    from packages.settings import get_settings
+    from packages.tenancy import current_tenant
+    s = get_settings()
+    tenant_id = tenant_id or current_tenant()
+    if s.vector_db == 'embedded':
+        return get_embedded_store(tenant_id)
+    if session.get_bind().dialect.name != 'postgresql':
+        return None
+    return PgVectorStore(session, s.embed_dim, tenant_id, index=s.pgvector_index, ivf_min_rows=s.vector_ivf_min_rows)
+
+
+def _batched(items: Iterable[Tuple[str, bytes]], size: int) -> Iterator[Tuple[List[str], List[bytes]]]:
+    ids: List[str] = []
+    vecs: List[bytes] = []
+    for cid, vec in items:
+        ids.append(cid)
+        vecs.append(vec)
+        if len(ids) >= size:
+            yield ids, vecs
+            ids, vecs = [], []
+    if ids:
+        yield ids, vecs
+
+
+def export_snapshot(session, dest: str, dtype: str = 'float32', batch: int = 5000, tenant_id: Optional[str] = None) -> int:
+    """Write the embedding of every live chunk of one tenant into an embedded snapshot at `dest`.
+
+    Superseded content is left out, so re-exporting also compacts the index.
+    """
+    from packages.db import Chunk, live_chunks
+    np = _np()
+    rows = live_chunks(session.query(Chunk.id, Chunk.embedding), tenant_id).filter(Chunk.embedding.isnot(None)).yield_per(batch)
+    ids, blocks = [], []
+    for chunk_ids, vecs in _batched(((cid, emb) for cid, emb in rows if emb), batch):
+        ids.extend(chunk_ids)
+        blocks.append(_as_matrix(vecs))
+    store = EmbeddedVectorStore(dest, dtype=dtype)
+    store.write_snapshot(ids, np.concatenate(blocks) if blocks else [])
+    return len(ids)
+
+
+def import_snapshot(session, src: str, dim: int, batch: int = 1000, tenant_id: Optional[str] = None,
+                    index: str = 'hnsw', ivf_min_rows: int = 200000) -> int:
+    """Load an embedded snapshot into the tenant's pgvector partition (ivfflat is trained after the load)."""
+    from packages.tenancy import current_tenant
+    pg = PgVectorStore(session, dim, tenant_id or current_tenant(), index=index, ivf_min_rows=ivf_min_rows)
+    pg.ensure_partition()
+    n = 0
+    for ids, vecs in _batched(EmbeddedVectorStore(src).iter_items(), batch):
+        pg.add(ids, vecs)
+        n += len(ids)
+    pg.ensure_index()
+    return n
+
+
+if __name__ == '__main__':
+    import argparse
+    from packages.db import SessionLocal
+    from packages.settings import get_settings
+    ap = argparse.ArgumentParser(description='Move vectors between the DB and embedded snapshots')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    ap.add_argument('--tenant', default=None, help='tenant id (default: DEFAULT_TENANT)')
+    ex = sub.add_parser('export', help='DB chunk embeddings -> embedded snapshot')
+    ex.add_argument('--out', default=None, help="snapshot dir (default: the tenant's dir under VECTOR_INDEX_PATH)")
+    ex.add_argument('--dtype', choices=['float32', 'float16'], default=None)
+    im = sub.add_parser('import', help='embedded snapshot -> pgvector chunk_vectors')
+    im.add_argument('--src', default=None, help="snapshot dir (default: the tenant's dir under VECTOR_INDEX_PATH)")
+    sub.add_parser('reindex', help="retrain the tenant's pgvector ivfflat index on its current rows")
+    args = ap.parse_args()
+    settings = get_settings()
+    tenant = args.tenant or settings.default_tenant
+    index_dir = tenant_index_path(settings.vector_index_path, tenant)
+    s = SessionLocal()
+    try:
+        if args.cmd == 'export':
+            n = export_snapshot(s, args.out or index_dir, dtype=args.dtype or settings.vector_index_dtype, tenant_id=tenant)
+            print(json.dumps({'vectors': n}))
+        elif args.cmd == 'import':
+            n = import_snapshot(s, args.src or index_dir, settings.embed_dim, tenant_id=tenant,
+                                index=settings.pgvector_index, ivf_min_rows=settings.vector_ivf_min_rows)
+            s.commit()
+            print(json.dumps({'vectors': n}))
+        else:
+            pg = PgVectorStore(s, settings.embed_dim, tenant, index=settings.pgvector_index, ivf_min_rows=settings.vector_ivf_min_rows)
+            lists = pg.ensure_index(force=True)
+            s.commit()
+            print(json.dumps({'lists': lists}))
+    finally:
+        s.close()
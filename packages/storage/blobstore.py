@@ -0,0 +1,257 @@
+"""Content-addressed, compressed blob store for large run artifacts.
+
+Blobs are keyed by the SHA-256 of their uncompressed bytes, so identical
+scripts/reports are stored once. Payloads are zstd-compressed when the
+`zstandard` package is installed and gzip-compressed otherwise; the codec is
+part of the key suffix so both can coexist.
+
+`LocalBlobStore` writes under `settings.object_store_path/blobs`.
+`S3BlobStore` speaks to any S3-compatible endpoint (boto3, imported lazily).
+Both implement the same small `BlobStore` surface.
+"""
+from __future__ import annotations
+import abc, gzip, hashlib, os
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # type: ignore
+
+CHUNK = 64 * 1024
+
+
+def default_codec() -> str:
+    return 'zst' if zstandard is not None else 'gz'
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == 'zst':
+        return zstandard.ZstdCompressor(level=6).compress(data)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _reader(raw, codec: str):
+    if codec == 'zst':
+        return zstandard.ZstdDecompressor().stream_reader(raw)
+    return gzip.GzipFile(fileobj=raw, mode='rb')
+
+
+class BlobNotFound(KeyError):
+    pass
+
+
+class BlobStore(abc.ABC):
+    """Interface: subclasses provide raw object I/O; hashing/compression live here."""
+    codec: str = 'gz'
+
+    def _key(self, digest: str, codec: str) -> str:
+        return f'blobs/{digest[:2]}/{digest[2:4]}/{digest}.{codec}'
+
+    # raw object primitives
+    @abc.abstractmethod
+    def _put_raw(self, key: str, data: bytes): ...
+    @abc.abstractmethod
+    def _open_raw(self, key: str): ...
+    @abc.abstractmethod
+    def _exists(self, key: str) -> bool: ...
+    @abc.abstractmethod
+    def _delete(self, key: str): ...
+    @abc.abstractmethod
+    def _list(self) -> Iterator[Tuple[str, float]]: ...
+    @abc.abstractmethod
+    def _touch(self, key: str) -> bool:
+        """Bump the object's last-modified time; False if it does not exist."""
+    @abc.abstractmethod
+    def _mtime(self, key: str) -> Optional[float]: ...
+
+    def put(self, data: bytes, content_type: str = 'application/octet-stream') -> dict:
+        """Store `data` and return its reference.
+
+        A blob that is already present is only touched: its mtime restarts
+        GC's grace period, so the run about to reference it is not raced.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        key = self._key(digest, self.codec)
+        if not self._touch(key):
+            self._put_raw(key, _compress(data, self.codec))
+        return {'digest': digest, 'codec': self.codec, 'size': len(data), 'content_type': content_type}
+
+    def _resolve(self, ref_or_digest) -> Tuple[str, str]:
+        if isinstance(ref_or_digest, dict):
+            return ref_or_digest['digest'], ref_or_digest.get('codec', self.codec)
+        for codec in (self.codec, 'zst', 'gz'):
+            if self._exists(self._key(ref_or_digest, codec)):
+                return ref_or_digest, codec
+        raise BlobNotFound(ref_or_digest)
+
+    def exists(self, ref_or_digest) -> bool:
+        try:
+            digest, codec = self._resolve(ref_or_digest)
+        except BlobNotFound:
+            return False
+        return self._exists(self._key(digest, codec))
+
+    def iter_bytes(self, ref_or_digest, start: int = 0, end: Optional[int] = None, chunk_size: int = CHUNK) -> Iterator[bytes]:
+        """Yield decompressed bytes [start, end] (inclusive end, like HTTP ranges)."""
+        digest, codec = self._resolve(ref_or_digest)
+        raw = self._open_raw(self._key(digest, codec))
+        try:
+            stream = _reader(raw, codec)
+            skip = start
+            while skip > 0:
+                got = stream.read(min(skip, chunk_size))
+                if not got:
+                    return
+                skip -= len(got)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                buf = stream.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not buf:
+                    return
+                if remaining is not None:
+                    remaining -= len(buf)
+                yield buf
+        finally:
+            raw.close()
+
+    def get(self, ref_or_digest) -> bytes:
+        return b''.join(self.iter_bytes(ref_or_digest))
+
+    def delete(self, digest: str, codec: str):
+        self._delete(self._key(digest, codec))
+
+    def mtime(self, digest: str, codec: str) -> Optional[float]:
+        return self._mtime(self._key(digest, codec))
+
+    def list_blobs(self) -> Iterator[Tuple[str, str, float]]:
+        """Yield (digest, codec, last_modified_epoch) for every stored blob."""
+        for key, mtime in self._list():
+            name = key.rsplit('/', 1)[-1]
+            digest, _, codec = name.partition('.')
+            yield digest, codec, mtime
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str, codec: Optional[str] = None):
+        self.root = Path(root)
+        self.codec = codec or default_codec()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def _put_raw(self, key: str, data: bytes):
+        dest = self._path(key)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f'{dest.name}.{os.getpid()}.tmp')
+        tmp.write_bytes(data)
+        os.replace(tmp, dest)
+
+    def _open_raw(self, key: str):
+        try:
+            return self._path(key).open('rb')
+        except FileNotFoundError:
+            raise BlobNotFound(key)
+
+    def _exists(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def _delete(self, key: str):
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _touch(self, key: str) -> bool:
+        try:
+            os.utime(self._path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _mtime(self, key: str) -> Optional[float]:
+        try:
+            return self._path(key).stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _list(self):
+        base = self.root / 'blobs'
+        if not base.exists():
+            return
+        for p in base.rglob('*.*'):
+            if p.suffix in ('.zst', '.gz'):
+                yield p.relative_to(self.root).as_posix(), p.stat().st_mtime
+
+
+class S3BlobStore(BlobStore):
+    """S3-compatible backend (AWS, MinIO, Ceph). Requires boto3."""
+
+    def __init__(self, bucket: str, prefix: str = '', endpoint_url: Optional[str] = None, codec: Optional[str] = None):
+        import boto3  # optional dependency
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.codec = codec or default_codec()
+
+    def _put_raw(self, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data)
+
+    def _open_raw(self, key: str):
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body']
+        except self.client.exceptions.NoSuchKey:
+            raise BlobNotFound(key)
+        return body
+
+    def _exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except Exception:
+            return False
+
+    def _delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+    def _touch(self, key: str) -> bool:
+        # S3 has no utime; an in-place copy with replaced metadata resets LastModified
+        from botocore.exceptions import ClientError
+        k = self.prefix + key
+        try:
+            self.client.copy_object(Bucket=self.bucket, Key=k, CopySource={'Bucket': self.bucket, 'Key': k},
+                                    MetadataDirective='REPLACE')
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+                return False
+            raise
+
+    def _mtime(self, key: str) -> Optional[float]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)['LastModified'].timestamp()
+        except Exception:
+            return None
+
+    def _list(self):
+        pages = self.client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, Prefix=self.prefix + 'blobs/')
+        for page in pages:
+            for obj in page.get('Contents', []):
+                yield obj['Key'][len(self.prefix):], obj['LastModified'].timestamp()
+
+
+_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    global _store
+    if _store is None:
+        from packages.settings import get_settings
+        s = get_settings()
+        codec = None if s.object_store_codec == 'auto' else s.object_store_codec
+        if s.object_store == 's3':
+            _store = S3BlobStore(s.object_store_bucket, prefix=s.object_store_prefix, endpoint_url=s.object_store_endpoint_url, codec=codec)
+        else:
+            _store = LocalBlobStore(s.object_store_path, codec=codec)
+    return _store
@@ -0,0 +1,284 @@
+"""Streamed bulk export of migration runs (zip or tar.gz).
+
+The archive is produced chunk by chunk while it is downloaded; nothing is
+staged on disk:
+
+- runs are read in one pass of `yield_per` batches (a server-side cursor on
+  Postgres), selecting columns only, so no ORM objects pile up in the session
+- artifacts stream from the blob store straight into the archive entry
+- zip goes through `zipfile` on a non-seekable sink (sizes land in data
+  descriptors); tar is framed by hand and gzip-compressed incrementally
+- the summary rows are kept deflated in memory (~20 bytes per run) and
+  written last, so the download starts with the first run
+
+Zip also holds its central directory (one record per member) until the end;
+for very large selections tar.gz is the leaner format.
+
+Layout::
+
+    runs/<run_id>/script.appshape
+    runs/<run_id>/report.json
+    runs/<run_id>/datagroups.dataclasses.appshape   (when the run had data groups)
+    summary.csv                    one row per run (status, coverage, confidence, ...)
+    summary.json                   totals over the selection
+
+Run: python -m packages.storage.export --out runs.zip [--since 2026-10-01] [--tag prod] [--batch wave-3]
+"""
+from __future__ import annotations
+import argparse, csv, datetime, io, json, sys, tarfile, time, zipfile, zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from packages.storage.blobstore import BlobStore, get_blob_store
+from packages.storage.runs import ARTIFACTS, summarize
+
+FORMATS = {'zip': ('application/zip', 'zip'), 'tar': ('application/gzip', 'tar.gz')}
+SUMMARY_FIELDS = ('run_id', 'created_at', 'batch_id', 'tags', 'status', 'migration_status', 'coverage', 'confidence',
+                  'unmapped', 'tests_run', 'passed', 'script_lines')
+
+
+class _Sink:
+    """Write-only, non-seekable file object; `drain()` hands over what was written since the last call."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        if data:
+            self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> Iterator[bytes]:
+        if self._parts:
+            data = b''.join(self._parts)
+            self._parts.clear()
+            yield data
+
+
+def _run_filter(session, tenant_id: str, since, until, tags: Optional[Sequence[str]], batch_id: Optional[str]):
+    from packages.db import Run
+    where = [Run.tenant_id == tenant_id, Run.type == 'migrate', Run.status == 'completed', Run.created_at <= until]
+    if since is not None:
+        where.append(Run.created_at >= since)
+    if batch_id:
+        where.append(Run.batch_id == batch_id)
+    if tags and session.get_bind().dialect.name == 'postgresql':
+        where.append(Run.tags.op('&&')(list(tags)))
+    return where
+
+
+def iter_runs(session, tenant_id: str, *columns, since=None, until=None, tags: Optional[Sequence[str]] = None,
+              batch_id: Optional[str] = None, batch: int = 500) -> Iterator[Any]:
+    """Rows of (Run.id, Run.created_at, Run.batch_id, Run.tags, *columns) in creation order, `batch` rows per fetch."""
+    from sqlalchemy import select
+    from packages.db import Run
+    stmt = (select(Run.id, Run.created_at, Run.batch_id, Run.tags, *columns)
+            .where(*_run_filter(session, tenant_id, since, until, tags, batch_id))
+            .order_by(Run.created_at, Run.id).execution_options(yield_per=batch))
+    wanted = set(tags or ())
+    for row in session.execute(stmt):
+        if wanted and not wanted.intersection(row.tags or []):  # SQLite keeps tags as JSON; filter here
+            continue
+        yield row
+
+
+def summary_row(row, outputs: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    outputs = outputs or {}
+    summary = outputs.get('summary') or (summarize(outputs) if 'report' in outputs else {})  # inline outputs predate summaries
+    verified = summary.get('verified') or {}
+    return {
+        'run_id': row.id, 'created_at': row.created_at.isoformat() if row.created_at else '',
+        'batch_id': row.batch_id or '', 'tags': ','.join(row.tags or []),
+        'status': 'expired' if outputs.get('expired') else 'completed',
+        'migration_status': summary.get('migration_status'), 'coverage': summary.get('coverage'),
+        'confidence': summary.get('confidence'), 'unmapped': summary.get('unmapped'),
+        'tests_run': verified.get('tests_run'), 'passed': verified.get('passed'), 'script_lines': summary.get('script_lines'),
+    }
+
+
+class _Totals:
+    def __init__(self):
+        self.runs = 0
+        self.by_status: Dict[str, int] = {}
+        self.tests_run = self.passed = self.unmapped = 0
+        self._sums = {'coverage': [0.0, 0], 'confidence': [0.0, 0]}
+
+    def add(self, r: Dict[str, Any]):
+        self.runs += 1
+        key = r['migration_status'] or 'unknown'
+        self.by_status[key] = self.by_status.get(key, 0) + 1
+        self.tests_run += r['tests_run'] or 0
+        self.passed += r['passed'] or 0
+        self.unmapped += r['unmapped'] or 0
+        for k, acc in self._sums.items():
+            if isinstance(r[k], (int, float)):
+                acc[0] += r[k]
+                acc[1] += 1
+
+    def as_dict(self, **meta) -> Dict[str, Any]:
+        return {**meta, 'runs': self.runs, 'migration_status': self.by_status, 'unmapped_nodes': self.unmapped,
+                'verified_lines': {'tests_run': self.tests_run, 'passed': self.passed},
+                **{f'mean_{k}': round(s / n, 6) if n else None for k, (s, n) in self._sums.items()}}
+
+
+def _artifacts(outputs: Optional[Dict[str, Any]], store: BlobStore) -> Iterator[tuple]:
+    """(file name, size, chunk iterator) per artifact; inline (pre-offload) outputs are encoded on the fly."""
+    outputs = outputs or {}
+    blobs = outputs.get('blobs') or {}
+    for name, (_, ext) in ARTIFACTS.items():
+        ref, value = blobs.get(name), outputs.get(name)
+        if ref and store.exists(ref):
+            yield f'{name}.{ext}', ref['size'], store.iter_bytes(ref)
+        elif value is not None:
+            data = value.encode('utf-8') if isinstance(value, str) else json.dumps(value, default=str).encode('utf-8')
+            yield f'{name}.{ext}', len(data), iter((data,))
+
+
+class _SummarySpool:
+    """summary.csv kept deflated in memory until the end of the archive."""
+
+    def __init__(self):
+        self._z = zlib.compressobj(6)
+        self._parts: List[bytes] = []
+        self._buf = io.StringIO()
+        self._writer = csv.DictWriter(self._buf, fieldnames=SUMMARY_FIELDS)
+        self.size = 0
+        self._writer.writeheader()
+        self._take()
+
+    def _take(self):
+        data = self._buf.getvalue().encode('utf-8')
+        self._buf.seek(0)
+        self._buf.truncate()
+        self.size += len(data)
+        packed = self._z.compress(data)
+        if packed:
+            self._parts.append(packed)
+
+    def add(self, row: Dict[str, Any]):
+        self._writer.writerow(row)
+        self._take()
+
+    def chunks(self) -> Iterator[bytes]:
+        self._parts.append(self._z.flush())
+        unz = zlib.decompressobj()
+        for part in self._parts:
+            while part:
+                data = unz.decompress(part, 64 * 1024)
+                part = unz.unconsumed_tail
+                if data:
+                    yield data
+        yield unz.flush()
+
+
+def _entries(session, tenant_id: str, store: BlobStore, filters: Dict[str, Any], batch: int) -> Iterator[tuple]:
+    """(archive path, size, chunk iterator, mtime) for every archive member, streamed."""
+    from packages.db import Run
+    totals, spool = _Totals(), _SummarySpool()
+    now = time.time()
+    for row in iter_runs(session, tenant_id, Run.outputs_json, batch=batch, **filters):
+        r = summary_row(row, row.outputs_json)
+        totals.add(r)
+        spool.add(r)
+        mtime = row.created_at.replace(tzinfo=datetime.timezone.utc).timestamp() if row.created_at else now
+        for name, size, chunks in _artifacts(row.outputs_json, store):
+            yield f'runs/{row.id}/{name}', size, chunks, mtime
+    yield 'summary.csv', spool.size, spool.chunks(), now
+    meta = {'tenant_id': tenant_id, **{k: (v.isoformat() if isinstance(v, datetime.datetime) else v) for k, v in filters.items()}}
+    data = json.dumps(totals.as_dict(**meta), indent=2).encode('utf-8')
+    yield 'summary.json', len(data), iter((data,)), now
+
+
+def _zip_stream(entries: Iterable[tuple]) -> Iterator[bytes]:
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for path, _, chunks, mtime in entries:
+            info = zipfile.ZipInfo(path, date_time=time.gmtime(max(mtime, 315532800))[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with zf.open(info, 'w', force_zip64=True) as w:
+                for chunk in chunks:
+                    w.write(chunk)
+                    yield from sink.drain()
+            yield from sink.drain()
+    yield from sink.drain()
+
+
+def _tar_stream(entries: Iterable[tuple]) -> Iterator[bytes]:
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def out(data: bytes) -> Iterator[bytes]:
+        packed = gz.compress(data)
+        if packed:
+            yield packed
+
+    for path, size, chunks, mtime in entries:
+        info = tarfile.TarInfo(path)
+        info.size, info.mtime, info.mode = size, int(mtime), 0o644
+        yield from out(info.tobuf(format=tarfile.PAX_FORMAT))
+        written = 0
+        for chunk in chunks:
+            written += len(chunk)
+            yield from out(chunk)
+        if written != size:
+            raise IOError(f'{path}: expected {size} bytes, got {written}')
+        if size % tarfile.BLOCKSIZE:
+            yield from out(b'\0' * (tarfile.BLOCKSIZE - size % tarfile.BLOCKSIZE))
+    yield from out(b'\0' * (2 * tarfile.BLOCKSIZE))
+    yield gz.flush()
+
+
+def export_runs(fmt: str = 'zip', *, since: Optional[datetime.datetime] = None, until: Optional[datetime.datetime] = None,
+                tags: Optional[Sequence[str]] = None, batch_id: Optional[str] = None, tenant_id: Optional[str] = None,
+                store: Optional[BlobStore] = None, session=None, batch: int = 500) -> Iterator[bytes]:
+    """Archive bytes for the selected completed migrate runs, as a lazy chunk iterator.
+
+    The tenant is resolved when this is called, not when the iterator runs,
+    so it can be consumed from another thread (e.g. a streaming response).
+    A session is opened (and closed) by the iterator unless one is passed.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'unknown export format {fmt!r} (expected one of {", ".join(FORMATS)})')
+    from packages.tenancy import current_tenant
+    tenant_id = tenant_id or current_tenant()
+    store = store or get_blob_store()
+    filters = {'since': since, 'until': until or datetime.datetime.utcnow(), 'tags': list(tags) if tags else None,
+               'batch_id': batch_id}
+    writer = _zip_stream if fmt == 'zip' else _tar_stream
+
+    def generate() -> Iterator[bytes]:
+        from packages.db import SessionLocal
+        s = session or SessionLocal()
+        try:
+            yield from writer(_entries(s, tenant_id, store, filters, batch))
+        finally:
+            if session is None:
+                s.close()
+    return generate()
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime.datetime]:
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Export completed migrations as a zip or tar.gz archive')
+    ap.add_argument('--out', required=True, help="archive path, or '-' for stdout")
+    ap.add_argument('--format', choices=sorted(FORMATS), default=None, help='default: from --out extension, else zip')
+    ap.add_argument('--since', help='ISO date/time (UTC), inclusive')
+    ap.add_argument('--until', help='ISO date/time (UTC), inclusive')
+    ap.add_argument('--tag', action='append', default=[], help='runs carrying any of these tags (repeatable)')
+    ap.add_argument('--batch', default=None, help='runs of this batch id')
+    ap.add_argument('--tenant', default=None, help='tenant id (default: DEFAULT_TENANT)')
+    args = ap.parse_args()
+    fmt = args.format or ('tar' if args.out.endswith(('.tar.gz', '.tgz')) else 'zip')
+    chunks = export_runs(fmt, since=_parse_time(args.since), until=_parse_time(args.until), tags=args.tag,
+                         batch_id=args.batch, tenant_id=args.tenant)
+    out = sys.stdout.buffer if args.out == '-' else open(args.out, 'wb')
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
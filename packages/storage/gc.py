@@ -0,0 +1,69 @@
+"""Retention and garbage collection for the blob store.
+
+- Retention (optional): runs older than N days drop their blob references,
+  keeping the summary, and are marked `expired`.
+- GC: blobs no run references are deleted once older than the grace period.
+  The grace period covers blobs written (or deduplicated onto, which touches
+  them) just before their run row commits.
+
+Run: python -m packages.storage.gc --grace-hours 24 [--retention-days 90] [--dry-run]
+"""
+from __future__ import annotations
+import argparse, datetime, json, time
+from packages.storage.blobstore import BlobStore, get_blob_store
+from packages.storage.runs import referenced_digests
+
+
+def apply_retention(session, days: int, batch: int = 500) -> int:
+    from packages.db import Run
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+    expired = 0
+    q = session.query(Run).filter(Run.created_at < cutoff).yield_per(batch)
+    for run in q:
+        outputs = run.outputs_json or {}
+        if outputs.get('blobs'):
+            run.outputs_json = {**{k: v for k, v in outputs.items() if k != 'blobs'}, 'expired': True}
+            expired += 1
+    return expired
+
+
+def collect_garbage(session, store: BlobStore, grace_seconds: float = 86400, dry_run: bool = False, batch: int = 1000) -> dict:
+    from packages.db import Run
+    referenced = set()
+    for (outputs,) in session.query(Run.outputs_json).yield_per(batch):
+        referenced |= referenced_digests(outputs)
+    cutoff = time.time() - grace_seconds
+    deleted = kept = 0
+    for digest, codec, mtime in list(store.list_blobs()):
+        if digest in referenced or mtime >= cutoff:
+            kept += 1
+            continue
+        # the listing may be stale: a put() that deduplicated onto this blob
+        # since then has touched it for a run that is not committed yet
+        mtime = store.mtime(digest, codec)
+        if mtime is None or mtime >= cutoff:
+            kept += mtime is not None
+            continue
+        if not dry_run:
+            store.delete(digest, codec)
+        deleted += 1
+    return {'referenced': len(referenced), 'kept': kept, 'deleted': deleted, 'dry_run': dry_run}
+
+
+if __name__ == '__main__':
+    from packages.db import SessionLocal
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--grace-hours', type=float, default=24)
+    ap.add_argument('--retention-days', type=int, default=0, help='expire run artifacts older than this (0 = keep)')
+    ap.add_argument('--dry-run', action='store_true')
+    args = ap.parse_args()
+    s = SessionLocal()
+    try:
+        expired = 0
+        if args.retention_days and not args.dry_run:
+            expired = apply_retention(s, args.retention_days)
+            s.commit()
+        res = collect_garbage(s, get_blob_store(), grace_seconds=args.grace_hours * 3600, dry_run=args.dry_run)
+        print(json.dumps({**res, 'expired_runs': expired}))
+    finally:
+        s.close()
@@ -0,0 +1,69 @@
+"""Run outputs split: summaries stay in `Run.outputs_json`, artifacts go to blobs.
+
+Offloaded shape::
+
+    {"summary": {...}, "blobs": {"script": ref, "report": ref, "datagroups": ref, "profile": ref}, ...small fields}
+
+`hydrate_outputs` rebuilds the old inline `{"report": ..., "script": ...}`
+shape for single-run reads.
+"""
+from __future__ import annotations
+import json
+from typing import Any, Dict, Optional, Set
+from packages.storage.blobstore import BlobStore, get_blob_store
+
+ARTIFACTS = {
+    'script': ('text/plain; charset=utf-8', 'appshape'),
+    'report': ('application/json', 'json'),
+    'datagroups': ('text/plain; charset=utf-8', 'dataclasses.appshape'),
+}
+
+
+def summarize(outputs: Dict[str, Any]) -> Dict[str, Any]:
+    report = outputs.get('report') or {}
+    script = outputs.get('script') or ''
+    diagnostics = report.get('diagnostics') or []
+    severities: Dict[str, int] = {}
+    for d in diagnostics:
+        sev = d.get('severity', 'info') if isinstance(d, dict) else 'info'
+        severities[sev] = severities.get(sev, 0) + 1
+    return {
+        'migration_status': report.get('migration_status'),
+        'coverage': report.get('coverage'),
+        'unmapped': len(report.get('unmapped') or []),
+        'diagnostics': severities,
+        'script_lines': script.count('\n'),
+        'confidence': report.get('confidence'),
+        'verified': {k: (report.get('verification') or {}).get(k) for k in ('tests_run', 'passed')},
+    }
+
+
+def offload_outputs(outputs: Dict[str, Any], store: Optional[BlobStore] = None) -> Dict[str, Any]:
+    store = store or get_blob_store()
+    small = {k: v for k, v in outputs.items() if k not in ARTIFACTS}
+    blobs = dict(small.pop('blobs', None) or {})
+    for name, (ctype, _) in ARTIFACTS.items():
+        value = outputs.get(name)
+        if value is None:
+            continue
+        data = value.encode('utf-8') if isinstance(value, str) else json.dumps(value, default=str).encode('utf-8')
+        blobs[name] = store.put(data, content_type=ctype)
+    return {**small, 'summary': summarize(outputs), 'blobs': blobs}
+
+
+def hydrate_outputs(outputs: Optional[Dict[str, Any]], store: Optional[BlobStore] = None) -> Dict[str, Any]:
+    outputs = dict(outputs or {})
+    blobs = outputs.get('blobs') or {}
+    if not blobs:
+        return outputs
+    store = store or get_blob_store()
+    for name in ARTIFACTS:
+        ref = blobs.get(name)
+        if ref and name not in outputs:
+            data = store.get(ref).decode('utf-8')
+            outputs[name] = json.loads(data) if name == 'report' else data
+    return outputs
+
+
+def referenced_digests(outputs: Optional[Dict[str, Any]]) -> Set[str]:
+    return {ref['digest'] for ref in ((outputs or {}).get('blobs') or {}).values() if isinstance(ref, dict) and 'digest' in ref}
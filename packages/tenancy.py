@@ -0,0 +1,76 @@
+"""Tenant context.
+
+In `tenancy_mode = 'multi'` every API request carries a tenant API key
+(`X-Api-Key` or `Authorization: Bearer`); the server maps the key's SHA-256
+to its tenant via `settings.tenant_api_keys`, so the tenant is never taken
+from the client's word alone. In single mode everything belongs to
+`settings.default_tenant`. The tenant travels in a contextvar so DB helpers,
+retrieval and vector stores scope themselves without threading an argument
+through every call.
+"""
+from __future__ import annotations
+import contextlib, hashlib, re, secrets
+from contextvars import ContextVar
+from typing import Optional
+
+TENANT_ID_RE = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')  # also used in index paths/partition names
+
+_current: ContextVar[Optional[str]] = ContextVar('tenant_id', default=None)
+
+
+class InvalidTenant(ValueError):
+    pass
+
+
+def default_tenant() -> str:
+    from packages.settings import get_settings
+    return get_settings().default_tenant
+
+
+def multi_tenant() -> bool:
+    from packages.settings import get_settings
+    return get_settings().tenancy_mode == 'multi'
+
+
+def validate_tenant(tenant_id: str) -> str:
+    if not tenant_id or not TENANT_ID_RE.match(tenant_id):
+        raise InvalidTenant(f'invalid tenant id {tenant_id!r}')
+    return tenant_id
+
+
+def key_digest(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+def tenant_for_key(api_key: Optional[str]) -> Optional[str]:
+    """Tenant the API key was issued to; None for a missing or unknown key."""
+    if not api_key:
+        return None
+    from packages.settings import get_settings
+    tenant = get_settings().tenant_api_keys.get(key_digest(api_key))
+    return validate_tenant(tenant) if tenant else None
+
+
+def current_tenant() -> str:
+    return _current.get() or default_tenant()
+
+
+@contextlib.contextmanager
+def tenant_scope(tenant_id: Optional[str]):
+    """Run the block as `tenant_id` (None keeps the current/default tenant)."""
+    token = _current.set(validate_tenant(tenant_id) if tenant_id else _current.get())
+    try:
+        yield current_tenant()
+    finally:
+        _current.reset(token)
+
+
+if __name__ == '__main__':
+    import argparse, json
+    ap = argparse.ArgumentParser(description='Tenant API keys')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    nk = sub.add_parser('new-key', help='mint a key; only its digest goes into TENANT_API_KEYS')
+    nk.add_argument('tenant')
+    args = ap.parse_args()
+    key = secrets.token_urlsafe(32)
+    print(json.dumps({'tenant': validate_tenant(args.tenant), 'api_key': key, 'tenant_api_keys_entry': {key_digest(key): args.tenant}}))
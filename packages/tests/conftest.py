@@ -0,0 +1,16 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import packages.db as db
+from packages.ingestion import ingest
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """Point packages.db at a throwaway SQLite file; yields the list of texts sent to the embedder."""
+    engine = create_engine(f"sqlite:///{tmp_path / 't.db'}", future=True)
+    db.Base.metadata.create_all(engine)
+    monkeypatch.setattr(db, '_engine', engine)
+    monkeypatch.setattr(db, '_session_factory', sessionmaker(bind=engine, expire_on_commit=False, future=True))
+    calls = []
+    monkeypatch.setattr(ingest, 'embed_texts', lambda texts: calls.extend(texts) or [b'' for _ in texts])
+    return calls
@@ -0,0 +1,41 @@
+import datetime
+import packages.db as db
+from packages import analytics
+from packages.tools.irule_parser import parse_irule
+from packages.tools.appshape_generator import generate_appshape
+
+RULES = [
+    "when HTTP_REQUEST {\n  HTTP::header replace A b\n  table set k v\n}\n",
+    "when HTTP_REQUEST {\n  table set k v\n  table lookup k\n  after 10\n}\nwhen LB_SELECTED {\n  HTTP::uri /x\n}\n",
+    "when HTTP_REQUEST {\n  HTTP::uri /a\n}\n",
+]
+
+def _record(session, i, code, day, at=datetime.time(13, 45, 7)):
+    parsed = parse_irule(code)
+    gen = generate_appshape(parsed['ast'], {'status': 'partial'})
+    return analytics.record_run(session, f'r{i}', parsed['ast'], gen['mapping'], when=datetime.datetime.combine(day, at))
+
+def test_incremental_aggregates_match_rebuild(sqlite_db):
+    s = db.SessionLocal()
+    today = datetime.date.today()
+    for i, code in enumerate(RULES):
+        assert _record(s, i, code, today - datetime.timedelta(days=i % 2))
+    assert not _record(s, 0, RULES[0], today)  # idempotent per run
+    s.commit()
+
+    gaps = analytics.top_gaps(s)
+    assert gaps[0]['last_seen'] == datetime.datetime.combine(today, datetime.time(13, 45, 7)).isoformat()
+    assert (gaps[0]['name'], gaps[0]['occurrences'], gaps[0]['runs']) == ('table', 3, 2)
+    assert {g['name'] for g in analytics.top_gaps(s, kind='event')} == {'LB_SELECTED'}
+    trend = analytics.coverage_trend(s, days=7)
+    assert sum(d['runs'] for d in trend) == 3 and sum(d['full_runs'] for d in trend) == 1
+
+    wi = analytics.what_if(s, ['table', 'nope'])
+    assert wi['nodes'] == 7 and wi['coverage'] == round(3 / 7, 6) and wi['projected_coverage'] == round(6 / 7, 6)
+    assert wi['min_runs_fully_mapped'] == 2 and wi['unknown'] == ['nope']  # run 0's only gap was `table`
+
+    before = (gaps, trend)
+    analytics.rebuild(s)
+    s.commit()
+    assert (analytics.top_gaps(s), analytics.coverage_trend(s, days=7)) == before
+    s.close()
@@ -0,0 +1,74 @@
+import pytest
+from packages.tools.irule_parser import parse_irule
+from packages.tools.datagroups import DataGroupError, PrefixTrie, convert_data_groups, iter_appshape, load_datagroup
+
+NETS = '''host 10.1.1.1 := "deny",
+network 10.0.0.0/8 := "internal",
+network 10.1.0.0 mask 255.255.0.0 := "internal",
+10.2.0.0/16 := "lab",
+host 10.1.1.1 := "allow",
+2001:db8::/32 := "v6"
+'''
+
+def test_ip_group_longest_prefix_and_dedup():
+    g = load_datagroup(NETS, 'nets')
+    assert g.type == 'ip'
+    assert [g.match(a) for a in ('10.1.1.1', '10.1.1.2', '10.2.9.9', '11.0.0.1', '2001:db8::1')] == ['deny', 'internal', 'lab', None, 'v6']
+    s = g.summary()
+    assert (s['records'], s['duplicates'], s['conflicts'], s['redundant']) == (6, 1, ['host 10.1.1.1'], 1)
+    assert list(iter_appshape(g))[2:-1] == ['    10.0.0.0/8 := "internal"', '    10.1.1.1/32 := "deny"',
+                                            '    10.2.0.0/16 := "lab"', '    2001:db8::/32 := "v6"']
+    with pytest.raises(DataGroupError):
+        load_datagroup('network 10.0.0.0 mask 255.0.255.0', 'bad')
+
+def test_string_group_prefix_and_suffix_tries():
+    g = load_datagroup('"/api/" := "api",\n"/api/v1/" := "v1",\n"/app",\n".example.com" := "ex"\n', 'uris')
+    assert g.match('/api/v1/users', 'starts_with') == 'v1'
+    assert g.match('/api/v2', 'starts_with') == 'api'
+    assert g.match('/apple', 'starts_with') == ''
+    assert g.match('www.example.com', 'ends_with') == 'ex'
+    assert g.match('/other', 'starts_with', 'none') == 'none'
+    t = PrefixTrie([('ab', 1), ('abc', 1), ('abd', 2), ('b', 3)])
+    assert list(t.items()) == [('ab', 1), ('abc', 1), ('abd', 2), ('b', 3)] and t.shadowed() == 1
+
+def test_class_lookups_report_target_constructs():
+    code = '''when HTTP_REQUEST {
+  if { [class match [IP::client_addr] equals nets] } { drop }
+  set pool [class match -value [HTTP::uri] starts_with uris]
+  if { [class search -name uris contains [HTTP::uri]] } { return }
+  set n [class size $dg]
+}'''
+    res = convert_data_groups(parse_irule(code)['ast'], {'nets': NETS, 'uris': '"/api/"\n'})
+    assert [(r['line'], r['group'], r['construct'], r['efficient']) for r in res['lookups']] == [
+        (2, 'nets', 'ip_range_index', True), (3, 'uris', 'prefix_trie', True),
+        (4, 'uris', 'linear_scan', False), (5, '$dg', 'dynamic', False)]
+    assert 'dataclass nets ip {' in res['code'] and 'dataclass uris string {' in res['code']
+
+def test_type_detection_uses_quotes_and_all_records():
+    g = load_datagroup('"10.0.0.1" := "a",\n"example.com" := "b"\n', 'hosts')
+    assert g.type == 'string' and g.match('example.com') == 'b' and g.match('10.0.0.1') == 'a'
+    g = load_datagroup('404 := "missing",\n/api := "api",\n404 := "dup"\n', 'mixed')
+    assert (g.type, g.match('404'), g.duplicates) == ('string', 'missing', 1)
+    assert load_datagroup('404 := "a"\n500 := "b"\n', 'codes').type == 'integer'
+    assert load_datagroup('"404" := "a"\n', 'codes', 'int').match('404') == 'a'
+    with pytest.raises(DataGroupError):
+        load_datagroup('10.0.0.0/8 := "a"\nhost 300.1.1.1 := "b"\n', 'bad')  # malformed ip records still fail
+
+def test_type_from_file_name_or_api_field(sqlite_db, monkeypatch):
+    from fastapi.testclient import TestClient
+    from packages.settings import get_settings
+    from apps.api.main import app
+    from packages.tools.datagroups import group_name_and_type
+    assert [group_name_and_type(f) for f in ('dir/blocked.ip.class', 'codes.int', 'uris.class', 'uris')] == [
+        ('blocked', 'ip'), ('codes', 'integer'), ('uris', None), ('uris', None)]
+    rule = ('rule.tcl', b'when HTTP_REQUEST {\n  set v [class match -value [HTTP::uri] equals codes]\n}\n')
+    monkeypatch.setattr(get_settings(), 'otel_exporter', 'none')
+    client = TestClient(app)
+    res = client.post('/v1/migrate', files=[('file', rule), ('data_groups', ('codes.class', b'404 := "a"\n'))],
+                      data={'data_group_types': 'codes=string'})
+    assert res.status_code == 200
+    report = client.get(f"/v1/migrate/{res.json()['run_id']}").json()['outputs']['report']
+    assert report['data_groups']['groups'][0]['type'] == 'string'
+    res = client.post('/v1/migrate', files=[('file', rule), ('data_groups', ('codes.class', b'404\n'))],
+                      data={'data_group_types': 'other=ip'})
+    assert res.status_code == 400
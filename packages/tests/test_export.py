@@ -0,0 +1,45 @@
+import csv, datetime, io, json, tarfile, zipfile
+from packages.db import SessionLocal, create_run, update_run
+from packages.storage.blobstore import LocalBlobStore
+from packages.storage.runs import offload_outputs
+from packages.storage.export import export_runs
+
+def _runs(store):
+    s = SessionLocal()
+    base = datetime.datetime(2026, 10, 1)
+    for i, (tags, batch) in enumerate([(['prod'], 'w1'), (['prod', 'eu'], 'w1'), (None, 'w2')]):
+        run = create_run(s, type_='migrate', status='completed', tags=tags, batch_id=batch)
+        run.created_at = base + datetime.timedelta(hours=i)
+        report = {'migration_status': 'partial', 'confidence': 0.5 + i / 10, 'verification': {'tests_run': 4, 'passed': 2 + i}}
+        update_run(s, run.id, outputs_json=offload_outputs({'report': report, 'script': f'get_method  # line {i} : HTTP::method\n'}, store))
+    legacy = create_run(s, type_='migrate', status='completed', batch_id='w1')  # inline outputs from before offloading
+    legacy.created_at = base + datetime.timedelta(hours=5)
+    legacy.outputs_json = {'report': {'migration_status': 'full'}, 'script': 'x\n'}
+    create_run(s, type_='migrate', status='failed', batch_id='w1')
+    s.commit()
+    s.close()
+
+def test_zip_export_streams_selected_runs(sqlite_db, tmp_path):
+    store = LocalBlobStore(str(tmp_path / 'blobs'))
+    _runs(store)
+    chunks = export_runs('zip', tags=['prod'], store=store, batch=1)
+    zf = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+    assert zf.testzip() is None
+    names = zf.namelist()
+    assert names[-2:] == ['summary.csv', 'summary.json'] and len(names) == 2 * 2 + 2
+    rows = list(csv.DictReader(io.StringIO(zf.read('summary.csv').decode())))
+    assert [r['tags'] for r in rows] == ['prod', 'prod,eu']
+    totals = json.loads(zf.read('summary.json'))
+    assert totals['runs'] == 2 and totals['verified_lines'] == {'tests_run': 8, 'passed': 5} and totals['mean_confidence'] == 0.55
+    assert zf.read(f"runs/{rows[1]['run_id']}/script.appshape") == b'get_method  # line 1 : HTTP::method\n'
+
+def test_tar_export_filters_by_batch_and_time(sqlite_db, tmp_path):
+    store = LocalBlobStore(str(tmp_path / 'blobs'))
+    _runs(store)
+    data = b''.join(export_runs('tar', batch_id='w1', since=datetime.datetime(2026, 10, 1, 0, 30), store=store))
+    tf = tarfile.open(fileobj=io.BytesIO(data), mode='r:gz')
+    rows = list(csv.DictReader(io.StringIO(tf.extractfile('summary.csv').read().decode())))
+    assert [r['migration_status'] for r in rows] == ['partial', 'full']  # second w1 run and the legacy one; failed run skipped
+    members = {m.name: m for m in tf.getmembers()}
+    assert tf.extractfile(members[f"runs/{rows[1]['run_id']}/script.appshape"]).read() == b'x\n'
+    assert json.loads(tf.extractfile(members[f"runs/{rows[0]['run_id']}/report.json"]).read())['confidence'] == 0.6
@@ -0,0 +1,65 @@
+import packages.db as db
+from packages.ingestion import ingest
+from packages.rag import retriever
+
+def test_identical_bytes_share_chunks_and_versions_append(tmp_path, sqlite_db):
+    docs = tmp_path / 'docs'
+    docs.mkdir()
+    body = 'HTTP::header maps to set_header.\n\n' * 5
+    (docs / 'a.md').write_text(body)
+    (docs / 'b.md').write_text(body)
+    res = ingest.ingest_path(str(docs))
+    assert (res.files_indexed, res.deduplicated) == (2, 1)
+    embedded = len(sqlite_db)
+
+    (docs / 'a.md').write_text('HTTP::uri maps to get_uri.\n')
+    res = ingest.ingest_path(str(docs))
+    assert (res.files_indexed, res.skipped) == (1, 1)
+    assert len(sqlite_db) == embedded + 1
+
+    s = db.SessionLocal()
+    versions = s.query(db.Document).filter(db.Document.path == str(docs / 'a.md')).order_by(db.Document.version).all()
+    assert [(d.version, d.active) for d in versions] == [(1, False), (2, True)]
+    s.close()
+
+    hits = retriever.retrieve('HTTP header mapping').chunks
+    assert hits and all(h['title'] in ('a.md', 'b.md') for h in hits)
+    assert all('set_header' in h['text'] or 'get_uri' in h['text'] for h in hits)
+
+
+def test_replace_prunes_content_no_active_document_has(tmp_path, sqlite_db):
+    docs = tmp_path / 'docs'
+    docs.mkdir()
+    (docs / 'a.md').write_text('iRule pool maps to use_backend.\n')
+    ingest.ingest_path(str(docs))
+    (docs / 'a.md').write_text('HTTP::redirect maps to redirect.\n')
+    ingest.ingest_path(str(docs))
+    s = db.SessionLocal()
+    assert s.query(db.Chunk).count() == 2  # plain re-ingest keeps the old version's chunks
+    gen = db.corpus_generation(s)
+    s.close()
+    ingest.ingest_path(str(docs), replace=True)
+    s = db.SessionLocal()
+    assert [c.text for c in s.query(db.Chunk)] == ['HTTP::redirect maps to redirect.\n']
+    assert db.corpus_generation(s) > gen
+    s.close()
+
+
+def test_vector_search_refetches_past_superseded_vectors(sqlite_db, monkeypatch):
+    from packages.rag import vectorstore
+    s = db.SessionLocal()
+    s.add(db.Document(id='d1', path='a.md', hash='live', version=1, active=True))
+    ids = [f'dead{i}' for i in range(10)] + [f'live{i}' for i in range(3)]
+    for cid in ids:
+        s.add(db.Chunk(id=cid, content_hash=cid.rstrip('0123456789'), ord=0, text=cid))
+    s.commit()
+
+    class Store:
+        def search(self, query, top_k):
+            return [(cid, 1.0) for cid in ids[:top_k]]  # every superseded vector ranks first
+
+    monkeypatch.setattr(vectorstore, 'get_vector_store', lambda session, tenant_id=None: Store())
+    hits = db.vector_search(s, [0.1], top_k=3)
+    assert [h['chunk'].id for h in hits] == ['live0', 'live1', 'live2']
+    assert [h['chunk'].id for h in db.vector_search(s, [0.1], top_k=5)] == ['live0', 'live1', 'live2']
+    s.close()
@@ -0,0 +1,14 @@
+import subprocess, sys
+
+def _loaded_after(stmt: str) -> set:
+    out = subprocess.run([sys.executable, '-c', f"import sys; {stmt}; print(' '.join(sys.modules))"],
+                         capture_output=True, text=True, check=True)
+    return set(out.stdout.split())
+
+def test_parse_path_needs_no_db_stack():
+    loaded = _loaded_after('import packages.tools.irule_parser, packages.tools.appshape_generator')
+    assert not {'sqlalchemy', 'pydantic', 'langgraph'} & loaded
+
+def test_db_import_does_not_create_engine():
+    loaded = _loaded_after('import packages.db as db; assert db._engine is None')
+    assert 'psycopg' not in loaded
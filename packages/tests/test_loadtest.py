@@ -0,0 +1,72 @@
+import asyncio, base64, struct
+import pytest
+from benchmarks.fakes import FakeEmbedder, FakeLLMServer, Latency
+from benchmarks.loadtest import _one, _Stats, find_knees, parse_mix
+
+def test_latency_specs():
+    assert Latency('20').sample() == Latency('fixed:20').sample() == 0.02
+    assert Latency('').sample() == Latency('exp:0').sample() == 0.0
+    u = Latency('uniform:10,50', seed=1)
+    assert all(0.01 <= u.sample() <= 0.05 for _ in range(100))
+    n = Latency('normal:1,50', seed=1)
+    assert min(n.sample() for _ in range(100)) == 0.0  # clamped, never negative
+    assert Latency('lognormal:30,0.6', seed=3).sample() == Latency('lognormal:30,0.6', seed=3).sample()
+    for bad in ('gamma:1', 'uniform:10', 'fixed:x', 'normal:1,2,3'):
+        with pytest.raises(ValueError):
+            Latency(bad)
+
+def test_parse_mix():
+    assert parse_mix('qa=4, migrate ,runs=0') == {'qa': 4.0, 'migrate': 1.0}
+    for bad in ('nope=1', 'qa=0', ''):
+        with pytest.raises(ValueError):
+            parse_mix(bad)
+
+def _step(rps, p99, error_rate=0.0, throughput=None, sent=10):
+    return {'rps': rps, 'endpoints': {'qa': {'sent': sent, 'p99_ms': p99, 'error_rate': error_rate, 'offered_rps': rps,
+                                             'throughput_rps': rps if throughput is None else throughput}}}
+
+def test_find_knees_reports_first_failing_step():
+    knee = lambda *steps, slo=None: find_knees(list(steps), 0.01, 3.0, slo)['qa']
+    assert knee(_step(5, 10), _step(10, 12), _step(20, 40)) == {'knee_rps': 10, 'saturated_at': 20, 'reason': 'latency'}
+    assert knee(_step(5, 10), _step(10, 12, error_rate=0.2)) == {'knee_rps': 5, 'saturated_at': 10, 'reason': 'errors'}
+    assert knee(_step(5, 10), _step(10, 12, throughput=8)) == {'knee_rps': 5, 'saturated_at': 10, 'reason': 'throughput'}
+    assert knee(_step(5, 10), _step(10, 25), slo=20)['reason'] == 'latency'
+    assert knee(_step(5, 10), _step(10, 0, sent=0), _step(20, 11)) == {'knee_rps': 20, 'saturated_at': None, 'reason': None}
+
+def test_one_records_any_exception_by_type():
+    async def broken(client, i):
+        raise KeyError('run_id')  # e.g. an error response without the expected field
+    async def ok(client, i):
+        return 200
+    st, total = _Stats(), _Stats()
+    asyncio.run(_one(broken, None, 0, st, total))
+    asyncio.run(_one(ok, None, 1, st, total))
+    assert dict(st.errors) == dict(total.errors) == {'KeyError': 1} and len(st.latencies) == 1
+
+@pytest.fixture
+def llm():
+    server = FakeLLMServer(dim=8).start()
+    yield server
+    server.stop()
+
+def test_fake_llm_embeddings_contract(llm):
+    import httpx
+    for fmt in ('float', 'base64'):
+        resp = httpx.post(llm.url + '/embeddings', json={'model': 'fake-embed', 'input': ['a b', 'c'], 'encoding_format': fmt})
+        data = resp.json()['data']
+        vecs = [d['embedding'] if fmt == 'float' else list(struct.unpack('<8f', base64.b64decode(d['embedding']))) for d in data]
+        assert [d['index'] for d in data] == [0, 1]
+        for got, text in zip(vecs, ('a b', 'c')):
+            assert got == pytest.approx(FakeEmbedder(8).vector(text))
+    assert llm.requests['embeddings'] == 2
+
+def test_fake_llm_serves_the_real_embeddings_client(llm, monkeypatch):
+    pytest.importorskip('openai')
+    from packages.rag import embeddings
+    from packages.settings import get_settings
+    for name, value in (('openai_api_key', 'offline'), ('openai_base_url', llm.url), ('embed_batch_size', 1)):
+        monkeypatch.setattr(get_settings(), name, value)
+    out = embeddings.embed_texts(['set a header', 'health monitor'])
+    for got, text in zip(out, ('set a header', 'health monitor')):
+        assert embeddings.from_bytes(got) == pytest.approx(FakeEmbedder(8).vector(text))
+    assert llm.requests['embeddings'] == 2  # one request per batch
@@ -0,0 +1,27 @@
+import json, logging, queue
+from packages.observability.logging import BoundedQueueHandler, ContextFilter, JsonFormatter, DebugSamplingFilter, bind_log_context
+
+def _record(msg, level=logging.INFO, name='t'):
+    return logging.LogRecord(name, level, __file__, 1, msg, None, None)
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = BoundedQueueHandler(queue.Queue(maxsize=2))
+    for i in range(5):
+        handler.handle(_record(f'm{i}'))
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+def test_bound_context_is_serialized():
+    handler = BoundedQueueHandler(queue.Queue())
+    handler.addFilter(ContextFilter())
+    with bind_log_context(run_id='r1', job_id=None):
+        handler.handle(_record('hello %s'))
+    rec = handler.queue.get_nowait()
+    out = json.loads(JsonFormatter().format(rec))
+    assert out['run_id'] == 'r1' and 'job_id' not in out
+
+def test_debug_sampling_keeps_one_in_n():
+    f = DebugSamplingFilter(every=10)
+    kept = sum(f.filter(_record('d', logging.DEBUG)) for _ in range(100))
+    assert kept == 10
+    assert f.filter(_record('w', logging.WARNING))
@@ -0,0 +1,37 @@
+import threading
+from packages.observability.metrics import Registry, Counter, Histogram
+
+def test_counter_sums_per_thread_shards():
+    c = Counter('t_events_total', 'test', ['kind'])
+    def work():
+        for _ in range(1000):
+            c.labels('a').inc()
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert c.labels('a').get() == 4000
+
+def test_exited_threads_fold_into_base_shard():
+    c = Counter('t_churn_total', 'test')
+    for _ in range(50):
+        t = threading.Thread(target=lambda: [c.inc() for _ in range(10)])
+        t.start()
+        t.join()
+    c.inc()
+    assert c.get() == 501
+    assert len(c._default._shards._all) <= 2  # this thread's shard, plus at most one not yet finalized
+
+def test_histogram_prometheus_text():
+    reg = Registry()
+    h = reg._get_or_create(Histogram, 't_latency_seconds', 'test', buckets=(0.1, 1.0))
+    h.observe(0.05)
+    h.observe(0.5)
+    h.observe(5)
+    text = reg.render()
+    assert '# TYPE t_latency_seconds histogram' in text
+    assert 't_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 't_latency_seconds_bucket{le="1"} 2' in text
+    assert 't_latency_seconds_bucket{le="+Inf"} 3' in text
+    assert 't_latency_seconds_count 3' in text
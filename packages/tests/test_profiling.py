@@ -0,0 +1,46 @@
+import pstats, threading, time
+from packages.observability.profiling import RequestProfile
+
+def _busy(seconds=0.05):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+def test_sample_profile_emits_collapsed_stacks():
+    with RequestProfile('sample', interval=0.001) as prof:
+        _busy()
+    lines = prof.data.decode().splitlines()
+    assert lines and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    assert any('test_profiling:_busy' in line for line in lines)
+
+def test_cprofile_output_loads_with_pstats(tmp_path):
+    with RequestProfile('cprofile') as prof:
+        _busy(0.01)
+    path = tmp_path / f'p.{prof.ext}'
+    path.write_bytes(prof.data)
+    stats = pstats.Stats(str(path))
+    assert any(func[2] == '_busy' for func in stats.stats)
+
+def test_disabled_profile_is_noop():
+    with RequestProfile(None) as prof:
+        pass
+    assert prof.data is None
+
+def _other_request(stop):
+    while not stop.is_set():
+        sum(range(100))
+
+def test_call_captures_only_the_calling_thread():
+    stop = threading.Event()
+    noise = threading.Thread(target=_other_request, args=(stop,))
+    noise.start()
+    try:
+        prof = RequestProfile('sample', interval=0.001)
+        worker = threading.Thread(target=prof.call, args=(_busy,))
+        worker.start()
+        worker.join()
+    finally:
+        stop.set()
+        noise.join()
+    text = prof.data.decode()
+    assert 'test_profiling:_busy' in text and '_other_request' not in text
@@ -0,0 +1,60 @@
+from array import array
+import pytest
+from packages.rag import embeddings
+from packages.rag.qa_cache import SemanticQACache
+
+VECS = {
+    'set a header in appshape': [1.0, 0.0, 0.0],
+    'set HTTP header appshape++': [0.96, 0.28, 0.0],
+    'configure a health monitor': [0.0, 0.0, 1.0],
+    'health monitor setup': [0.0, 0.2, 0.98],
+}
+
+@pytest.fixture(autouse=True)
+def fake_embed(monkeypatch):
+    monkeypatch.setattr(embeddings, 'embed_texts', lambda texts: [array('f', VECS[t]).tobytes() for t in texts])
+
+def _compute(calls, citations=('d1',)):
+    def compute(query_embedding):
+        calls.append(query_embedding)
+        return {'answer': f'answer {len(calls)}', 'citations': [{'doc_id': d, 'title': d} for d in citations]}
+    return compute
+
+def test_paraphrase_hits_until_corpus_changes():
+    gen = {'t1': 1, 't2': 1}
+    reads = []
+    cache = SemanticQACache(size=4, threshold=0.9, audit_rate=0.0, generation_ttl=60,
+                            generation=lambda t: reads.append(t) or gen[t])
+    calls = []
+    assert cache.answer('set a header in appshape', _compute(calls), tenant_id='t1')['cache'] == 'miss'
+    hit = cache.answer('set HTTP header appshape++', _compute(calls), tenant_id='t1')
+    assert hit['cache'] == 'hit' and hit['answer'] == 'answer 1' and hit['cached_question'] == 'set a header in appshape'
+    assert len(calls) == 1 and calls[0] == array('f', VECS['set a header in appshape']).tobytes()
+    assert cache.answer('set HTTP header appshape++', _compute(calls), tenant_id='t2')['cache'] == 'miss'  # tenants isolated
+    assert cache.answer('set HTTP header appshape++', _compute(calls), tenant_id='t1', top_k=3)['cache'] == 'miss'
+    assert reads == ['t1', 't2']  # the generation is read once per TTL, not per lookup
+    gen['t1'] = 2  # ingestion bumped the corpus generation
+    assert cache.answer('set HTTP header appshape++', _compute(calls), tenant_id='t1')['cache'] == 'hit'  # within the TTL
+    cache.invalidate_generation('t1')  # ingestion in this process pushes the bump
+    assert cache.answer('set HTTP header appshape++', _compute(calls), tenant_id='t1')['cache'] == 'stale'
+    st = cache.stats()['tenants']['t1']
+    assert (st['hits'], st['misses'], st['stale'], st['entries']) == (2, 2, 1, 1)
+    assert st['saved_seconds'] >= 0 and st['hit_rate'] == 0.4
+
+def test_lru_eviction_and_false_hit_audit():
+    cache = SemanticQACache(size=1, threshold=0.9, audit_rate=0.0, generation=lambda t: 0)
+    calls = []
+    cache.answer('set a header in appshape', _compute(calls), tenant_id='t')
+    cache.answer('configure a health monitor', _compute(calls), tenant_id='t')  # evicts the header entry
+    assert cache.answer('set HTTP header appshape++', _compute(calls), tenant_id='t')['cache'] == 'miss'
+
+    cache.audit_rate = 1.0
+    audited = cache.answer('health monitor setup', _compute(calls, citations=('d9',)), tenant_id='t')
+    assert audited['cache'] == 'miss'  # the health entry was evicted by the header question above
+    agreed = cache.answer('configure a health monitor', _compute(calls, citations=('d9',)), tenant_id='t')
+    assert agreed['cache'] == 'hit' and agreed['answer'] == f'answer {len(calls)}'
+    wrong = cache.answer('configure a health monitor', _compute(calls, citations=('d2',)), tenant_id='t')
+    assert wrong['cache'] == 'false_hit' and wrong['citations'] == [{'doc_id': 'd2', 'title': 'd2'}]
+    st = cache.stats()
+    assert st['tenants']['t']['audits'] == 2 and st['tenants']['t']['false_hit_rate'] == 0.5
+    assert [a['false_hit'] for a in st['recent_audits']] == [False, True]
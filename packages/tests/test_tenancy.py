@@ -0,0 +1,62 @@
+import pytest
+import packages.db as db
+from packages.ingestion import ingest
+from packages.rag import retriever
+from packages.settings import get_settings
+from packages.tenancy import InvalidTenant, current_tenant, key_digest, tenant_scope
+
+def test_tenant_scope_validates_and_restores():
+    base = current_tenant()
+    with tenant_scope('acme'):
+        assert current_tenant() == 'acme'
+    assert current_tenant() == base
+    with pytest.raises(InvalidTenant):
+        with tenant_scope('../etc'):
+            pass
+
+def test_retrieval_and_runs_are_tenant_scoped(tmp_path, sqlite_db):
+    for tenant, text in (('acme', 'acme uses HTTP::header rewrites'), ('globex', 'globex uses HTTP::cookie rewrites')):
+        d = tmp_path / tenant
+        d.mkdir()
+        (d / 'notes.md').write_text(text)
+        ingest.ingest_path(str(d), tenant_id=tenant)
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    (shared / 'same.md').write_text('shared rewrites manual')
+    embedded = []
+    for tenant in ('acme', 'globex'):
+        res = ingest.ingest_path(str(shared), tenant_id=tenant)
+        embedded.append(res.deduplicated)
+    assert embedded == [0, 1]  # globex reuses acme's chunks instead of re-embedding
+
+    with tenant_scope('acme'):
+        texts = [c['text'] for c in retriever.retrieve('rewrites').chunks]
+        s = db.SessionLocal()
+        run = db.create_run(s, type_='migrate')
+        s.commit()
+    assert any('acme' in t for t in texts) and not any('globex' in t for t in texts)
+    with tenant_scope('globex'):
+        assert db.get_run(s, run.id) is None and db.list_runs(s) == []
+    s.close()
+
+def test_api_binds_tenant_to_api_key_in_multi_mode(monkeypatch, sqlite_db):
+    from fastapi.testclient import TestClient
+    from apps.api import main
+    monkeypatch.setattr(get_settings(), 'tenancy_mode', 'multi')
+    monkeypatch.setattr(get_settings(), 'tenant_api_keys', {key_digest('acme-secret'): 'acme'})
+    client = TestClient(main.app)
+    assert client.get('/v1/runs').status_code == 401
+    assert client.get('/v1/runs', headers={'X-Tenant-Id': 'acme'}).status_code == 401  # the header alone proves nothing
+    assert client.get('/v1/runs', headers={'X-Api-Key': 'guess'}).status_code == 401
+    assert client.get('/v1/runs', headers={'X-Api-Key': 'acme-secret', 'X-Tenant-Id': 'globex'}).status_code == 403
+    assert client.get('/v1/runs', headers={'Authorization': 'Bearer acme-secret'}).status_code == 200
+    assert f"key:{key_digest('acme-secret')[:16]}" in main._rate_state
+
+def test_rate_limiter_forgets_idle_and_excess_clients(monkeypatch):
+    from apps.api import main
+    monkeypatch.setattr(get_settings(), 'rate_limit_max_buckets', 3)
+    monkeypatch.setattr(main, '_rate_state', main.OrderedDict())
+    main._rate_state['idle'] = {'tokens': 0, 'ts': 0}
+    for ip in ('a', 'b', 'c', 'd'):
+        main.rate_limiter(ip)
+    assert list(main._rate_state) == ['b', 'c', 'd']
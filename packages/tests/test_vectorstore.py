@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from packages.rag.vectorstore import EmbeddedVectorStore, PgVectorStore
+
+def _data(n=2000, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    return [f'c{i}' for i in range(n)], rng.standard_normal((n, dim)).astype(np.float32)
+
+def _exact(mat, q, k):
+    m = mat / np.linalg.norm(mat, axis=1, keepdims=True)
+    return list(np.argsort(-(m @ (q / np.linalg.norm(q))))[:k])
+
+def test_bruteforce_matches_exact(tmp_path):
+    ids, mat = _data()
+    store = EmbeddedVectorStore(str(tmp_path), block_rows=300)
+    store.write_snapshot(ids, mat)
+    q = mat[17] + 0.01
+    hits = store.search(q, top_k=5)
+    assert [h[0] for h in hits] == [ids[i] for i in _exact(mat, q, 5)]
+    assert hits[0][0] == 'c17'
+
+def test_add_publishes_generation_seen_by_other_readers(tmp_path):
+    ids, mat = _data(100)
+    writer = EmbeddedVectorStore(str(tmp_path), dtype='float16')
+    reader = EmbeddedVectorStore(str(tmp_path))
+    writer.write_snapshot(ids[:50], mat[:50])
+    assert reader.search(mat[70], top_k=1)[0][0] != 'c70'
+    writer.add(ids[50:], [v.tobytes() for v in mat[50:]])
+    assert reader.search(mat[70], top_k=1)[0][0] == 'c70'
+    assert reader.snapshot().count == 100
+
+def test_ivf_recall(tmp_path):
+    ids, mat = _data(4000)
+    store = EmbeddedVectorStore(str(tmp_path), ivf_min_rows=1000, nprobe=16)
+    store.write_snapshot(ids, mat)
+    assert store.snapshot().centroids is not None
+    found = sum(store.search(mat[i], top_k=1)[0][0] == ids[i] for i in range(0, 4000, 40))
+    assert found >= 95
+
+def test_add_appends_delta_segments_and_compacts(tmp_path):
+    ids, mat = _data(400)
+    store = EmbeddedVectorStore(str(tmp_path), max_deltas=4, delta_ratio=10.0, background_compaction=False)
+    store.write_snapshot(ids[:100], mat[:100])
+    base = store.snapshot().name
+    store.add(ids[100:200], mat[100:200])
+    store.add(['c5'], mat[300:301])  # replaces c5's vector without touching the base segment
+    snap = store.snapshot()
+    assert (snap.name, snap.deltas, snap.count) == (base, 2, 200)
+    assert store.search(mat[150], top_k=1)[0][0] == 'c150'
+    assert store.search(mat[300], top_k=1)[0][0] == 'c5'
+    assert 'c5' not in [h[0] for h in store.search(mat[5], top_k=3)]
+    store.add(ids[200:210], mat[200:210])
+    store.add(ids[210:220], mat[210:220])  # fourth delta: folded into a new generation
+    snap = store.snapshot()
+    assert snap.name != base and snap.deltas == 0 and snap.count == 220
+    assert dict(store.iter_items())['c5'] == (mat[300] / np.linalg.norm(mat[300])).astype(np.float32).tobytes()
+
+
+def test_pgvector_column_type_keeps_dims_indexable():
+    assert PgVectorStore(None, 1536, 'default').column_type == 'vector'
+    assert PgVectorStore(None, 3072, 'default').column_type == 'halfvec'
+    with pytest.raises(ValueError):
+        PgVectorStore(None, 4096, 'default')
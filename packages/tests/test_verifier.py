@@ -0,0 +1,38 @@
+import pytest
+from packages.tools.irule_parser import parse_irule
+from packages.tools.appshape_generator import generate_appshape
+from packages.tools.templates import TemplateError, compile_template
+from packages.tools.verifier import verify_script
+
+def test_template_compiles_to_anchored_matcher():
+    m = compile_template('set_header {op:(insert|replace)} {name:header} {value:string?}')
+    assert m.match('set_header replace X-Id "a b"').group('value') == '"a b"'
+    assert m.match('set_header insert Host').group('value') is None
+    assert not m.match('set_header names')
+    assert not m.match('set_header replace X-Id [HTTP::host]') and not m.match('set_header replace X-Id "$v"')
+    assert m.match('set_header replace X-Id "\\$v"')
+    with pytest.raises(TemplateError):
+        compile_template('x {a:float}')
+
+def test_generated_script_verifies_line_by_line():
+    code = "when HTTP_REQUEST {\n  HTTP::header replace X-A 1\n  HTTP::header names\n  HTTP::method\n  table set k v\n}\n"
+    script = generate_appshape(parse_irule(code)['ast'], {'status': 'partial'})['code']
+    res = verify_script(script + "get_method  # line 9 : HTTP::uri\nbogus\n")
+    statuses = [(r['line'], r['status']) for r in res['lines']]
+    assert statuses == [(2, 'ok'), (3, 'template_mismatch'), (4, 'ok'), (5, 'unmapped'), (9, 'target_mismatch'), (None, 'malformed')]
+    assert res['lines'][0]['args'] == {'op': 'replace', 'name': 'X-A', 'value': '"1"'}
+    assert res['verification']['tests_run'] == 6 and res['verification']['passed'] == 2
+    assert res['confidence'] == round(2 / 6, 4)
+
+def test_generator_translates_literals_and_verifier_rejects_substitution():
+    code = ('when HTTP_REQUEST {\n  HTTP::header replace X-Id {a $b}\n  HTTP::uri "/new path"\n'
+            '  HTTP::uri [string tolower [HTTP::uri]]\n  HTTP::header insert X-Client $ip\n}\n')
+    script = generate_appshape(parse_irule(code)['ast'], {'status': 'partial'})['code']
+    assert script.splitlines()[2:6] == [
+        'set_header replace X-Id "a \\$b"  # line 2 : HTTP::header',  # braces are literal in Tcl, so $ is escaped
+        'rewrite_uri "/new path"  # line 3 : HTTP::uri',
+        'rewrite_uri [string tolower [HTTP::uri]]  # line 4 : HTTP::uri',
+        'set_header insert X-Client $ip  # line 5 : HTTP::header']
+    res = verify_script(script)
+    assert [r['status'] for r in res['lines']] == ['ok', 'ok', 'untranslated', 'untranslated']
+    assert res['lines'][1]['args'] == {'uri': '"/new path"'}
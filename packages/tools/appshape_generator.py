@@ -1,10 +1,25 @@
 """AppShape++ generator.
 Converts AST + plan to code with inline line refs.
-Only emits targets that exist in the curated mapping dataset.
+Only emits targets that exist in the curated mapping dataset; a mapped line is
+the target followed by the iRule command's arguments, checked against the
+entry's template by packages/tools/verifier.py.
+
+Output format: arguments are translated into the target grammar rather than
+pasted as Tcl. Literal words (bare, "quoted" or {braced}) are re-emitted per
+template slot, so `string`/`path` slots get a double-quoted literal with
+`$ [ ] "` and backslash escaped, other slots a bare word, e.g.
+
+    HTTP::header replace X-Id {a b}   ->   set_header replace X-Id "a b"  # line 2 : HTTP::header
+
+Words that need runtime substitution (`[cmd ...]`, `$var`) have no target
+equivalent yet; they are emitted unchanged and the verifier reports the line
+as `untranslated`.
 """
-from typing import Dict, Any, List
-import json
+from typing import Dict, Any, List, Optional
+import functools, json, re
 from pathlib import Path
+from packages.observability.metrics import histogram
+from packages.tools.templates import SUBSTITUTION_RE, compile_templates, quote_string, template_slots
 
 # Load curated mapping file if present (admin-extensible)
 _DEFAULT = {
@@ -24,7 +39,82 @@ def _load_mappings():
     return _DEFAULT
 
 MAPPINGS = _load_mappings()
+TEMPLATES = compile_templates(MAPPINGS)  # target -> compiled argument matcher
+SLOTS = {}  # target -> template_slots(), first template wins like TEMPLATES
+for _meta in MAPPINGS.values():
+    if isinstance(_meta, dict) and _meta.get('template') and _meta.get('target') not in SLOTS:
+        SLOTS[_meta['target']] = template_slots(_meta['template'])
+
+_TCL_SPECIAL = re.compile(r'[{}"\\\[$]')
+_BARE = re.compile(r"^[A-Za-z0-9!#%&'*+.^_`|~/:=,@-]+$")
+
+
+def _tcl_words(text: str) -> List[str]:
+    """Split a Tcl command's arguments into words, keeping {..}, ".." and [..] groups intact."""
+    words: List[str] = []
+    i, n = 0, len(text)
+    while i < n:
+        while i < n and text[i] in ' \t':
+            i += 1
+        if i >= n:
+            break
+        start, depth, quoted = i, 0, False
+        while i < n:
+            ch = text[i]
+            if ch == '\\':
+                i += 2
+                continue
+            if ch == '"' and depth == 0 and (quoted or i == start):
+                quoted = not quoted
+            elif not quoted and ch in '[{':
+                depth += 1
+            elif not quoted and ch in ']}' and depth:
+                depth -= 1
+            elif ch in ' \t' and depth == 0 and not quoted:
+                break
+            i += 1
+        words.append(text[start:i])
+    return words
+
+
+def _literal(word: str) -> Optional[str]:
+    """The word's value when it is a plain Tcl literal; None when it substitutes a command or variable."""
+    if len(word) >= 2 and word[0] == '{' and word[-1] == '}':
+        return word[1:-1]
+    if len(word) >= 2 and word[0] == '"' and word[-1] == '"':
+        word = word[1:-1]
+    if SUBSTITUTION_RE.search(word):
+        return None
+    return re.sub(r'\\(.)', r'\1', word)
+
+
+@functools.lru_cache(maxsize=4096)  # pure; iRules repeat the same argument idioms across lines and rules
+def translate_args(target: str, raw_args: str) -> str:
+    """`raw_args` (Tcl) rendered for `target`'s template slots; see the module docstring."""
+    slots = SLOTS.get(target, [])
+    out = []
+    plain = _TCL_SPECIAL.search(raw_args) is None  # common case: bare words only, nothing to unquote
+    for i, word in enumerate(raw_args.split() if plain else _tcl_words(raw_args)):
+        value = word if plain else _literal(word)
+        if value is None:
+            out.append(word)
+            continue
+        kind = slots[i][1] if i < len(slots) and slots[i][0] is not None else None
+        out.append(quote_string(value) if kind in ('string', 'path') or not _BARE.match(value) else value)
+    return ' '.join(out)
+
+def map_command(cmd: str):
+    """(target, source) for the first mapping whose key prefixes `cmd`; (None, None) when unmapped."""
+    for k, meta in MAPPINGS.items():
+        if cmd.startswith(k):
+            if isinstance(meta, dict):
+                return meta.get('target'), meta.get('source')
+            return meta, None
+    return None, None
+
+_GENERATE_SECONDS = histogram('appshape_generate_seconds', 'Time spent generating AppShape++ from an AST')
 
+@_GENERATE_SECONDS.time()
 def generate_appshape(ast: Dict[str, Any], plan: Dict[str, Any]) -> Dict[str, Any]:
     events: List[Dict[str, Any]] = ast.get('events', [])
     out_lines: List[str] = ["# Generated AppShape++ script"]
@@ -34,15 +124,10 @@ def generate_appshape(ast: Dict[str, Any], plan: Dict[str, Any]) -> Dict[str, An
         for node in ev.get('body', []):
             cmd = node['cmd']
             line = node['line']
-            target = None
-            source = None
-            for k, meta in MAPPINGS.items():
-                if cmd.startswith(k):
-                    target = meta.get('target') if isinstance(meta, dict) else meta
-                    source = meta.get('source') if isinstance(meta, dict) else None
-                    break
+            target, source = map_command(cmd)
             if target:
-                out_lines.append(f"{target}  # line {line} : {cmd}")
+                args = translate_args(target, node.get('raw', cmd)[len(cmd):].strip())
+                out_lines.append(f"{target} {args}".rstrip() + f"  # line {line} : {cmd}")
                 mapping.append({"source_cmd": cmd, "line": line, "target": target, "source": source})
             else:
                 out_lines.append(f"# unmapped line {line}: {cmd}")
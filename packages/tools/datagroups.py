@@ -0,0 +1,653 @@
+"""F5 data groups (`class`) for AppShape++.
+
+Reads the external data-group file format (one record per line, trailing
+commas optional)::
+
+    host 10.1.1.1 := "deny",
+    network 10.0.0.0/8 := "internal",
+    network 192.168.0.0 mask 255.255.0.0,
+    "/api/" := "pool_api",
+    42 := "answer",
+
+The type comes from the caller (`--type`, a `<name>.<type>.class` file name
+or the API's `data_group_types` field). Otherwise it is detected: a quoted
+key always means a string group, and the type guessed from the first record
+falls back to `string` as soon as a later key does not fit it.
+
+It then builds indexes sized for groups with hundreds of thousands of records:
+
+- `ip` groups become disjoint `[start, end]` ranges in sorted arrays
+  (`IpRangeIndex`); nested networks are flattened so bisect returns the
+  longest-prefix match, and adjacent ranges with the same value merge
+- `string`/`integer` groups keep a dict for `equals`; `starts_with` and
+  `ends_with` use a radix trie over the keys (reversed keys for suffixes),
+  built on first use
+
+`analyze_lookups` finds `class match|search|lookup|...` calls in a parsed
+iRule and reports which target construct each one maps to and whether it
+is an indexed lookup or a linear scan. `iter_appshape` emits the
+deduplicated group as an AppShape++ data class.
+
+CLI: python -m packages.tools.datagroups blocked_ips.class --irule rule.tcl --out dataclasses.appshape
+"""
+from __future__ import annotations
+import argparse, ipaddress, json, re, socket, sys
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from packages.observability.metrics import histogram
+
+TYPES = ('ip', 'string', 'integer')
+_TYPE_ALIASES = {'ip': 'ip', 'address': 'ip', 'string': 'string', 'str': 'string', 'integer': 'integer', 'int': 'integer'}
+MAX_REPORTED_CONFLICTS = 20
+
+_LOAD_SECONDS = histogram('datagroup_load_seconds', 'Time spent parsing and indexing one data group')
+
+_MISSING = object()
+
+
+class DataGroupError(ValueError):
+    pass
+
+
+# --- file format --------------------------------------------------------------
+
+_QUOTED = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+
+def _unquote(text: str) -> str:
+    text = text.strip()
+    if len(text) < 2 or text[0] != '"' or text[-1] != '"':
+        return text
+    body = text[1:-1]
+    return re.sub(r'\\(.)', r'\1', body) if '\\' in body else body
+
+
+def parse_record(line: str) -> Optional[Tuple[str, str]]:
+    """(key, value) for one record line; None for blank/comment lines. Records without `:=` get an empty value."""
+    text = line.strip()
+    if not text or text.startswith('#'):
+        return None
+    if text.endswith(','):
+        text = text[:-1].rstrip()
+    if text.startswith('"'):
+        m = _QUOTED.match(text)
+        if not m:
+            raise DataGroupError(f'unterminated key in {line.strip()!r}')
+        key, rest = _unquote(m.group(0)), text[m.end():].strip()
+        if rest and not rest.startswith(':='):
+            raise DataGroupError(f'expected ":=" after key in {line.strip()!r}')
+        value = rest[2:] if rest else ''
+    else:
+        key, sep, value = text.partition(':=')
+        key = key.strip()
+    if not key:
+        raise DataGroupError(f'empty key in {line.strip()!r}')
+    return key, _unquote(value)
+
+
+def _ip_range(key: str) -> Tuple[int, int, int]:
+    """(family, first, last) address as ints for `host a`, `network a/len`, `network a mask m` or a bare address/CIDR."""
+    text = key.strip()
+    for prefix in ('host ', 'network '):
+        if text.startswith(prefix):
+            text = text[len(prefix):].strip()
+            break
+    addr, _, mask = text.partition(' mask ')
+    addr, _, plen = addr.strip().partition('/')
+    addr = addr.partition('%')[0]  # route domain suffix
+    family, af, bits = (6, socket.AF_INET6, 128) if ':' in addr else (4, socket.AF_INET, 32)
+    try:
+        n = int.from_bytes(socket.inet_pton(af, addr), 'big')
+        if mask:
+            m = int.from_bytes(socket.inet_pton(af, mask.strip()), 'big')
+            length = bin(m).count('1')
+            if m != ((1 << bits) - 1) ^ ((1 << (bits - length)) - 1):
+                raise ValueError
+        else:
+            length = int(plen) if plen else bits
+        if not 0 <= length <= bits:
+            raise ValueError
+    except (OSError, ValueError):
+        raise DataGroupError(f'invalid address key {key!r}') from None
+    host = (1 << (bits - length)) - 1
+    start = n & ~host
+    return family, start, start | host
+
+
+def detect_type(key: str, quoted: bool = False) -> str:
+    if quoted:
+        return 'string'
+    if key.startswith(('host ', 'network ')):
+        return 'ip'
+    if re.fullmatch(r'-?\d+', key):
+        return 'integer'
+    try:
+        _ip_range(key)
+        return 'ip'
+    except DataGroupError:
+        return 'string'
+
+
+# --- indexes ------------------------------------------------------------------
+
+class IpRangeIndex:
+    """Longest-prefix match over networks, stored as disjoint sorted ranges.
+
+    IPv4 bounds live in `array('I')` (4 bytes each), IPv6 bounds in lists of
+    ints; values are interned and referenced by id. Lookup is one bisect.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[int, int, int, str]]):
+        self.values: List[str] = []
+        ids: Dict[str, int] = {}
+        by_family: Dict[int, List[Tuple[int, int, int]]] = {4: [], 6: []}
+        for family, start, end, value in entries:
+            vid = ids.get(value)
+            if vid is None:
+                vid = ids[value] = len(self.values)
+                self.values.append(value)
+            by_family[family].append((start, end, vid))
+        self.redundant = 0
+        # networks still needed for longest-prefix semantics: (start, prefix length, value id)
+        self._networks = {4: (array('I'), array('B'), array('I')), 6: ([], array('B'), array('I'))}
+        self._ranges = {4: self._flatten(4, by_family[4], array('I'), array('I')),
+                        6: self._flatten(6, by_family[6], [], [])}
+
+    def _flatten(self, family: int, entries: List[Tuple[int, int, int]], starts, ends):
+        # Networks are either nested or disjoint: sweep them in (start, -end) order with a
+        # stack of enclosing networks, emitting the innermost value for each stretch.
+        vids = array('I')
+        bits = 32 if family == 4 else 128
+        net_starts, net_lens, net_vids = self._networks[family]
+
+        def emit(s: int, e: int, vid: int):
+            if s > e:
+                return
+            if vids and vids[-1] == vid and ends[-1] + 1 == s:
+                ends[-1] = e
+            else:
+                starts.append(s)
+                ends.append(e)
+                vids.append(vid)
+
+        stack: List[Tuple[int, int]] = []
+        cursor = 0
+        for start, end, vid in sorted(entries, key=lambda r: (r[0], -r[1])):
+            while stack and stack[-1][0] < start:
+                top_end, top_vid = stack.pop()
+                emit(cursor, top_end, top_vid)
+                cursor = top_end + 1
+            if stack and stack[-1][1] == vid:
+                self.redundant += 1  # same value as the enclosing network
+            else:
+                net_starts.append(start)
+                net_lens.append(bits - (end - start).bit_length())
+                net_vids.append(vid)
+            if stack:
+                emit(cursor, start - 1, stack[-1][1])
+            cursor = start
+            stack.append((end, vid))
+        while stack:
+            top_end, top_vid = stack.pop()
+            emit(cursor, top_end, top_vid)
+            cursor = top_end + 1
+        return starts, ends, vids
+
+    def __len__(self) -> int:
+        return len(self._ranges[4][0]) + len(self._ranges[6][0])
+
+    def lookup(self, address: str, default: Any = None) -> Any:
+        """Value of the most specific network containing `address`."""
+        af = socket.AF_INET6 if ':' in address else socket.AF_INET
+        try:
+            n = int.from_bytes(socket.inet_pton(af, address.partition('%')[0]), 'big')
+        except OSError:
+            return default
+        starts, ends, vids = self._ranges[6 if af == socket.AF_INET6 else 4]
+        i = bisect_right(starts, n) - 1
+        if i >= 0 and n <= ends[i]:
+            return self.values[vids[i]]
+        return default
+
+    def __contains__(self, address: str) -> bool:
+        return self.lookup(address, _MISSING) is not _MISSING
+
+    def networks(self) -> Iterator[Tuple[str, str]]:
+        """(cidr, value) for every network a longest-prefix match still needs, IPv4 first, in address order."""
+        for family, cls in ((4, ipaddress.IPv4Address), (6, ipaddress.IPv6Address)):
+            starts, lens, vids = self._networks[family]
+            for s, length, vid in zip(starts, lens, vids):
+                yield f'{cls(s)}/{length}', self.values[vid]
+
+    def network_count(self) -> int:
+        return len(self._networks[4][0]) + len(self._networks[6][0])
+
+    def nbytes(self) -> int:
+        """Approximate size of the lookup arrays (IPv6 bounds counted at 16 bytes)."""
+        total = 0
+        for family, (starts, ends, vids) in self._ranges.items():
+            width = 4 if family == 4 else 16
+            total += (len(starts) + len(ends)) * width + len(vids) * vids.itemsize
+        return total + sum(len(v) for v in self.values)
+
+
+class _Node:
+    __slots__ = ('label', 'children', 'value')
+
+    def __init__(self, label: str = '', value: Any = _MISSING):
+        self.label = label
+        self.children: Dict[str, _Node] = {}
+        self.value = value
+
+
+class PrefixTrie:
+    """Radix trie: edges carry whole label runs, so nodes exist only at branch points and key ends."""
+
+    def __init__(self, items: Iterable[Tuple[str, Any]] = ()):
+        self._root = _Node()
+        self._size = 0
+        self.nodes = 1
+        for key, value in items:
+            self.insert(key, value)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def insert(self, key: str, value: Any) -> bool:
+        """Add `key`; an existing key keeps its value and False is returned."""
+        node, i = self._root, 0
+        while i < len(key):
+            child = node.children.get(key[i])
+            if child is None:
+                node.children[key[i]] = _Node(key[i:], value)
+                self._size += 1
+                self.nodes += 1
+                return True
+            label = child.label
+            common = 1
+            limit = min(len(label), len(key) - i)
+            while common < limit and label[common] == key[i + common]:
+                common += 1
+            if common < len(label):
+                mid = _Node(label[:common])
+                child.label = label[common:]
+                mid.children[child.label[0]] = child
+                node.children[key[i]] = mid
+                self.nodes += 1
+                child = mid
+            node, i = child, i + common
+        if node.value is not _MISSING:
+            return False
+        node.value = value
+        self._size += 1
+        return True
+
+    def get(self, key: str, default: Any = None) -> Any:
+        node, i = self._root, 0
+        while i < len(key):
+            child = node.children.get(key[i])
+            if child is None or not key.startswith(child.label, i):
+                return default
+            node, i = child, i + len(child.label)
+        return default if node.value is _MISSING else node.value
+
+    def longest_prefix(self, text: str) -> Optional[Tuple[str, Any]]:
+        """(key, value) of the longest key that `text` starts with."""
+        node, i, best = self._root, 0, None
+        if node.value is not _MISSING:
+            best = ('', node.value)
+        while i < len(text):
+            child = node.children.get(text[i])
+            if child is None or not text.startswith(child.label, i):
+                break
+            node, i = child, i + len(child.label)
+            if node.value is not _MISSING:
+                best = (text[:i], node.value)
+        return best
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """(key, value) in sorted key order."""
+        stack = [(self._root, '')]
+        while stack:
+            node, prefix = stack.pop()
+            if node.value is not _MISSING:
+                yield prefix, node.value
+            for ch in sorted(node.children, reverse=True):
+                child = node.children[ch]
+                stack.append((child, prefix + child.label))
+
+    def shadowed(self) -> int:
+        """Keys under a shorter key with the same value; a prefix match never needs them."""
+        count = 0
+        stack: List[Tuple[_Node, Any]] = [(self._root, self._root.value)]
+        while stack:
+            node, inherited = stack.pop()
+            for child in node.children.values():
+                here = inherited
+                if child.value is not _MISSING:
+                    if child.value == inherited:
+                        count += 1
+                    else:
+                        here = child.value
+                stack.append((child, here))
+        return count
+
+
+# --- data groups --------------------------------------------------------------
+
+@dataclass
+class DataGroup:
+    name: str
+    type: str
+    records: int = 0
+    duplicates: int = 0
+    conflicts: List[str] = field(default_factory=list)
+    ip_index: Optional[IpRangeIndex] = None
+    keys: Dict[Union[str, int], str] = field(default_factory=dict)
+    _prefix: Optional[PrefixTrie] = field(default=None, init=False, repr=False)
+    _suffix: Optional[PrefixTrie] = field(default=None, init=False, repr=False)
+
+    @property
+    def prefix_trie(self) -> PrefixTrie:
+        if self._prefix is None:
+            self._prefix = PrefixTrie((str(k), v) for k, v in self.keys.items())
+        return self._prefix
+
+    @property
+    def suffix_trie(self) -> PrefixTrie:
+        if self._suffix is None:
+            self._suffix = PrefixTrie((str(k)[::-1], v) for k, v in self.keys.items())
+        return self._suffix
+
+    def match(self, item: str, operator: str = 'equals', default: Any = None) -> Any:
+        """Value for `class match -value <item> <operator> <group>`; `default` when nothing matches."""
+        if self.type == 'ip':
+            if operator != 'equals':
+                raise DataGroupError(f'{operator} is not supported on ip data group {self.name}')
+            return self.ip_index.lookup(item, default)
+        if operator == 'equals':
+            key: Union[str, int] = item
+            if self.type == 'integer':
+                try:
+                    key = int(item)
+                except ValueError:
+                    return default
+            return self.keys.get(key, default)
+        if operator == 'starts_with':
+            hit = self.prefix_trie.longest_prefix(item)
+        elif operator == 'ends_with':
+            hit = self.suffix_trie.longest_prefix(item[::-1])
+        elif operator == 'contains':
+            hit = next(((k, v) for k, v in self.keys.items() if str(k) in item), None)
+        else:
+            raise DataGroupError(f'unknown operator {operator!r}')
+        return default if hit is None else hit[1]
+
+    def summary(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {'name': self.name, 'type': self.type, 'records': self.records,
+                               'duplicates': self.duplicates, 'conflicts': self.conflicts}
+        if self.type == 'ip':
+            out.update({'ranges': len(self.ip_index), 'networks': self.ip_index.network_count(),
+                        'redundant': self.ip_index.redundant,
+                        'index_bytes': self.ip_index.nbytes()})
+        else:
+            out.update({'keys': len(self.keys)})
+            if self._prefix is not None:
+                out.update({'trie_nodes': self._prefix.nodes, 'shadowed_prefixes': self._prefix.shadowed()})
+        return out
+
+
+def normalize_type(type_: Optional[str]) -> Optional[str]:
+    if type_ is None:
+        return None
+    if type_.lower() not in _TYPE_ALIASES:
+        raise DataGroupError(f'unknown data group type {type_!r} (expected one of {", ".join(TYPES)})')
+    return _TYPE_ALIASES[type_.lower()]
+
+
+def _index_records(group: DataGroup, records: List[Tuple[int, str, str, bool]], detected: bool) -> bool:
+    """Index `records` as `group.type`; False when a detected type turns out not to fit (nothing is kept)."""
+    ip_entries: Dict[Tuple[int, int, int], str] = {}
+    for n, key, value, quoted in records:
+        if detected and quoted and group.type != 'string':
+            return False
+        try:
+            if group.type == 'ip':
+                k: Any = _ip_range(key)
+            elif group.type == 'integer':
+                try:
+                    k = int(key)
+                except ValueError:
+                    raise DataGroupError(f'invalid integer key {key!r}') from None
+            else:
+                k = key
+        except DataGroupError as e:
+            if detected and not key.startswith(('host ', 'network ')):  # those can only be (malformed) ip records
+                return False
+            raise DataGroupError(f'{group.name}:{n}: {e}') from None
+        seen = ip_entries if group.type == 'ip' else group.keys
+        prev = seen.get(k, _MISSING)
+        if prev is _MISSING:
+            seen[k] = value
+            continue
+        group.duplicates += 1
+        if prev != value and len(group.conflicts) < MAX_REPORTED_CONFLICTS:
+            group.conflicts.append(key)
+    if group.type == 'ip':
+        group.ip_index = IpRangeIndex((f, s, e, v) for (f, s, e), v in ip_entries.items())
+    return True
+
+
+@_LOAD_SECONDS.time()
+def load_datagroup(lines: Union[str, Iterable[str]], name: str, type_: Optional[str] = None) -> DataGroup:
+    """Parse an external data-group file (text or line iterator) and index it.
+
+    Without `type_` the type of the first record is tried first; a later
+    key that does not fit it (or any quoted key) makes the group `string`.
+    Duplicate keys keep their first value, as BIG-IP does; duplicates whose
+    value differs are listed in `conflicts`.
+    """
+    if isinstance(lines, str):
+        lines = lines.splitlines()
+    group = DataGroup(name=name, type=normalize_type(type_) or '')
+    records: List[Tuple[int, str, str, bool]] = []
+    for n, line in enumerate(lines, start=1):
+        try:
+            record = parse_record(line)
+        except DataGroupError as e:
+            raise DataGroupError(f'{name}:{n}: {e}') from None
+        if record is not None:
+            records.append((n, record[0], record[1], line.lstrip().startswith('"')))
+    group.records = len(records)
+    detected = not group.type
+    if detected:
+        group.type = detect_type(records[0][1], records[0][3]) if records else 'string'
+    if not _index_records(group, records, detected):
+        group.type, group.duplicates, group.conflicts, group.keys = 'string', 0, [], {}
+        _index_records(group, records, detected=False)
+    return group
+
+
+def group_name_and_type(filename: str) -> Tuple[str, Optional[str]]:
+    """Data group name and type for an uploaded file.
+
+    The name is the file name without directories or extension. A type may
+    be the last or second-to-last suffix: `blocked.ip.class` and `codes.int`
+    give ('blocked', 'ip') and ('codes', 'integer'); `uris.class` gives ('uris', None).
+    """
+    path = Path(Path(filename).name)
+    for candidate in (path, Path(path.stem)):
+        if candidate.suffix[1:].lower() in _TYPE_ALIASES:
+            return candidate.stem or filename, _TYPE_ALIASES[candidate.suffix[1:].lower()]
+    return path.stem or filename, None
+
+
+def group_name(filename: str) -> str:
+    """Data group name for an uploaded file (see `group_name_and_type`)."""
+    return group_name_and_type(filename)[0]
+
+
+# --- iRule lookups ------------------------------------------------------------
+
+CLASS_RE = re.compile(r'\bclass\s+(?P<op>match|search|lookup|element|exists|size|names|get|type)\b')
+OPERATORS = ('equals', 'starts_with', 'ends_with', 'contains')
+_METADATA_OPS = {'element', 'exists', 'size', 'names', 'get', 'type'}
+
+# (type, operator) -> (construct, efficient); type None covers string and integer groups
+CONSTRUCTS = {
+    ('ip', 'equals'): ('ip_range_index', True),
+    (None, 'equals'): ('hash_lookup', True),
+    (None, 'starts_with'): ('prefix_trie', True),
+    (None, 'ends_with'): ('suffix_trie', True),
+    (None, 'contains'): ('linear_scan', False),
+}
+
+
+def _words(text: str) -> List[str]:
+    """Tcl words up to the end of the enclosing command, keeping [..], {..} and ".." groups intact."""
+    words: List[str] = []
+    i, n = 0, len(text)
+    while i < n:
+        while i < n and text[i] in ' \t':
+            i += 1
+        if i >= n or text[i] in ']};':
+            break
+        start, depth, quoted = i, 0, False
+        while i < n:
+            ch = text[i]
+            if ch == '\\':
+                i += 2
+                continue
+            if ch == '"' and depth == 0:
+                quoted = not quoted
+            elif not quoted and ch in '[{':
+                depth += 1
+            elif not quoted and ch in ']}':
+                if depth == 0:
+                    break
+                depth -= 1
+            elif ch in ' \t;' and depth == 0 and not quoted:
+                break
+            i += 1
+        words.append(text[start:i])
+    return words
+
+
+def find_class_refs(ast: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Every `class ...` call in the parsed iRule: {line, op, operator, group, item}."""
+    refs: List[Dict[str, Any]] = []
+    for ev in ast.get('events', []):
+        for node in ev.get('body', []):
+            raw = node.get('raw', '')
+            if 'class' not in raw:
+                continue
+            for m in CLASS_RE.finditer(raw):
+                words = [w for w in _words(raw[m.end():]) if w != '--']
+                while words and words[0].startswith('-') and words[0] not in ('-', '--'):
+                    words.pop(0)  # -value, -name, -index, -element, -all
+                op = m.group('op')
+                ref: Dict[str, Any] = {'line': node['line'], 'op': op, 'operator': None, 'group': None, 'item': None}
+                if op == 'match' and len(words) >= 3 and words[1] in OPERATORS:
+                    ref.update(item=words[0], operator=words[1], group=words[2])
+                elif op == 'search' and len(words) >= 3 and words[1] in OPERATORS:
+                    ref.update(group=words[0], operator=words[1], item=words[2])
+                elif op == 'lookup' and len(words) >= 2:
+                    ref.update(item=words[0], operator='equals', group=words[1])
+                elif op in _METADATA_OPS and words:
+                    ref.update(group=words[-1] if op == 'element' else words[0])
+                refs.append(ref)
+    return refs
+
+
+def analyze_lookups(ast: Dict[str, Any], groups: Dict[str, DataGroup]) -> List[Dict[str, Any]]:
+    """Target construct for each `class` call, and whether it is an indexed lookup."""
+    out = []
+    for ref in find_class_refs(ast):
+        name, operator = ref['group'], ref['operator']
+        group = groups.get(name) if name else None
+        res = {**ref, 'type': group.type if group else None, 'records': group.records if group else None}
+        if name is None:
+            res.update(construct='unparsed', efficient=None, detail='could not parse class arguments')
+        elif name[0] in '$[':
+            res.update(construct='dynamic', efficient=False, detail='data group chosen at runtime')
+        elif ref['op'] in _METADATA_OPS:
+            res.update(construct='metadata', efficient=True, detail=None)
+        else:
+            construct, efficient = CONSTRUCTS.get((group.type if group and group.type == 'ip' else None, operator),
+                                                  ('linear_scan', False))
+            detail = None if group else 'data group not supplied; assuming string keys'
+            if group and group.type == 'ip' and operator != 'equals':
+                detail = f'{operator} compares ip keys as strings'
+            res.update(construct=construct, efficient=efficient, detail=detail)
+        out.append(res)
+    return out
+
+
+def iter_appshape(group: DataGroup) -> Iterator[str]:
+    """AppShape++ data class for `group`: deduplicated records; ip groups drop networks nested in one with the same value."""
+    yield f'# data group {group.name}: {group.records} records'
+    yield f'dataclass {group.name} {group.type} {{'
+    if group.type == 'ip':
+        records: Iterable[Tuple[str, str]] = group.ip_index.networks()
+    else:
+        records = sorted(group.keys.items())
+    for key, value in records:
+        k = key if group.type != 'string' else json.dumps(key)
+        yield f'    {k} := {json.dumps(value)}' if value else f'    {k}'
+    yield '}'
+
+
+def convert_data_groups(ast: Optional[Dict[str, Any]], sources: Dict[str, str],
+                        types: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Load `sources` (name -> file text), analyze the iRule's lookups and emit AppShape++ data classes.
+
+    `types` (name -> ip|string|integer) fixes a group's type instead of
+    detecting it. Returns {'groups': [summary], 'lookups': [...], 'code': str};
+    `code` is empty when no data groups were supplied.
+    """
+    types = types or {}
+    unknown = sorted(set(types) - set(sources))
+    if unknown:
+        raise DataGroupError(f'type given for data groups that were not supplied: {", ".join(unknown)}')
+    groups = {name: load_datagroup(text, name, types.get(name)) for name, text in sources.items()}
+    lookups = analyze_lookups(ast or {}, groups)
+    for ref in lookups:
+        group = groups.get(ref['group'] or '')
+        if group is not None and ref['construct'] == 'prefix_trie':
+            group.prefix_trie  # built now so the summary reports its size and shadowed prefixes
+    code = '\n'.join(line for g in groups.values() for line in iter_appshape(g))
+    return {'groups': [g.summary() for g in groups.values()], 'lookups': lookups, 'code': code + '\n' if code else ''}
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Convert F5 external data groups to AppShape++ data classes')
+    ap.add_argument('files', nargs='+', help='external data-group files; the file name (without extension) is the group name')
+    ap.add_argument('--type', choices=sorted(_TYPE_ALIASES), default=None,
+                    help='data group type for every file (default: a type suffix in the file name, else detected)')
+    ap.add_argument('--irule', help='report how this iRule\'s class lookups map onto the converted groups')
+    ap.add_argument('--out', help='write AppShape++ data classes here (default: stdout)')
+    args = ap.parse_args()
+    groups = {}
+    for f in args.files:
+        name, type_ = group_name_and_type(f)
+        with open(f, encoding='utf-8', errors='replace') as fh:
+            groups[name] = load_datagroup(fh, name, args.type or type_)
+    ast = None
+    if args.irule:
+        from packages.tools.irule_parser import parse_irule
+        ast = parse_irule(Path(args.irule).read_text(encoding='utf-8', errors='ignore'))['ast']
+    lookups = analyze_lookups(ast or {}, groups)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as out:
+            for g in groups.values():
+                for line in iter_appshape(g):
+                    out.write(line + '\n')
+    else:
+        for g in groups.values():
+            for line in iter_appshape(g):
+                print(line)
+    print(json.dumps({'groups': [g.summary() for g in groups.values()], 'lookups': lookups}, indent=2),
+          file=sys.stderr if not args.out else sys.stdout)
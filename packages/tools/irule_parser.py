@@ -3,6 +3,7 @@ Parses events and commands with line numbers; detects unsupported constructs.
 """
 from typing import Dict, Any, List
 import re
+from packages.observability.metrics import histogram
 
 SUPPORTED_EVENTS = {"CLIENT_ACCEPTED", "HTTP_REQUEST", "HTTP_RESPONSE"}
 SUPPORTED_COMMANDS = {"when","if","elseif","else","switch","set","return","HTTP::uri","HTTP::method","HTTP::path","HTTP::query","HTTP::header","regexp","string","class"}
@@ -11,7 +12,10 @@ PARTIAL_OR_UNSUPPORTED = {"table","after","HSL::send","binary","iControl","sideb
 EVENT_RE = re.compile(r'^\s*when\s+(\w+)\s*\{?')
 CMD_RE = re.compile(r'^(?P<indent>\s*)(?P<cmd>[A-Za-z0-9_:]+)')
 
+_PARSE_SECONDS = histogram('irule_parse_seconds', 'Time spent parsing one iRule')
 
+
+@_PARSE_SECONDS.time()
 def parse_irule(code: str) -> Dict[str, Any]:
     lines = code.splitlines()
     events: List[Dict[str, Any]] = []
@@ -0,0 +1,104 @@
+"""Argument templates for capability-map targets.
+
+A template is the target followed by space-separated parts:
+
+    set_header {op:(insert|replace|remove)} {name:header} {value:string?}
+
+- literal words must appear as written
+- `{name:type}` captures an argument. Target-grammar types: `string`
+  (double-quoted; `$`, `[`, `]`, `"` and backslash are backslash-escaped),
+  `path` (a `string` that starts with `/`), `header` (an HTTP header name),
+  `int` and `(a|b|c)` (one of the listed words). Loose types for admin-added entries: `word`, `ident`,
+  `token` (bare word or double-quoted string) and `rest` (everything left)
+- a trailing `?` makes the argument (and the space before it) optional
+
+Whatever the template, the verifier rejects a line that still contains an
+unescaped `[` or `$`: that is iRule command or variable substitution the
+generator could not translate.
+
+Each template is compiled once into an anchored regex with one named group
+per argument. Entries without a template accept the bare target plus any
+arguments.
+"""
+from __future__ import annotations
+import re
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+TYPES = {
+    'string': r'"(?:[^"\\$\[\]]|\\.)*"',
+    'path': r'"/(?:[^"\\$\[\]]|\\.)*"',
+    'header': r"[A-Za-z0-9!#%&'*+.^_`|~-]+",
+    'word': r'\S+',
+    'ident': r'[A-Za-z_][\w.-]*',
+    'int': r'-?\d+',
+    'token': r'"(?:[^"\\]|\\.)*"|\S+',
+    'rest': r'.+',
+}
+_NEEDS_ESCAPE = re.compile(r'([\\"$\[\]])')
+SUBSTITUTION_RE = re.compile(r'(?<!\\)(?:\\\\)*[$\[]')  # unescaped `$` or `[`: Tcl command/variable substitution
+_PLACEHOLDER = re.compile(r'^\{(?P<name>[A-Za-z_]\w*):(?P<type>\w+|\([^()]+\))(?P<opt>\?)?\}$')
+
+
+class TemplateError(ValueError):
+    pass
+
+
+def template_slots(template: str) -> List[Tuple[Optional[str], str, bool]]:
+    """(name, type, optional) per word after the target; literal words have name None and type = the word."""
+    parts = template.split()
+    if not parts:
+        raise TemplateError('empty template')
+    slots: List[Tuple[Optional[str], str, bool]] = []
+    seen = set()
+    for part in parts[1:]:
+        m = _PLACEHOLDER.match(part)
+        if not m:
+            if '{' in part or '}' in part:
+                raise TemplateError(f'bad placeholder {part!r} in {template!r}')
+            slots.append((None, part, False))
+            continue
+        name, typ = m.group('name'), m.group('type')
+        if name in seen:
+            raise TemplateError(f'duplicate argument {name!r} in {template!r}')
+        seen.add(name)
+        if not typ.startswith('(') and typ not in TYPES:
+            raise TemplateError(f'unknown type {typ!r} in {template!r}')
+        slots.append((name, typ, bool(m.group('opt'))))
+    return slots
+
+
+def compile_template(template: str) -> Pattern[str]:
+    slots = template_slots(template)
+    pattern = '^' + re.escape(template.split()[0])
+    for name, typ, optional in slots:
+        if name is None:
+            pattern += ' ' + re.escape(typ)
+            continue
+        body = '|'.join(re.escape(w) for w in typ[1:-1].split('|')) if typ.startswith('(') else TYPES[typ]
+        group = f' (?P<{name}>{body})'
+        pattern += f'(?:{group})?' if optional else group
+    return re.compile(pattern + '$')
+
+
+def quote_string(text: str) -> str:
+    """`text` as a target-grammar string literal."""
+    if not _NEEDS_ESCAPE.search(text):
+        return '"' + text + '"'
+    return '"' + _NEEDS_ESCAPE.sub(r'\\\1', text) + '"'
+
+
+def compile_templates(mappings: Dict[str, Any]) -> Dict[str, Pattern[str]]:
+    """target -> compiled matcher for every capability-map entry (first template wins per target)."""
+    out: Dict[str, Pattern[str]] = {}
+    for key, meta in mappings.items():
+        target = meta.get('target') if isinstance(meta, dict) else meta
+        template: Optional[str] = meta.get('template') if isinstance(meta, dict) else None
+        if not target or target in out:
+            continue
+        try:
+            out[target] = compile_template(template) if template else re.compile('^' + re.escape(target) + r'(?: .+)?$')
+        except TemplateError as e:
+            raise TemplateError(f'capability_map entry {key!r}: {e}') from None
+        if not out[target].pattern.startswith('^' + re.escape(target)):
+            raise TemplateError(f'capability_map entry {key!r}: template must start with its target {target!r}')
+    return out
@@ -0,0 +1,81 @@
+"""Static verifier for generated AppShape++ scripts.
+
+One linear pass over the emitted lines. Each statement line
+(`<target> <args>  # line N : <iRule cmd>`) is checked against the compiled
+template of its target (looked up by first word, so the pass stays O(lines))
+and against the capability map for the source command. Per-line statuses:
+
+- `ok`: the template matches and the source command maps to this target
+- `unmapped`: the generator left the command as a comment
+- `untranslated`: an unescaped `[` or `$` remains, i.e. iRule command or
+  variable substitution was pasted instead of translated
+- `template_mismatch`, `target_mismatch`, `unknown_target`, `malformed`: failures
+
+`confidence` is the share of statement lines (mapped and unmapped) that
+verified `ok`.
+"""
+from __future__ import annotations
+import re
+from typing import Any, Dict, List, Optional, Pattern
+from packages.observability.metrics import histogram
+from packages.schemas.migration import FailureDetail, VerificationResult
+from packages.tools.templates import SUBSTITUTION_RE
+
+STATEMENT_RE = re.compile(r'^(?P<code>.*)  # line (?P<line>\d+) : (?P<cmd>\S+)$')
+UNMAPPED_RE = re.compile(r'^# unmapped line (?P<line>\d+): (?P<cmd>\S+)$')
+
+_VERIFY_SECONDS = histogram('appshape_verify_seconds', 'Time spent verifying one generated script')
+
+
+def verify_line(text: str, templates: Dict[str, Pattern[str]], map_command) -> Optional[Dict[str, Any]]:
+    """Result for one emitted line; None for comments and blank lines."""
+    m = STATEMENT_RE.match(text)
+    if m is None:
+        u = UNMAPPED_RE.match(text)
+        if u:
+            return {'line': int(u.group('line')), 'cmd': u.group('cmd'), 'status': 'unmapped'}
+        if not text.strip() or text.startswith('#'):
+            return None
+        return {'line': None, 'cmd': None, 'status': 'malformed', 'detail': 'statement without a source reference'}
+    code, cmd = m.group('code'), m.group('cmd')
+    res: Dict[str, Any] = {'line': int(m.group('line')), 'cmd': cmd}
+    target = code.split(' ', 1)[0]
+    matcher = templates.get(target)
+    if matcher is None:
+        return {**res, 'status': 'unknown_target', 'detail': f'{target!r} is not a capability-map target'}
+    if ('$' in code or '[' in code) and SUBSTITUTION_RE.search(code):
+        return {**res, 'status': 'untranslated', 'detail': f'{code!r} still contains iRule substitution'}
+    args = matcher.match(code)
+    if args is None:
+        return {**res, 'status': 'template_mismatch', 'detail': f'{code!r} does not match {target} template'}
+    expected = map_command(cmd)[0]
+    if expected != target:
+        return {**res, 'status': 'target_mismatch', 'detail': f'{cmd} maps to {expected!r}, not {target!r}'}
+    return {**res, 'status': 'ok', 'args': {k: v for k, v in args.groupdict().items() if v is not None}}
+
+
+@_VERIFY_SECONDS.time()
+def verify_script(code: str, templates: Optional[Dict[str, Pattern[str]]] = None, max_failures: int = 200) -> Dict[str, Any]:
+    """Verify every emitted line; returns per-line results, `verification` and `confidence`."""
+    from packages.tools.appshape_generator import TEMPLATES, map_command
+    templates = TEMPLATES if templates is None else templates
+    lines: List[Dict[str, Any]] = []
+    failures: List[FailureDetail] = []
+    passed = 0
+    for n, text in enumerate(code.splitlines(), start=1):
+        res = verify_line(text, templates, map_command)
+        if res is None:
+            continue
+        res['output_line'] = n
+        lines.append(res)
+        if res['status'] == 'ok':
+            passed += 1
+        elif len(failures) < max_failures:
+            where = f"line {res['line']}" if res['line'] is not None else f'output line {n}'
+            failures.append(FailureDetail(name=f"{res['status']} ({where})", detail=res.get('detail') or res['cmd'] or ''))
+    verification = VerificationResult(tests_run=len(lines), passed=passed, failures=failures)
+    return {
+        'lines': lines,
+        'verification': verification.model_dump(),
+        'confidence': round(passed / len(lines), 4) if lines else 1.0,
+    }